@@ -2,32 +2,65 @@ import telebot
 import requests
 from dotenv import load_dotenv
 import os
+import threading
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.cliente_firebase import SALA_UNICA, buscar_estados, salas, separar_sala, sessao, url_no
+from funcoes_auxiliares.envio_telegram import LimitadorTelegram, configurar_api
+from funcoes_auxiliares.fluxo_eventos import ObservadorNo
+from funcoes_auxiliares.inscricoes import NotificadorVagas, cancelar, inscrever, sala_lotada
 # ================= CONFIGURAÇÕES =================
 load_dotenv()
 
 TOKEN = os.getenv("bot_aluno")
+PORTA_METRICAS = int(os.getenv("porta_metricas_aluno", "9465"))
 
-URL_FIREBASE = "https://controle-de-acesso-iot-default-rtdb.firebaseio.com/estado.json"
-
+configurar_api()
 bot = telebot.TeleBot(TOKEN)
 
+# Um observador do /estado por sala alimenta o /ocupacao e os avisos de vaga daquela sala;
+# os notificadores dividem o mesmo limitador (o limite de envio do Telegram é do bot)
+limitador = LimitadorTelegram()
+notificadores = {
+    sala: NotificadorVagas(lambda chat_id, texto: bot.send_message(chat_id, texto, parse_mode="Markdown"),
+                           limitador=limitador, sala=sala)
+    for sala in salas()
+}
+observadores = {
+    sala: ObservadorNo(url_no("estado", sala), notificadores[sala].atualizar_estado, sessao=sessao())
+    for sala in salas()
+}
+
 # ================= FUNÇÃO ETL (Extração de Dados) =================
 def buscar_dados_firebase():
-    """Busca o JSON do Firebase e retorna um dicionário Python"""
-    try:
-        response = requests.get(URL_FIREBASE)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"Erro HTTP: {response.status_code}")
-            return None
-    except Exception as e:
-        print(f"Erro de conexão: {e}")
-        return None
+    """
+    {sala: estado ou None}: cópia mantida pelo stream de cada sala ou, sem ele,
+    o JSON do Firebase (via cache compartilhado, as salas sem stream buscadas ao mesmo tempo)
+    """
+    dados = {sala: o.valor for sala, o in observadores.items() if o.conectado and o.valor is not None}
+    faltando = [sala for sala in observadores if sala not in dados]
+    for sala, estado in buscar_estados(lista=faltando).items():
+        if isinstance(estado, requests.HTTPError):
+            print(f"Erro HTTP: {estado.response.status_code}")
+            estado = None
+        elif isinstance(estado, Exception):
+            print(f"Erro de conexão: {estado}")
+            estado = None
+        dados[sala] = estado
+    return {sala: dados[sala] for sala in observadores}
+
+def status_sala(qtd, limite):
+    """(status, mensagem extra) da lotação"""
+    if qtd >= limite:
+        return "🔴 **LOTADO**", "Aguarde alguém sair."
+    if qtd >= (limite * 0.8): # 80% cheio
+        return "🟠 **QUASE CHEIA**", "Restam poucas vagas!"
+    return "🟢 **DISPONÍVEL**", "Pode vir estudar!"
 
 # ================= COMANDOS DO BOT =================
 
 @bot.message_handler(commands=['start', 'help'])
+@metricas.cronometrado("bot_comando_segundos", bot="aluno", comando="start")
 def boas_vindas(mensagem):
     texto = """
 👋 **Olá! Sou o Monitor da Biblioteca.**
@@ -36,31 +69,43 @@ Eu consulto os sensores IoT da sala em tempo real.
 Use o comando abaixo para verificar se há vagas:
 
 /ocupacao - Ver lotação atual
+/avisar_vaga - Receber um aviso quando abrir vaga
+/cancelar - Cancelar o aviso de vaga
+/pico - Horários mais movimentados da semana
     """
+    if SALA_UNICA not in observadores:
+        texto += f"\nCom várias salas, diga qual: /avisar_vaga <sala>, /pico <sala> (salas: {', '.join(observadores)})\n"
     bot.reply_to(mensagem, texto)
 
 # Comando /ocupacao
 @bot.message_handler(commands=['ocupacao'])
+@metricas.cronometrado("bot_comando_segundos", bot="aluno", comando="ocupacao")
 def verificar_ocupacao(mensagem):
     bot.send_chat_action(mensagem.chat.id, 'typing')
     
-    dados = buscar_dados_firebase()
-    
+    estados = buscar_dados_firebase()
+
+    if SALA_UNICA not in estados:
+        # Várias salas: uma linha por sala
+        linhas = ["📊 **Status das Salas**", ""]
+        for sala, dados in estados.items():
+            if dados:
+                qtd = dados.get('ocupacao_atual', 0)
+                limite = dados.get('limite_ocupacao', 10)
+                linhas.append(f"🏫 **{sala}** · {status_sala(qtd, limite)[0]} · 👥 {qtd} / {limite}")
+            else:
+                linhas.append(f"🏫 **{sala}** · ⚠️ sem resposta dos sensores")
+        bot.reply_to(mensagem, "\n".join(linhas), parse_mode="Markdown")
+        return
+
+    dados = estados[SALA_UNICA]
     if dados:
         # Extrai os dados do JSON
         qtd = dados.get('ocupacao_atual', 0)
         limite = dados.get('limite_ocupacao', 10)
-        
+
         # Lógica de visualização
-        if qtd >= limite:
-            status = "🔴 **LOTADO**"
-            msg_extra = "Aguarde alguém sair."
-        elif qtd >= (limite * 0.8): # 80% cheio
-            status = "🟠 **QUASE CHEIA**"
-            msg_extra = "Restam poucas vagas!"
-        else:
-            status = "🟢 **DISPONÍVEL**"
-            msg_extra = "Pode vir estudar!"
+        status, msg_extra = status_sala(qtd, limite)
 
         resposta = f"""
 📊 **Status da Sala**
@@ -73,5 +118,70 @@ _{msg_extra}_
     else:
         bot.reply_to(mensagem, "⚠️ Erro ao conectar com os sensores.")
 
+# Comando /avisar_vaga
+@bot.message_handler(commands=['avisar_vaga'])
+@metricas.cronometrado("bot_comando_segundos", bot="aluno", comando="avisar_vaga")
+def avisar_vaga(mensagem):
+    sala, _ = separar_sala(telebot.util.extract_arguments(mensagem.text))
+    estados = buscar_dados_firebase()
+    if sala is None and SALA_UNICA not in estados:
+        # Várias salas e nenhuma escolhida: mostra onde há vaga ou pede a sala do aviso
+        livres = {s: dados for s, dados in estados.items() if dados and not sala_lotada(dados)}
+        if livres:
+            vagas = ", ".join(f"{s} ({d.get('ocupacao_atual', 0)} / {d.get('limite_ocupacao', 10)})"
+                              for s, d in livres.items())
+            bot.reply_to(mensagem, f"🟢 Há vagas agora em: {vagas}. Pode vir estudar!")
+        else:
+            bot.reply_to(mensagem, f"Todas as salas estão lotadas. Escolha a sala do aviso: "
+                                   f"/avisar_vaga <sala> (salas: {', '.join(estados)})")
+        return
+
+    sala = SALA_UNICA if sala is None else sala
+    nome = f"A sala {sala}" if sala else "A sala"
+    dados = estados.get(sala)
+    if dados and not sala_lotada(dados):
+        qtd = dados.get('ocupacao_atual', 0)
+        limite = dados.get('limite_ocupacao', 10)
+        bot.reply_to(mensagem, f"🟢 {nome} tem vagas agora ({qtd} / {limite}). Pode vir estudar!")
+        return
+
+    cancelar_cmd = f"/cancelar {sala}".strip()
+    if inscrever(mensagem.chat.id, sala):
+        bot.reply_to(mensagem, f"🔔 Combinado! Aviso você assim que abrir uma vaga{' na sala ' + sala if sala else ''}.\n"
+                               f"{cancelar_cmd} para desistir.")
+    else:
+        bot.reply_to(mensagem, f"🔔 Você já está na lista de espera{' da sala ' + sala if sala else ''}. "
+                               f"{cancelar_cmd} para desistir.")
+
+# Comando /cancelar
+@bot.message_handler(commands=['cancelar'])
+@metricas.cronometrado("bot_comando_segundos", bot="aluno", comando="cancelar")
+def cancelar_aviso(mensagem):
+    # Sem sala, cancela os avisos de todas as salas
+    sala, _ = separar_sala(telebot.util.extract_arguments(mensagem.text))
+    if cancelar(mensagem.chat.id, sala):
+        bot.reply_to(mensagem, "🔕 Aviso de vaga cancelado.")
+    else:
+        bot.reply_to(mensagem, "Você não estava na lista de espera.")
+
+# Comando /pico
+@bot.message_handler(commands=['pico'])
+@metricas.cronometrado("bot_comando_segundos", bot="aluno", comando="pico")
+def horarios_pico(mensagem):
+    bot.send_chat_action(mensagem.chat.id, 'typing')
+    try:
+        from funcoes_auxiliares import ocupacao_serie   # pandas só no primeiro /pico
+        sala, resto = separar_sala(telebot.util.extract_arguments(mensagem.text))
+        lista = list(observadores) if sala is None else [sala]
+        texto = "\n\n".join((f"🏫 **{s}** · " if s else "") + ocupacao_serie.texto_pico(resto, s) for s in lista)
+        bot.reply_to(mensagem, texto, parse_mode="Markdown")
+    except Exception as e:
+        print(f"Erro no /pico: {e}")
+        bot.reply_to(mensagem, "⚠️ Não consegui calcular os horários de pico agora.")
+
+metricas.iniciar_servidor(PORTA_METRICAS)
+for sala in observadores:
+    notificadores[sala].iniciar()
+    threading.Thread(target=observadores[sala].executar, daemon=True).start()
 print("🤖 Bot do Usuário rodando... (Não feche esta janela)")
 bot.polling()
\ No newline at end of file
@@ -0,0 +1,326 @@
+"""
+Benchmark do pipeline com históricos sintéticos contra o Firebase local.
+
+Para cada tamanho de histórico mede tempo de parede, pico de memória
+(tracemalloc, numa segunda execução para não distorcer o tempo) e eventos/s de:
+    ingestao        importação do JSON histórico para o SQLite local (leitura em streaming)
+    ingestao_json_load  o caminho anterior: json.load do arquivo inteiro e uma inserção só
+    leitura_colunar tabela colunar direto do arquivo, em lotes (modelo_eventos.carregar_tabela_arquivo)
+    sincronizacao   download incremental do /eventos do Firebase local
+    fraude_lote     tabela colunar + motor de regras vetorizado
+    fraude_stream   PontuadorFraude evento a evento (monitor em tempo real)
+    fraude_janela   só o DetectorJanela (clone, presença, sala vazia) evento a evento
+    previsao        série diária + backtest de todos os modelos
+    render          desenho dos dois gráficos (PNG)
+    bot_ocupacao    /ocupacao: leituras do /estado por 8 threads, sem e com cache
+    bot_analise     /analise_ocupacao: graficos.gerar a frio e com cache
+    bot_salas_<n>   /analise_ocupacao com n salas (a cauda do Firebase copiada em cada
+                    /salas/<id>/eventos), a frio: as salas analisadas em paralelo no pool
+    leitor_direto   escritas do firmware (evento, presença, estado), uma conexão por escrita
+    leitor_gateway  as mesmas escritas por uma conexão keep-alive ao gateway de borda,
+                    até o último PATCH chegar ao Firebase local
+
+Uso:
+    python -m ferramentas.benchmark --eventos 10000 100000 1000000 --cartoes 2000 --saida resultados.json
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from ferramentas.firebase_local import FirebaseLocal
+from ferramentas.gerador_eventos import escrever_arquivo, gerar_colunas, para_dicionario
+
+FRACAO_FIREBASE = 0.1          # parte do histórico que fica no Firebase local
+MAXIMO_FIREBASE = 100_000      # o stand-in guarda tudo em memória
+LIMITE_STREAM = 1_000_000      # eventos pontuados um a um
+THREADS_BOT = 8
+CHAMADAS_BOT = 200             # por thread
+PASSAGENS_LEITOR = 1000        # passagens de cartão simuladas (3 escritas cada)
+QUANTIDADES_SALAS = (1, 2, 4)
+
+ESTADO = {"ocupacao_atual": 3, "limite_ocupacao": 10}
+
+
+def medir(funcao, memoria=True):
+    """Executa funcao() cronometrada e, se pedido, de novo sob tracemalloc. Retorna (s, MB, resultado)"""
+    inicio = time.perf_counter()
+    resultado = funcao()
+    segundos = time.perf_counter() - inicio
+
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return segundos, pico, resultado
+
+
+def escritas_do_leitor(passagens):
+    """(método, caminho, corpo) na ordem em que o firmware escreve a cada passagem de cartão"""
+    for i in range(passagens):
+        ts = f"2025-01-01T{8 + i // 3600 % 12:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+        cartao = f"{i % 50:08X}"
+        yield "POST", "/eventos.json", {
+            "timestamp": ts, "cartao": cartao, "acesso_permitido": True, "acesso_negado": False,
+            "fraudulento": False, "leitor": "entrada", "ocupacao_apos_evento": i % 10,
+        }
+        yield "PUT", f"/presenca/{cartao}.json", {"dentro": True, "timestamp": ts}
+        yield "PUT", "/estado.json", {"ocupacao_atual": i % 10, "limite_ocupacao": 10,
+                                      "alerta_ativo": False, "ultima_atualizacao": ts}
+
+
+def _requisicao(conexao, metodo, caminho, corpo, fechar):
+    cabecalhos = {"Content-Type": "application/json"}
+    if fechar:
+        cabecalhos["Connection"] = "close"
+    conexao.request(metodo, caminho, json.dumps(corpo), cabecalhos)
+    resposta = conexao.getresponse()
+    resposta.read()
+    return resposta.status
+
+
+class Benchmark:
+    """
+    Prepara um diretório temporário com dadosreais.json + eventos.db e um Firebase
+    local, e aponta as variáveis de ambiente dos módulos para eles.
+    Os módulos de funcoes_auxiliares só são importados depois disso, porque leem
+    url_firebase e caminho_banco_eventos na importação.
+    """
+
+    def __init__(self, memoria=True):
+        self.memoria = memoria
+        self.diretorio = tempfile.mkdtemp(prefix="benchmark_iot_")
+        self.firebase = FirebaseLocal({"estado": dict(ESTADO), "eventos": {}}).iniciar()
+        os.environ["url_firebase"] = self.firebase.url
+        os.environ["caminho_banco_eventos"] = os.path.join(self.diretorio, "eventos.db")
+        os.chdir(self.diretorio)
+        self.resultados = []
+
+    def encerrar(self):
+        self.firebase.parar()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _registrar(self, n_eventos, etapa, quantidade, segundos, pico):
+        linha = {
+            "eventos": n_eventos,
+            "etapa": etapa,
+            "quantidade": quantidade,
+            "segundos": round(segundos, 4),
+            "pico_mb": None if pico is None else round(pico, 1),
+            "por_segundo": round(quantidade / segundos) if segundos > 0 else None,
+        }
+        self.resultados.append(linha)
+        pico_txt = "-" if pico is None else f"{pico:.1f}"
+        print(f"{n_eventos:>10} {etapa:<20}{quantidade:>10}{segundos:>10.3f}{pico_txt:>10}"
+              f"{linha['por_segundo'] or 0:>12}")
+
+    def _rascunho(self, nome):
+        caminho = os.path.join(self.diretorio, nome)
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        return caminho
+
+    # =====================================================
+    # ETAPAS
+    def executar(self, n_eventos, n_cartoes, semente=0):
+        from funcoes_auxiliares import graficos
+        from funcoes_auxiliares.analise_dados import analise_dados
+        from funcoes_auxiliares.analise_dados_fraude import analise_fraude, motor_regras
+        from funcoes_auxiliares.armazenamento_eventos import (
+            CAMINHO_BANCO,
+            ARQUIVO_HISTORICO,
+            ORIGEM_HISTORICO,
+            conectar,
+            importar_historico_local,
+            inserir_eventos,
+            sincronizar_firebase,
+        )
+        from funcoes_auxiliares.cliente_firebase import URL_EVENTOS, buscar_estado
+        from funcoes_auxiliares.deteccao_janela import DetectorJanela
+        from funcoes_auxiliares.modelo_eventos import carregar_tabela, carregar_tabela_arquivo
+        from funcoes_auxiliares.pontuacao_tempo_real import PontuadorFraude
+
+        # --- dados: histórico em arquivo + cauda no Firebase local ---
+        colunas = gerar_colunas(n_eventos, n_cartoes, semente=semente)
+        n_firebase = min(int(n_eventos * FRACAO_FIREBASE), MAXIMO_FIREBASE)
+        corte = n_eventos - n_firebase
+        escrever_arquivo(ARQUIVO_HISTORICO, colunas, fim=corte)
+        self.firebase.banco.put(["eventos"], para_dicionario(colunas, corte))
+        self._rascunho(CAMINHO_BANCO)
+
+        def ingerir(caminho):
+            conn = conectar(caminho)
+            try:
+                return importar_historico_local(conn, ARQUIVO_HISTORICO)
+            finally:
+                conn.close()
+
+        def ingerir_json_load(caminho):
+            conn = conectar(caminho)
+            try:
+                with open(ARQUIVO_HISTORICO, "r", encoding="utf-8") as f:
+                    dados = json.load(f)
+                with conn:
+                    return inserir_eventos(conn, dados, ORIGEM_HISTORICO)
+            finally:
+                conn.close()
+
+        def sincronizar(caminho):
+            conn = conectar(caminho)
+            try:
+                return sincronizar_firebase(conn, URL_EVENTOS)
+            finally:
+                conn.close()
+
+        # Execução medida grava no banco usado pelas análises; a de memória, num rascunho
+        segundos, _, _ = medir(lambda: ingerir(CAMINHO_BANCO), memoria=False)
+        pico = medir(lambda: ingerir(self._rascunho("rascunho.db")))[1] if self.memoria else None
+        self._registrar(n_eventos, "ingestao", corte, segundos, pico)
+
+        segundos, pico, _ = medir(lambda: ingerir_json_load(self._rascunho("rascunho.db")), self.memoria)
+        self._registrar(n_eventos, "ingestao_json_load", corte, segundos, pico)
+
+        segundos, pico, _ = medir(lambda: carregar_tabela_arquivo(ARQUIVO_HISTORICO), self.memoria)
+        self._registrar(n_eventos, "leitura_colunar", corte, segundos, pico)
+
+        segundos, _, _ = medir(lambda: sincronizar(CAMINHO_BANCO), memoria=False)
+        pico = medir(lambda: sincronizar(self._rascunho("rascunho.db")))[1] if self.memoria else None
+        self._registrar(n_eventos, "sincronizacao", n_firebase, segundos, pico)
+        self._rascunho("rascunho.db")
+
+        segundos, pico, tabela = medir(lambda: motor_regras(carregar_tabela()), self.memoria)
+        self._registrar(n_eventos, "fraude_lote", len(tabela), segundos, pico)
+
+        n_stream = min(n_eventos, LIMITE_STREAM)
+        eventos_stream = para_dicionario(colunas, 0, n_stream)
+
+        def pontuar_todos():
+            pontuador = PontuadorFraude(caminho=None)
+            for chave, evento in eventos_stream.items():
+                pontuador.pontuar(evento, chave)
+
+        segundos, pico, _ = medir(pontuar_todos, self.memoria)
+        self._registrar(n_eventos, "fraude_stream", n_stream, segundos, pico)
+
+        def detectar_todos():
+            detector = DetectorJanela()
+            for evento in eventos_stream.values():
+                detector.verificar_evento(evento)
+
+        segundos, pico, _ = medir(detectar_todos, self.memoria)
+        self._registrar(n_eventos, "fraude_janela", n_stream, segundos, pico)
+        del eventos_stream
+
+        segundos, pico, res_ocupacao = medir(lambda: analise_dados(sincronizar=False), self.memoria)
+        self._registrar(n_eventos, "previsao", n_eventos, segundos, pico)
+
+        res_fraude = analise_fraude(sincronizar=False)
+        segundos, pico, _ = medir(
+            lambda: (graficos.desenhar_ocupacao(res_ocupacao), graficos.desenhar_fraude(res_fraude)),
+            self.memoria,
+        )
+        self._registrar(n_eventos, "render", 2, segundos, pico)
+
+        # --- handlers dos bots ---
+        chamadas = THREADS_BOT * CHAMADAS_BOT
+        for etapa, ttl in (("bot_ocupacao", 0), ("bot_ocupacao_ttl", None)):
+            def ler_estado(ttl=ttl):
+                with ThreadPoolExecutor(THREADS_BOT) as executor:
+                    list(executor.map(lambda _: buscar_estado(ttl), range(chamadas)))
+            segundos, _, _ = medir(ler_estado, memoria=False)
+            self._registrar(n_eventos, etapa, chamadas, segundos, None)
+
+        for etapa in ("bot_analise_frio", "bot_analise_cache"):
+            segundos, _, _ = medir(lambda: graficos.gerar("ocupacao"), memoria=False)
+            self._registrar(n_eventos, etapa, 1, segundos, None)
+
+        self._salas(n_eventos, para_dicionario(colunas, corte))
+        self._leitor(n_eventos)
+
+    def _salas(self, n_eventos, eventos):
+        """/analise_ocupacao de várias salas: o tempo deve ficar estável enquanto houver núcleos livres"""
+        from funcoes_auxiliares import cliente_firebase, graficos
+        from funcoes_auxiliares.armazenamento_eventos import caminho_banco
+
+        # Um processo por sala (o pool é recriado no próximo pedido)
+        graficos.encerrar()
+        graficos.PROCESSOS_RENDER = max(QUANTIDADES_SALAS)
+        try:
+            graficos.aquecer(atraso=0, esperar=True)
+            for quantidade in QUANTIDADES_SALAS:
+                # Salas novas a cada medida: nada do cache de gráficos é reaproveitado
+                cliente_firebase.SALAS = tuple(f"sala{quantidade}_{i}" for i in range(quantidade))
+                for sala in cliente_firebase.SALAS:
+                    self.firebase.banco.put(["salas", sala, "eventos"], eventos)
+                    self._rascunho(os.path.basename(caminho_banco(sala)))
+                segundos, _, _ = medir(lambda: graficos.gerar_salas("ocupacao"), memoria=False)
+                self._registrar(n_eventos, f"bot_salas_{quantidade}", quantidade, segundos, None)
+        finally:
+            cliente_firebase.SALAS = ()
+            self.firebase.banco.put(["salas"], None)
+        print(f"{'':>11}salas: {graficos.PROCESSOS_RENDER} processos no pool, {os.cpu_count()} núcleos")
+
+    def _leitor(self, n_eventos):
+        """Escritas do dispositivo direto no Firebase local x pelo gateway de borda"""
+        from funcoes_auxiliares.gateway_borda import GatewayBorda
+
+        escritas = list(escritas_do_leitor(PASSAGENS_LEITOR))
+
+        def direto():
+            # Como o firmware: uma conexão nova (e Connection: close) por escrita
+            with FirebaseLocal() as firebase:
+                endereco = firebase.servidor.server_address
+                for metodo, caminho, corpo in escritas:
+                    conexao = http.client.HTTPConnection(*endereco)
+                    _requisicao(conexao, metodo, caminho, corpo, fechar=True)
+                    conexao.close()
+
+        def via_gateway():
+            with FirebaseLocal() as firebase:
+                gateway = GatewayBorda(firebase.url, self._rascunho("gateway.wal"), host="127.0.0.1", porta=0)
+                with gateway:
+                    conexao = http.client.HTTPConnection(*gateway.servidor.server_address)
+                    for metodo, caminho, corpo in escritas:
+                        _requisicao(conexao, metodo, caminho, corpo, fechar=False)
+                    conexao.close()
+                    gateway.esvaziar()
+                return firebase.banco.requisicoes
+
+        segundos, _, _ = medir(direto, memoria=False)
+        self._registrar(n_eventos, "leitor_direto", len(escritas), segundos, None)
+        segundos, _, requisicoes = medir(via_gateway, memoria=False)
+        self._registrar(n_eventos, "leitor_gateway", len(escritas), segundos, None)
+        print(f"{'':>11}gateway: {len(escritas)} escritas do leitor em {requisicoes} requisições ao Firebase")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com históricos sintéticos")
+    parser.add_argument("--eventos", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--cartoes", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    saida = os.path.abspath(args.saida) if args.saida else None
+    benchmark = Benchmark(memoria=not args.sem_memoria)
+    print(f"{'eventos':>10} {'etapa':<20}{'qtd':>10}{'segundos':>10}{'pico MB':>10}{'por seg':>12}")
+    try:
+        for n in args.eventos:
+            benchmark.executar(n, args.cartoes, args.semente)
+    finally:
+        benchmark.encerrar()
+
+    if saida:
+        with open(saida, "w", encoding="utf-8") as f:
+            json.dump(benchmark.resultados, f, indent=2)
+        print(f"Resultados gravados em {saida}")
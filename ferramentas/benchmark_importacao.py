@@ -0,0 +1,189 @@
+"""
+Benchmark da partida dos bots: tempo de import e tempo até a primeira resposta.
+
+    importacao   python -X importtime em processos novos (mediana de N execuções)
+                 dos módulos do bot e da pilha de análise; "pilha completa" é o que
+                 o bot pagava antes do carregamento preguiçoso (bot + pandas/matplotlib)
+    reinicio     sobe o bot de verdade contra o Firebase local e a Bot API local
+                 (ferramentas/telegram_local.py), com eventos.db e checkpoint já
+                 existentes (um reinício), e mede:
+                     start     do processo novo até a resposta do /start
+                     pico      /pico enviado alguns segundos depois, até a resposta
+                     analise   /analise_ocupacao em seguida, até a foto
+                 com o aquecimento em segundo plano ligado e desligado
+
+Uso:
+    python -m ferramentas.benchmark_importacao --execucoes 5 --bots supervisor_bot supervisor_bot_async
+"""
+import argparse
+import os
+import re
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from ferramentas.firebase_local import FirebaseLocal
+from ferramentas.gerador_eventos import gerar_colunas, para_dicionario
+from ferramentas.telegram_local import METODOS_DE_ENVIO, TelegramLocal
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ID_SUPERVISOR = 2056650757     # supervisor_bot.ID_SUPERVISOR
+TOKEN_TESTE = "123456:benchmark"
+EVENTOS_FIREBASE = 5000
+TIMEOUT_RESPOSTA = 120         # segundos
+ESPERA_APOS_START = 8.0        # segundos entre a resposta do /start e os comandos de análise
+MAIS_CAROS = 8                 # módulos listados no detalhamento do import
+
+MODULOS = (
+    "supervisor_bot",
+    "supervisor_bot_async",
+    "funcoes_auxiliares.graficos",
+    "funcoes_auxiliares.pontuacao_tempo_real",
+    "funcoes_auxiliares.ocupacao_serie",
+    "funcoes_auxiliares.historico_cartao",
+)
+PILHA_COMPLETA = ("supervisor_bot", "matplotlib.figure", "matplotlib.backends.backend_agg",
+                  "funcoes_auxiliares.analise_dados", "funcoes_auxiliares.analise_dados_fraude",
+                  "funcoes_auxiliares.ocupacao_serie", "funcoes_auxiliares.historico_cartao")
+
+_LINHA_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def ambiente_bot(**extra):
+    """Ambiente de um processo de bot/medição: raiz no PYTHONPATH, token de teste e 'extra'"""
+    ambiente = dict(os.environ, PYTHONPATH=RAIZ, bot_supervisor=TOKEN_TESTE, PYTHONDONTWRITEBYTECODE="1")
+    ambiente.update({k: str(v) for k, v in extra.items()})
+    return ambiente
+
+
+# =====================================================
+# TEMPO DE IMPORT
+def medir_importacao(modulos):
+    """
+    Importa 'modulos' num interpretador novo. Retorna (segundos totais,
+    {módulo importado diretamente por eles: segundos cumulativos})
+    """
+    codigo = "; ".join(f"import {m}" for m in modulos)
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=tempfile.gettempdir(), env=ambiente_bot(), capture_output=True, text=True, check=True,
+    ).stderr
+    pacotes = {m.split(".")[0] for m in modulos}
+    total, por_modulo = 0.0, {}
+    for linha in saida.splitlines():
+        achado = _LINHA_IMPORTTIME.match(linha)
+        if not achado:
+            continue
+        cumulativo, nome = int(achado.group(2)) / 1e6, achado.group(4)
+        profundidade = (len(achado.group(3)) - 1) // 2
+        if profundidade == 0 and nome.split(".")[0] in pacotes:   # fora a partida do interpretador (site...)
+            total += cumulativo
+        elif profundidade == 1:
+            por_modulo[nome] = cumulativo
+    return total, por_modulo
+
+
+def benchmark_importacao(execucoes):
+    print(f"{'módulo':<42}{'mediana s':>10}{'mín s':>8}")
+    resultados = {}
+    for nome, modulos in [(m, (m,)) for m in MODULOS] + [("pilha completa (antes)", PILHA_COMPLETA)]:
+        tempos = [medir_importacao(modulos)[0] for _ in range(execucoes)]
+        resultados[nome] = statistics.median(tempos)
+        print(f"{nome:<42}{statistics.median(tempos):>10.3f}{min(tempos):>8.3f}")
+
+    # Detalhamento: o que o supervisor ainda importa na partida
+    _, por_modulo = medir_importacao(("supervisor_bot",))
+    print("\nimports mais caros feitos pelo supervisor_bot (s, cumulativo):")
+    for modulo, segundos in sorted(por_modulo.items(), key=lambda x: -x[1])[:MAIS_CAROS]:
+        print(f"    {modulo:<42}{segundos:>8.3f}")
+    return resultados
+
+
+# =====================================================
+# REINÍCIO ATÉ A PRIMEIRA RESPOSTA
+def subir_bot(bot, diretorio, ambiente, saida=subprocess.DEVNULL):
+    """Sobe '<bot>.py' num grupo de processos próprio (para encerrar_bot derrubar também o pool)"""
+    return subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, f"{bot}.py")], cwd=diretorio, env=ambiente,
+        stdout=saida, stderr=subprocess.DEVNULL, start_new_session=True, text=True,
+    )
+
+
+def encerrar_bot(processo):
+    # O bot tem processos do pool de gráficos: derruba o grupo inteiro
+    try:
+        os.killpg(processo.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    processo.wait()
+
+
+def _comando(api, texto, metodos=METODOS_DE_ENVIO):
+    """Envia um comando do supervisor e devolve os segundos até a resposta"""
+    vistos = len(api.enviadas)
+    enviado = time.time()
+    api.enviar_texto(texto, ID_SUPERVISOR)
+    resposta = api.aguardar_envio(vistos, TIMEOUT_RESPOSTA, metodos)
+    if resposta is None:
+        raise RuntimeError(f"sem resposta ao {texto} em {TIMEOUT_RESPOSTA}s")
+    return resposta["instante"] - enviado
+
+
+def medir_reinicio(bot, telegram, firebase, diretorio, aquecer, espera=ESPERA_APOS_START):
+    """Sobe o bot e devolve os segundos de (partida até o /start, /pico, /analise_ocupacao)"""
+    api = telegram.api
+    ambiente = ambiente_bot(
+        url_api_telegram=telegram.url, url_firebase=firebase.url, aquecer_analises=int(aquecer),
+        porta_metricas_supervisor=0,
+    )
+    api.descartar_updates()
+    processo = subir_bot(bot, diretorio, ambiente)
+    try:
+        # O /start já está na fila quando o processo sobe, como uma mensagem que chegou durante a parada
+        start = _comando(api, "/start")
+        time.sleep(espera)
+        return start, _comando(api, "/pico"), _comando(api, "/analise_ocupacao", ("sendPhoto", "sendMessage"))
+    finally:
+        encerrar_bot(processo)
+
+
+def benchmark_reinicio(bots, execucoes, espera=ESPERA_APOS_START):
+    diretorio = tempfile.mkdtemp(prefix="benchmark_importacao_")
+    colunas = gerar_colunas(EVENTOS_FIREBASE, 200, dias=30)
+    print(f"\n{'bot':<24}{'aquecimento':<14}{'start s':>10}{'pico s':>10}{'analise s':>11}")
+    resultados = {}
+    try:
+        with FirebaseLocal() as firebase, TelegramLocal() as telegram:
+            firebase.banco.put(["estado"], {"ocupacao_atual": 3, "limite_ocupacao": 10})
+            firebase.banco.put(["eventos"], para_dicionario(colunas))
+            for bot in bots:
+                # Primeira partida cria eventos.db e o checkpoint; não entra na mediana
+                medir_reinicio(bot, telegram, firebase, diretorio, aquecer=False)
+                for aquecer in (False, True):
+                    medidas = [medir_reinicio(bot, telegram, firebase, diretorio, aquecer, espera)
+                               for _ in range(execucoes)]
+                    medianas = tuple(statistics.median(coluna) for coluna in zip(*medidas))
+                    resultados[(bot, aquecer)] = medianas
+                    print(f"{bot:<24}{'ligado' if aquecer else 'desligado':<14}"
+                          f"{medianas[0]:>10.3f}{medianas[1]:>10.3f}{medianas[2]:>11.3f}")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--execucoes", type=int, default=5, help="repetições por medida (mediana)")
+    parser.add_argument("--bots", nargs="+", default=["supervisor_bot", "supervisor_bot_async"])
+    parser.add_argument("--espera", type=float, default=ESPERA_APOS_START,
+                        help="segundos entre o /start e os comandos de análise")
+    parser.add_argument("--so-importacao", action="store_true", help="não sobe os bots")
+    args = parser.parse_args()
+
+    benchmark_importacao(args.execucoes)
+    if not args.so_importacao:
+        benchmark_reinicio(args.bots, args.execucoes, args.espera)
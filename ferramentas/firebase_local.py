@@ -0,0 +1,308 @@
+"""
+Servidor local que imita a API REST do Firebase Realtime Database.
+
+Suporta GET/PUT/POST/PATCH/DELETE em caminhos terminados em .json, as consultas
+orderBy="$key" com startAt/endAt/limitToFirst/limitToLast e o modo streaming
+(Accept: text/event-stream) com eventos put/patch/keep-alive.
+
+Uso:
+    python -m ferramentas.firebase_local --porta 9000 --replay dadosreais.json --intervalo 0.5
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from funcoes_auxiliares.fluxo_eventos import gerar_chave_push
+
+INTERVALO_KEEP_ALIVE = 15  # segundos
+
+
+# =====================================================
+# ÁRVORE JSON EM MEMÓRIA
+def _partes(caminho):
+    return [p for p in caminho.strip("/").split("/") if p]
+
+
+def _aplicar_consulta(valor, consulta):
+    """Aplica orderBy="$key" + startAt/endAt/limitToFirst/limitToLast a um nó"""
+    if not isinstance(valor, dict) or not consulta:
+        return valor
+    chaves = sorted(valor)
+    if "startAt" in consulta:
+        inicio = json.loads(consulta["startAt"])
+        chaves = [k for k in chaves if k >= inicio]
+    if "endAt" in consulta:
+        fim = json.loads(consulta["endAt"])
+        chaves = [k for k in chaves if k <= fim]
+    if "limitToFirst" in consulta:
+        chaves = chaves[:int(consulta["limitToFirst"])]
+    if "limitToLast" in consulta:
+        n = int(consulta["limitToLast"])
+        chaves = chaves[-n:] if n else []
+    return {k: valor[k] for k in chaves}
+
+
+def _patch_relativo(caminho_ouvinte, partes, atualizacoes):
+    """
+    Parte de um PATCH multi-caminho feito acima do nó observado que cai dentro dele,
+    como {filho: valor}. None se alguma atualização substitui o nó inteiro.
+    """
+    n = len(caminho_ouvinte)
+    relativos = {}
+    for caminho, valor in atualizacoes.items():
+        completo = partes + _partes(caminho)
+        if len(completo) > n and completo[:n] == caminho_ouvinte:
+            relativos["/".join(completo[n:])] = valor
+        elif caminho_ouvinte[:len(completo)] == completo:
+            return None
+    return relativos
+
+
+class BancoLocal:
+    """Árvore JSON com notificação de ouvintes (streaming)"""
+
+    def __init__(self, dados=None):
+        self.raiz = dados if dados is not None else {}
+        self.lock = threading.RLock()
+        self.ouvintes = []
+        self.escritas = 0
+        self.requisicoes = 0
+
+    def ler(self, partes):
+        with self.lock:
+            no = self.raiz
+            for p in partes:
+                if not isinstance(no, dict) or p not in no:
+                    return None
+                no = no[p]
+            return json.loads(json.dumps(no))
+
+    def _gravar(self, partes, valor):
+        if not partes:
+            self.raiz = valor if valor is not None else {}
+            return
+        no = self.raiz
+        for p in partes[:-1]:
+            if not isinstance(no.get(p), dict):
+                no[p] = {}
+            no = no[p]
+        if valor is None:
+            no.pop(partes[-1], None)
+        else:
+            no[partes[-1]] = valor
+
+    def put(self, partes, valor):
+        with self.lock:
+            self._gravar(partes, valor)
+            self.escritas += 1
+            self._notificar("put", partes, valor)
+
+    def patch(self, partes, atualizacoes):
+        """Escrita multi-caminho: cada chave de 'atualizacoes' é um caminho relativo"""
+        with self.lock:
+            for caminho, valor in atualizacoes.items():
+                self._gravar(partes + _partes(caminho), valor)
+            self.escritas += 1
+            self._notificar("patch", partes, atualizacoes)
+
+    def push(self, partes, valor):
+        chave = gerar_chave_push()
+        self.put(partes + [chave], valor)
+        return chave
+
+    # --- streaming ---
+    def assinar(self, partes):
+        fila = queue.Queue()
+        with self.lock:
+            self.ouvintes.append((partes, fila))
+        return fila
+
+    def cancelar(self, fila):
+        with self.lock:
+            self.ouvintes = [(p, f) for p, f in self.ouvintes if f is not fila]
+
+    def _notificar(self, tipo, partes, valor):
+        for caminho_ouvinte, fila in self.ouvintes:
+            n = len(caminho_ouvinte)
+            if partes[:n] == caminho_ouvinte:
+                # Escrita dentro do nó observado
+                relativo = "/" + "/".join(partes[n:])
+                fila.put((tipo, {"path": relativo, "data": valor}))
+            elif caminho_ouvinte[:len(partes)] == partes:
+                relativos = _patch_relativo(caminho_ouvinte, partes, valor) if tipo == "patch" else None
+                if relativos is None:
+                    # Escrita acima do nó observado: reenvia o nó inteiro
+                    fila.put(("put", {"path": "/", "data": self.ler(caminho_ouvinte)}))
+                elif relativos:
+                    # Multi-caminho acima do nó: só os filhos alterados, como o Firebase
+                    fila.put(("patch", {"path": "/", "data": relativos}))
+
+
+# =====================================================
+# SERVIDOR HTTP
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalho e corpo saem em writes separados; sem isso o keep-alive espera o ACK atrasado (~40ms)
+    disable_nagle_algorithm = True
+    banco = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _rota(self):
+        url = urlsplit(self.path)
+        caminho = url.path
+        if caminho.endswith(".json"):
+            caminho = caminho[:-len(".json")]
+        consulta = {k: v[0] for k, v in parse_qs(url.query).items()}
+        consulta.pop("orderBy", None)
+        consulta.pop("auth", None)
+        return _partes(caminho), consulta
+
+    def _corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(tamanho) or b"null")
+
+    def _responder(self, valor, status=200):
+        conteudo = json.dumps(valor).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def do_GET(self):
+        self.banco.requisicoes += 1
+        partes, consulta = self._rota()
+        if "text/event-stream" in (self.headers.get("Accept") or ""):
+            return self._streaming(partes, consulta)
+        self._responder(_aplicar_consulta(self.banco.ler(partes), consulta))
+
+    def do_PUT(self):
+        self.banco.requisicoes += 1
+        partes, _ = self._rota()
+        valor = self._corpo()
+        self.banco.put(partes, valor)
+        self._responder(valor)
+
+    def do_POST(self):
+        self.banco.requisicoes += 1
+        partes, _ = self._rota()
+        chave = self.banco.push(partes, self._corpo())
+        self._responder({"name": chave})
+
+    def do_PATCH(self):
+        self.banco.requisicoes += 1
+        partes, _ = self._rota()
+        atualizacoes = self._corpo() or {}
+        # Como o Firebase: um caminho não pode ser ancestral de outro no mesmo PATCH
+        caminhos = sorted(tuple(_partes(c)) for c in atualizacoes)
+        for anterior, caminho in zip(caminhos, caminhos[1:]):
+            if caminho[:len(anterior)] == anterior:
+                return self._responder({"error": f"Path '{'/'.join(anterior)}' is an ancestor of "
+                                                 f"'{'/'.join(caminho)}' in the same update"}, 400)
+        self.banco.patch(partes, atualizacoes)
+        self._responder(atualizacoes)
+
+    def do_DELETE(self):
+        self.banco.requisicoes += 1
+        partes, _ = self._rota()
+        self.banco.put(partes, None)
+        self._responder(None)
+
+    def _enviar_evento(self, tipo, dados):
+        # Um chunk HTTP por evento, como o Firebase faz
+        conteudo = f"event: {tipo}\ndata: {json.dumps(dados)}\n\n".encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(conteudo), conteudo))
+        self.wfile.flush()
+
+    def _streaming(self, partes, consulta):
+        self.close_connection = True
+        fila = self.banco.assinar(partes)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            inicial = _aplicar_consulta(self.banco.ler(partes), consulta)
+            self._enviar_evento("put", {"path": "/", "data": inicial})
+            while not self.server.parando.is_set():
+                try:
+                    tipo, dados = fila.get(timeout=INTERVALO_KEEP_ALIVE)
+                except queue.Empty:
+                    tipo, dados = "keep-alive", None
+                if tipo == "cancel":
+                    break
+                self._enviar_evento(tipo, dados)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.banco.cancelar(fila)
+
+
+class FirebaseLocal:
+    """Sobe o servidor em uma thread. Use como context manager em scripts e benchmarks."""
+
+    def __init__(self, dados=None, host="127.0.0.1", porta=0):
+        self.banco = BancoLocal(dados)
+        handler = type("Handler", (_Handler,), {"banco": self.banco})
+        self.servidor = ThreadingHTTPServer((host, porta), handler)
+        self.servidor.daemon_threads = True
+        self.servidor.parando = threading.Event()
+        self.url = f"http://{host}:{self.servidor.server_address[1]}"
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.parando.set()
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def derrubar_streams(self):
+        """Simula uma queda de conexão encerrando os streams abertos"""
+        with self.banco.lock:
+            for _, fila in self.banco.ouvintes:
+                fila.put(("cancel", None))
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+def replay_arquivo(banco, arquivo, intervalo=0.5, caminho="eventos"):
+    """Reenvia os eventos de um JSON {chave: evento} em ordem cronológica, como POSTs"""
+    with open(arquivo, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    for evento in sorted(dados.values(), key=lambda e: str(e.get("timestamp"))):
+        chave = banco.push(_partes(caminho), evento)
+        print(f"[replay] {chave} {evento.get('cartao')} {evento.get('leitor')}")
+        time.sleep(intervalo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Firebase Realtime Database local (stand-in)")
+    parser.add_argument("--porta", type=int, default=9000)
+    parser.add_argument("--replay", help="JSON {chave: evento} a reenviar para /eventos")
+    parser.add_argument("--intervalo", type=float, default=0.5, help="segundos entre eventos do replay")
+    args = parser.parse_args()
+
+    local = FirebaseLocal(porta=args.porta).iniciar()
+    print(f"Firebase local em {local.url} (Ctrl+C para parar)")
+    try:
+        if args.replay:
+            replay_arquivo(local.banco, args.replay, args.intervalo)
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        local.parar()
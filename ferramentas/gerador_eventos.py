@@ -0,0 +1,195 @@
+"""
+Gerador de históricos sintéticos no mesmo formato que o firmware grava no Firebase.
+
+Cada evento tem timestamp, cartao, acesso_permitido, acesso_negado, fraudulento,
+leitor e (opcionalmente) ocupacao_apos_evento. As visitas normais são pares
+entrada/saída em torno do horário preferido de cada cartão; uma fração das
+visitas recebe padrões de fraude:
+    duplicada   saída registrada como segunda entrada
+    curta       permanência de poucos segundos
+    horario     entrada fora do horário habitual do cartão
+    bloqueado   tentativa de um cartão bloqueado (acesso negado)
+    clonado     segunda entrada do mesmo cartão poucos segundos depois da primeira
+
+Uso:
+    python -m ferramentas.gerador_eventos --eventos 100000 --cartoes 500 --saida historico.json
+    python -m ferramentas.gerador_eventos --eventos 10000000 --formato jsonl --saida historico.jsonl
+"""
+import argparse
+import json
+
+import numpy as np
+
+from funcoes_auxiliares.fluxo_eventos import PUSH_CHARS
+
+TIPOS_FRAUDE = ("duplicada", "curta", "horario", "bloqueado", "clonado")
+INICIO_PADRAO = "2025-01-01"
+TAMANHO_LOTE = 100_000
+
+
+def gerar_colunas(n_eventos, n_cartoes=100, dias=90, taxa_fraude=0.02, semente=0,
+                  inicio=INICIO_PADRAO):
+    """
+    Gera o histórico como colunas numpy (ordenadas por tempo), sem criar um
+    dicionário por evento. Retorna um dict de arrays com as chaves:
+    timestamp (datetime64[s]), cartao (str), leitor (str), permitido (bool),
+    fraudulento (bool), ocupacao (int32) e fraude (str: tipo injetado ou '').
+    """
+    rng = np.random.default_rng(semente)
+    n_visitas = max(1, n_eventos // 2)
+
+    # Hash multiplicativo (bijetor módulo 2^32) garante UIDs distintos
+    deslocamento = int(rng.integers(0, 2**32))
+    cartoes = np.array([f"{(i * 2654435761 + deslocamento) % 2**32:08X}" for i in range(n_cartoes + 1)])
+    bloqueado = cartoes[-1]
+    cartoes = cartoes[:-1]
+    hora_preferida = rng.normal(13, 3, size=n_cartoes).clip(7, 20)
+
+    # --- visitas normais ---
+    cartao_visita = rng.integers(0, n_cartoes, size=n_visitas)
+    dia = rng.integers(0, dias, size=n_visitas)
+    hora = (hora_preferida[cartao_visita] + rng.normal(0, 1, size=n_visitas)).clip(0, 23.9)
+    entrada = np.datetime64(inicio, "s") + (dia * 86400 + (hora * 3600).astype(np.int64)).astype("timedelta64[s]")
+    permanencia = rng.integers(20 * 60, 4 * 3600, size=n_visitas).astype("timedelta64[s]")
+
+    # --- injeção de fraudes ---
+    fraude = np.full(n_visitas, "", dtype=object)
+    sorteio = rng.random(n_visitas) < taxa_fraude
+    fraude[sorteio] = rng.choice(TIPOS_FRAUDE, size=int(sorteio.sum()))
+
+    curta = fraude == "curta"
+    permanencia[curta] = rng.integers(5, 50, size=int(curta.sum())).astype("timedelta64[s]")
+    horario = fraude == "horario"
+    entrada[horario] += np.timedelta64(8 * 3600, "s")
+    clonado = fraude == "clonado"
+    permanencia[clonado] = rng.integers(2, 9, size=int(clonado.sum())).astype("timedelta64[s]")
+    saida = entrada + permanencia
+
+    ts = np.concatenate([entrada, saida])
+    leitor = np.concatenate([np.full(n_visitas, "entrada", dtype=object), np.full(n_visitas, "saida", dtype=object)])
+    leitor[n_visitas:][(fraude == "duplicada") | clonado] = "entrada"
+    cartao = np.concatenate([cartoes[cartao_visita], cartoes[cartao_visita]]).astype(object)
+    permitido = np.ones(2 * n_visitas, dtype=bool)
+    tipo = np.concatenate([fraude, fraude])
+
+    # Cartão bloqueado: só tentativas de entrada negadas (a "saída" vira outra tentativa)
+    bloq = np.concatenate([fraude == "bloqueado", fraude == "bloqueado"])
+    cartao[bloq] = bloqueado
+    leitor[bloq] = "entrada"
+    permitido[bloq] = False
+
+    ordem = np.argsort(ts, kind="stable")[:n_eventos]
+    ts, cartao, leitor, permitido, tipo = ts[ordem], cartao[ordem], leitor[ordem], permitido[ordem], tipo[ordem]
+
+    # --- ocupação como o firmware calcula (nunca abaixo de zero) ---
+    # Soma acumulada refletida em zero: o_t = S_t - min(0, min_{k<=t} S_k)
+    delta = np.where(permitido & (leitor == "entrada"), 1, np.where(leitor == "saida", -1, 0))
+    soma = np.cumsum(delta)
+    ocupacao = (soma - np.minimum(0, np.minimum.accumulate(soma))).astype(np.int32)
+    # Saída com sala vazia é marcada como fraude pelo firmware
+    anterior = np.r_[0, ocupacao[:-1]]
+    fraudulento = (cartao == bloqueado) | ((leitor == "saida") & (anterior == 0))
+
+    return {
+        "timestamp": ts,
+        "cartao": cartao,
+        "leitor": leitor,
+        "permitido": permitido,
+        "fraudulento": fraudulento,
+        "ocupacao": ocupacao,
+        "fraude": tipo,
+    }
+
+
+def chaves_push(timestamps, inicio=0):
+    """Push keys ordenáveis derivadas dos timestamps (8 chars de tempo + 12 de sequência)"""
+    ms = timestamps.astype("datetime64[ms]").astype(np.int64)
+    sequencia = np.arange(inicio, inicio + len(ms), dtype=np.int64)
+    caracteres = np.hstack([_base64_push(ms, 8), _base64_push(sequencia, 12)])
+    # (n, 20) caracteres U1 contíguos -> n strings U20
+    return np.ascontiguousarray(caracteres).view("<U20").ravel().tolist()
+
+
+def _base64_push(valores, largura):
+    alfabeto = np.array(list(PUSH_CHARS))
+    digitos = []
+    resto = valores.copy()
+    for _ in range(largura):
+        digitos.append(alfabeto[resto % 64])
+        resto //= 64
+    return np.stack(digitos[::-1], axis=1)
+
+
+def _eventos(colunas, inicio, fim, com_ocupacao):
+    ts = np.datetime_as_string(colunas["timestamp"][inicio:fim], unit="s")
+    for i, t in enumerate(ts, start=inicio):
+        permitido = bool(colunas["permitido"][i])
+        evento = {
+            "timestamp": str(t),
+            "cartao": colunas["cartao"][i],
+            "acesso_permitido": permitido,
+            "acesso_negado": not permitido,
+            "fraudulento": bool(colunas["fraudulento"][i]),
+            "leitor": colunas["leitor"][i],
+        }
+        if com_ocupacao:
+            evento["ocupacao_apos_evento"] = int(colunas["ocupacao"][i])
+        yield evento
+
+
+def para_dicionario(colunas, inicio=0, fim=None, com_ocupacao=True):
+    """Trecho [inicio:fim] das colunas como {push_key: evento}, igual ao /eventos.json"""
+    fim = len(colunas["timestamp"]) if fim is None else fim
+    chaves = chaves_push(colunas["timestamp"][inicio:fim], inicio)
+    return dict(zip(chaves, _eventos(colunas, inicio, fim, com_ocupacao)))
+
+
+def gerar_historico(n_eventos, com_ocupacao=True, **kwargs):
+    """Histórico pequeno/médio já no formato do Firebase"""
+    return para_dicionario(gerar_colunas(n_eventos, **kwargs), com_ocupacao=com_ocupacao)
+
+
+def escrever_arquivo(caminho, colunas, formato="json", com_ocupacao=True, fim=None):
+    """
+    Escreve em disco em lotes (memória limitada a TAMANHO_LOTE eventos de cada vez).
+    formato 'json': objeto {push_key: evento}; 'jsonl': um evento por linha com a chave em "_chave".
+    'fim' limita a escrita aos primeiros eventos das colunas.
+    """
+    n = len(colunas["timestamp"]) if fim is None else fim
+    with open(caminho, "w", encoding="utf-8") as f:
+        if formato == "json":
+            f.write("{\n")
+        for inicio in range(0, n, TAMANHO_LOTE):
+            fim = min(n, inicio + TAMANHO_LOTE)
+            chaves = chaves_push(colunas["timestamp"][inicio:fim], inicio)
+            partes = []
+            for chave, evento in zip(chaves, _eventos(colunas, inicio, fim, com_ocupacao)):
+                if formato == "json":
+                    partes.append(f"{json.dumps(chave)}: {json.dumps(evento)}")
+                else:
+                    evento["_chave"] = chave
+                    partes.append(json.dumps(evento))
+            if formato == "json":
+                if inicio > 0:
+                    f.write(",\n")
+                f.write(",\n".join(partes))
+            else:
+                f.write("\n".join(partes) + "\n")
+        if formato == "json":
+            f.write("\n}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera histórico sintético de eventos")
+    parser.add_argument("--eventos", type=int, default=10_000)
+    parser.add_argument("--cartoes", type=int, default=100)
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--taxa-fraude", type=float, default=0.02)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--formato", choices=("json", "jsonl"), default="json")
+    parser.add_argument("--saida", default="historico_sintetico.json")
+    args = parser.parse_args()
+
+    colunas = gerar_colunas(args.eventos, args.cartoes, args.dias, args.taxa_fraude, args.semente)
+    escrever_arquivo(args.saida, colunas, args.formato)
+    print(f"{len(colunas['timestamp'])} eventos gravados em {args.saida}")
@@ -0,0 +1,328 @@
+"""
+Replay de um histórico contra o monitor de fraudes, para medir se ele acompanha o ritmo.
+
+Sobe o bot supervisor de verdade apontado para o Firebase local e para a Bot API
+local (ferramentas/telegram_local.py, que registra cada alerta com o instante de
+chegada) e publica os eventos do histórico em /eventos, em ordem de horário, em
+1x, 100x ou na velocidade máxima. Enquanto isso lê o /metrics do bot a cada
+INTERVALO_AMOSTRA e, ao final, informa:
+
+    eventos      publicados, processados pelo monitor e perdidos
+    fila         backlog (publicados - processados): máximo, ao fim do replay e a
+                 tendência durante o replay (ev/s; > 0 = o monitor não acompanha)
+    vazao        eventos/s processados até o monitor alcançar o último evento publicado
+                 (o teto do monitor, em velocidade máxima)
+    alertas      esperados (PontuadorFraude rodado aqui sobre a mesma sequência),
+                 enviados na hora, agrupados em resumos, descartados pela fila,
+                 ainda na fila ao fim da espera (DRENAGEM_MAXIMA) e perdidos
+    latencia     da publicação do evento até o alerta chegar ao "Telegram" (p50/p95/p99/máx)
+
+Os alertas repetidos de um cartão são agrupados pelo despachante (JANELA_COALESCENCIA);
+só o primeiro de cada rajada tem latência medida, os outros aparecem em "agrupados".
+
+Uso:
+    python -m ferramentas.replay_alertas --arquivo dadosreais.json --velocidade 1 100 max
+    python -m ferramentas.replay_alertas --gerar 20000 --velocidade max --bot supervisor_bot_async
+"""
+import argparse
+import json
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict, deque
+from datetime import datetime
+
+import numpy as np
+
+from ferramentas.benchmark_importacao import ambiente_bot, encerrar_bot, subir_bot
+from ferramentas.firebase_local import FirebaseLocal
+from ferramentas.gerador_eventos import gerar_colunas, para_dicionario
+from ferramentas.telegram_local import TelegramLocal
+from funcoes_auxiliares.alertas import deve_alertar
+from funcoes_auxiliares.leitura_streaming import iterar_registros
+from funcoes_auxiliares.pontuacao_tempo_real import PontuadorFraude
+
+INTERVALO_AMOSTRA = 0.5       # segundos entre leituras do /metrics
+LACUNA_MAXIMA = 60.0          # segundos (do histórico) de pausa máxima entre dois eventos
+ESPERA_DRENAGEM = 15.0        # segundos sem progresso até desistir de esperar a fila esvaziar
+DRENAGEM_MAXIMA = 300.0       # segundos de espera depois do replay, mesmo com progresso
+TIMEOUT_PARTIDA = 60          # segundos até o bot conectar ao stream
+
+_METRICAS = re.compile(r"^(\w+)(?:\{([^}]*)\})? (\S+)$", re.MULTILINE)
+_CARTAO = re.compile(r"Cartão:\*\* `([^`]*)`")
+_HORARIO = re.compile(r"Horário:\*\* (\S+)")
+
+
+# =====================================================
+# HISTÓRICO
+def _segundos(ts):
+    try:
+        return datetime.fromisoformat(str(ts)[:19]).timestamp()
+    except ValueError:
+        return None
+
+
+def carregar_historico(arquivo=None, gerar=None, limite=None, semente=0):
+    """Eventos [(segundos, evento)] em ordem de horário, de um arquivo ou gerados"""
+    if gerar:
+        registros = para_dicionario(gerar_colunas(gerar, max(10, gerar // 100), taxa_fraude=0.05, semente=semente))
+        registros = registros.items()
+    else:
+        registros = iterar_registros(arquivo)
+    eventos = [(_segundos(e.get("timestamp")), e) for _, e in registros if isinstance(e, dict)]
+    eventos = sorted(((s, e) for s, e in eventos if s is not None), key=lambda par: par[0])
+    return eventos[:limite] if limite else eventos
+
+
+def alertas_esperados(eventos):
+    """Quantos eventos o monitor deveria alertar: o mesmo pontuador, a frio, sobre a mesma sequência"""
+    pontuador = PontuadorFraude(caminho=None)
+    esperados = []
+    for _, evento in eventos:
+        _, classificacao, _ = pontuador.pontuar(evento)
+        esperados.append(deve_alertar(evento, classificacao))
+    return esperados
+
+
+# =====================================================
+# MÉTRICAS DO BOT
+def ler_metricas(url):
+    """{(nome, rótulos): valor} do /metrics do bot"""
+    with urllib.request.urlopen(url, timeout=5) as resposta:
+        texto = resposta.read().decode("utf-8")
+    return {(nome, rotulos or ""): float(valor) for nome, rotulos, valor in _METRICAS.findall(texto)}
+
+
+def _valor(metricas, nome, rotulos=""):
+    return metricas.get((nome, rotulos), 0.0)
+
+
+def _aguardar_url_metricas(processo, timeout=TIMEOUT_PARTIDA):
+    """O bot imprime 'Métricas em <url>' ao subir (a porta é escolhida pelo sistema)"""
+    limite = time.monotonic() + timeout
+    for linha in processo.stdout:
+        achado = re.search(r"Métricas em (\S+)", linha)
+        if achado:
+            # Continua drenando o stdout para o bot nunca travar num pipe cheio
+            threading.Thread(target=lambda: [None for _ in processo.stdout], daemon=True).start()
+            return achado.group(1)
+        if time.monotonic() > limite:
+            break
+    raise RuntimeError("o bot não publicou o endpoint de métricas")
+
+
+class Amostrador(threading.Thread):
+    """Lê o /metrics periodicamente e guarda (instante, publicados, processados, fila de alertas)"""
+
+    def __init__(self, url, publicados):
+        super().__init__(daemon=True)
+        self.url = url
+        self.publicados = publicados     # função -> eventos publicados até agora
+        self.amostras = []
+        self.ultima = {}
+        self.parar = threading.Event()
+
+    def amostrar(self):
+        self.ultima = ler_metricas(self.url)
+        amostra = (time.monotonic(), self.publicados(), _valor(self.ultima, "monitor_eventos_total"),
+                   _valor(self.ultima, "alertas_fila"))
+        self.amostras.append(amostra)
+        return amostra
+
+    def run(self):
+        while not self.parar.wait(INTERVALO_AMOSTRA):
+            try:
+                self.amostrar()
+            except OSError:
+                pass
+
+
+# =====================================================
+# REPLAY
+def _percentis(valores):
+    if not valores:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(max(valores))}
+
+
+def executar_replay(eventos, esperados, velocidade, bot="supervisor_bot", lacuna_maxima=LACUNA_MAXIMA,
+                    drenagem_maxima=DRENAGEM_MAXIMA):
+    """Um replay completo com um bot novo. velocidade=None = o mais rápido possível"""
+    diretorio = tempfile.mkdtemp(prefix="replay_alertas_")
+    publicados = []                     # instante da publicação de cada evento
+    por_alerta = defaultdict(deque)     # (cartao, timestamp) -> instantes dos eventos que devem alertar
+    try:
+        with FirebaseLocal({"estado": {"ocupacao_atual": 0, "limite_ocupacao": 10}}) as firebase, \
+                TelegramLocal() as telegram:
+            ambiente = ambiente_bot(url_api_telegram=telegram.url, url_firebase=firebase.url,
+                                    porta_metricas_supervisor=0, aquecer_analises=0, PYTHONUNBUFFERED=1)
+            processo = subir_bot(bot, diretorio, ambiente, saida=subprocess.PIPE)
+            try:
+                amostrador = Amostrador(_aguardar_url_metricas(processo), lambda: len(publicados))
+                limite = time.monotonic() + TIMEOUT_PARTIDA
+                amostrador.amostrar()
+                while _valor(amostrador.ultima, "stream_conexoes_total") < 1:
+                    if time.monotonic() > limite:
+                        raise RuntimeError("o monitor do bot não conectou ao stream de /eventos")
+                    time.sleep(0.2)
+                    amostrador.amostrar()
+                time.sleep(0.5)   # put inicial do stream (nó vazio) já processado
+
+                amostrador.start()
+                inicio = time.monotonic()
+                simulado, anterior = 0.0, eventos[0][0] if eventos else 0
+                for (segundos, evento), alerta in zip(eventos, esperados):
+                    if velocidade:
+                        simulado += min(max(0.0, segundos - anterior), lacuna_maxima)
+                        atraso = inicio + simulado / velocidade - time.monotonic()
+                        if atraso > 0:
+                            time.sleep(atraso)
+                    anterior = segundos
+                    agora = time.time()
+                    firebase.banco.push(["eventos"], evento)
+                    publicados.append(agora)
+                    if alerta:
+                        por_alerta[(str(evento.get("cartao")), str(evento.get("timestamp")))].append(agora)
+                fim_replay = time.monotonic()
+
+                # Espera o monitor e a fila de alertas esvaziarem (ou pararem de andar).
+                # O envio ao supervisor é limitado a 1 mensagem/s: em velocidade máxima a
+                # fila pode levar muitos minutos; o que sobrar aparece como "pendentes"
+                progresso, ultimo = time.monotonic(), None
+                while (time.monotonic() - progresso < ESPERA_DRENAGEM
+                       and time.monotonic() - fim_replay < drenagem_maxima):
+                    _, _, processados, fila = amostrador.amostrar()
+                    if processados >= len(publicados) and fila == 0:
+                        break
+                    # Resumos saindo ao fim das janelas também são progresso (a fila fica parada)
+                    andamento = (processados, fila, _valor(amostrador.ultima, "alertas_total", 'resultado="enviado"'))
+                    if andamento != ultimo:
+                        progresso, ultimo = time.monotonic(), andamento
+                    time.sleep(INTERVALO_AMOSTRA)
+                amostrador.parar.set()
+                final = amostrador.amostrar()
+                metricas_finais = amostrador.ultima
+            finally:
+                encerrar_bot(processo)
+            enviadas = [r for r in telegram.api.enviadas if r["metodo"] == "sendMessage"]
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    # --- latência: cada alerta imediato casado com o evento (cartão + horário) que o gerou ---
+    latencias, sem_par = [], 0
+    for registro in enviadas:
+        texto = registro["texto"] or ""
+        if "ALERTA DE SEGURANÇA" not in texto:
+            continue
+        cartao, horario = _CARTAO.search(texto), _HORARIO.search(texto)
+        fila = por_alerta.get((cartao and cartao.group(1), horario and horario.group(1)))
+        if fila:
+            latencias.append(registro["instante"] - fila.popleft())
+        else:
+            sem_par += 1
+
+    # --- fila: backlog durante o replay ---
+    amostras = [a for a in amostrador.amostras if a[0] <= fim_replay]
+    backlog = [(t - inicio, pub - proc) for t, pub, proc, _ in amostrador.amostras]
+    tendencia = None
+    if len(amostras) >= 3:
+        x = np.array([t - inicio for t, _, _, _ in amostras])
+        y = np.array([pub - proc for _, pub, proc, _ in amostras])
+        tendencia = float(np.polyfit(x, y, 1)[0])
+    fim_drenagem = final[0]
+    # Vazão do monitor: até ele alcançar o último evento publicado (a fila de alertas drena depois)
+    alcancou = next((t for t, pub, proc, _ in amostrador.amostras
+                     if t >= fim_replay and proc >= len(publicados)), fim_drenagem)
+
+    processados = int(final[2])
+    imediatos = len(latencias) + sem_par
+    agrupados = int(_valor(metricas_finais, "alertas_total", 'resultado="agrupado"'))
+    descartados = int(_valor(metricas_finais, "alertas_total", 'resultado="descartado"'))
+    pendentes = int(final[3])
+    n_esperados = int(sum(esperados))
+    return {
+        "velocidade": velocidade or "max",
+        "bot": bot,
+        "eventos": {
+            "publicados": len(publicados),
+            "processados": processados,
+            "perdidos": max(0, len(publicados) - processados),
+        },
+        "replay_segundos": fim_replay - inicio,
+        "taxa_publicada": len(publicados) / max(fim_replay - inicio, 1e-9),
+        "vazao": processados / max(alcancou - inicio, 1e-9),
+        "fila": {
+            "maxima": max((b for _, b in backlog), default=0),
+            "fim_replay": (amostras[-1][1] - amostras[-1][2]) if amostras else None,
+            "tendencia_por_segundo": tendencia,
+            "drenagem_segundos": fim_drenagem - fim_replay,
+        },
+        "alertas": {
+            "esperados": n_esperados,
+            "imediatos": imediatos,
+            "agrupados": agrupados,
+            "descartados": descartados,
+            "pendentes": pendentes,
+            "perdidos": max(0, n_esperados - imediatos - agrupados - descartados - pendentes),
+            "sem_par": sem_par,
+        },
+        "latencia": _percentis(latencias),
+    }
+
+
+def imprimir(resultado):
+    e, f, a, l = resultado["eventos"], resultado["fila"], resultado["alertas"], resultado["latencia"]
+    ms = lambda v: "-" if v is None else f"{v * 1000:.0f}ms"
+    tendencia = "-" if f["tendencia_por_segundo"] is None else f"{f['tendencia_por_segundo']:+.1f} ev/s"
+    velocidade = resultado["velocidade"]
+    print(f"\n=== {resultado['bot']} @ {velocidade if velocidade == 'max' else f'{velocidade:g}x'} ===")
+    print(f"eventos   publicados {e['publicados']}, processados {e['processados']}, perdidos {e['perdidos']}")
+    print(f"ritmo     publicado {resultado['taxa_publicada']:.0f} ev/s em {resultado['replay_segundos']:.1f}s, "
+          f"processado {resultado['vazao']:.0f} ev/s")
+    print(f"fila      máxima {f['maxima']:.0f}, ao fim do replay {f['fim_replay']}, tendência {tendencia}, "
+          f"drenagem {f['drenagem_segundos']:.1f}s")
+    print(f"alertas   esperados {a['esperados']}, imediatos {a['imediatos']}, agrupados {a['agrupados']}, "
+          f"descartados {a['descartados']}, pendentes {a['pendentes']}, perdidos {a['perdidos']}")
+    print(f"latência  p50 {ms(l['p50'])}  p95 {ms(l['p95'])}  p99 {ms(l['p99'])}  máx {ms(l['max'])}")
+
+
+def _velocidade(texto):
+    return None if texto == "max" else float(texto)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument("--arquivo", default="dadosreais.json", help="histórico JSON/JSONL {chave: evento}")
+    origem.add_argument("--gerar", type=int, help="usa N eventos sintéticos (gerador_eventos)")
+    parser.add_argument("--velocidade", type=_velocidade, nargs="+", default=[100.0],
+                        help="fator sobre o tempo real (1, 100...) ou 'max'")
+    parser.add_argument("--limite", type=int, help="só os N primeiros eventos")
+    parser.add_argument("--lacuna-maxima", type=float, default=LACUNA_MAXIMA,
+                        help="pausa máxima entre eventos, em segundos do histórico")
+    parser.add_argument("--drenagem-maxima", type=float, default=DRENAGEM_MAXIMA,
+                        help="segundos de espera pela fila de alertas depois do replay")
+    parser.add_argument("--bot", default="supervisor_bot", choices=["supervisor_bot", "supervisor_bot_async"])
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    eventos = carregar_historico(None if args.gerar else args.arquivo, args.gerar, args.limite)
+    esperados = alertas_esperados(eventos)
+    print(f"{len(eventos)} eventos, {sum(esperados)} devem gerar alerta")
+
+    resultados = []
+    for velocidade in args.velocidade:
+        resultado = executar_replay(eventos, esperados, velocidade, args.bot, args.lacuna_maxima,
+                                    args.drenagem_maxima)
+        imprimir(resultado)
+        resultados.append(resultado)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"Resultados gravados em {args.saida}")
@@ -0,0 +1,229 @@
+"""
+Servidor local que imita a Bot API do Telegram, para testes e benchmarks dos bots.
+
+Responde getMe/getUpdates (long polling sobre uma fila de updates injetados) e
+registra tudo o que o bot envia (sendMessage, sendPhoto, sendChatAction...) com
+o instante de chegada. Os bots usam este servidor quando a variável
+url_api_telegram aponta para ele (envio_telegram.configurar_api).
+
+Uso:
+    python -m ferramentas.telegram_local --porta 9100
+    url_api_telegram=http://127.0.0.1:9100 python supervisor_bot.py
+"""
+import argparse
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ESPERA_MAXIMA_POLLING = 1.0   # segundos que o getUpdates segura a conexão sem updates
+METODOS_DE_ENVIO = ("sendMessage", "sendPhoto", "sendDocument")
+
+
+# =====================================================
+# ESTADO: UPDATES A ENTREGAR E MENSAGENS RECEBIDAS
+class BotApiLocal:
+    """Fila de updates para o bot e registro das chamadas que ele fez"""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia      # atraso artificial por chamada (s), como a rede até o Telegram
+        self.updates = []
+        self.enviadas = []            # [{"metodo", "chat_id", "texto", "instante", "parametros"}]
+        self.chamadas = {}
+        self._proximo_update = 1
+        self._proxima_mensagem = 1
+        self._condicao = threading.Condition()
+
+    # --- lado do teste ---
+    def enviar_texto(self, texto, usuario_id, chat_id=None):
+        """Injeta uma mensagem de 'usuario_id' como se viesse do app; devolve o update_id"""
+        comando = texto.split()[0] if texto.startswith("/") else None
+        with self._condicao:
+            update_id = self._proximo_update
+            self._proximo_update += 1
+            mensagem = {
+                "message_id": self._nova_mensagem(),
+                "from": {"id": usuario_id, "is_bot": False, "first_name": "Teste"},
+                "chat": {"id": chat_id or usuario_id, "type": "private"},
+                "date": int(time.time()),
+                "text": texto,
+            }
+            if comando:
+                mensagem["entities"] = [{"type": "bot_command", "offset": 0, "length": len(comando)}]
+            self.updates.append({"update_id": update_id, "message": mensagem})
+            self._condicao.notify_all()
+        return update_id
+
+    def descartar_updates(self):
+        """Esquece os updates ainda não confirmados (ex.: de um bot que foi derrubado)"""
+        with self._condicao:
+            self.updates = []
+
+    def aguardar_envio(self, depois=0, timeout=30.0, metodos=METODOS_DE_ENVIO):
+        """Espera o bot enviar algo a partir do índice 'depois' de self.enviadas; devolve o registro ou None"""
+        limite = time.monotonic() + timeout
+        with self._condicao:
+            while True:
+                for registro in self.enviadas[depois:]:
+                    if registro["metodo"] in metodos:
+                        return registro
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._condicao.wait(restante)
+
+    # --- lado do bot ---
+    def _nova_mensagem(self):
+        numero = self._proxima_mensagem
+        self._proxima_mensagem += 1
+        return numero
+
+    def _obter_updates(self, parametros):
+        offset = int(parametros.get("offset") or 0)
+        espera = min(float(parametros.get("timeout") or 0), ESPERA_MAXIMA_POLLING)
+        limite = time.monotonic() + espera
+        with self._condicao:
+            # offset confirma (e descarta) os updates anteriores, como na API real
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            while not self.updates and time.monotonic() < limite:
+                self._condicao.wait(limite - time.monotonic())
+            return list(self.updates[:int(parametros.get("limit") or 100)])
+
+    def chamar(self, metodo, parametros):
+        """Executa um método da Bot API e devolve o 'result'"""
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._condicao:
+            self.chamadas[metodo] = self.chamadas.get(metodo, 0) + 1
+        if metodo == "getUpdates":
+            return self._obter_updates(parametros)
+        if metodo == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bot local", "username": "bot_local"}
+
+        with self._condicao:
+            registro = {
+                "metodo": metodo,
+                "chat_id": parametros.get("chat_id"),
+                "texto": parametros.get("text") or parametros.get("caption"),
+                "instante": time.time(),
+                "parametros": parametros,
+            }
+            self.enviadas.append(registro)
+            self._condicao.notify_all()
+            if metodo not in METODOS_DE_ENVIO:
+                return True
+            return {
+                "message_id": self._nova_mensagem(),
+                "from": {"id": 1, "is_bot": True, "first_name": "Bot local"},
+                "chat": {"id": int(parametros.get("chat_id") or 0), "type": "private"},
+                "date": int(registro["instante"]),
+                "text": registro["texto"] or "",
+            }
+
+
+# =====================================================
+# SERVIDOR HTTP
+def _parametros_multipart(tipo, corpo):
+    mensagem = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + tipo.encode() + b"\r\n\r\n" + corpo)
+    parametros = {}
+    for parte in mensagem.iter_parts():
+        nome = parte.get_param("name", header="content-disposition")
+        conteudo = parte.get_payload(decode=True) or b""
+        if parte.get_filename() is not None:
+            parametros[nome] = f"<{len(conteudo)} bytes>"   # arquivo: só o tamanho
+        else:
+            parametros[nome] = conteudo.decode("utf-8")
+    return parametros
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    api = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # bot derrubado no meio de um getUpdates
+
+    def _parametros(self):
+        """Query string + corpo (form urlencoded, multipart ou JSON), como a API aceita"""
+        url = urlsplit(self.path)
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b""
+        tipo = self.headers.get("Content-Type") or ""
+        if corpo:
+            if tipo.startswith("multipart/form-data"):
+                parametros.update(_parametros_multipart(tipo, corpo))
+            elif tipo.startswith("application/json"):
+                parametros.update(json.loads(corpo))
+            else:
+                parametros.update({k: v[0] for k, v in parse_qs(corpo.decode("utf-8")).items()})
+        return url.path.rsplit("/", 1)[-1], parametros
+
+    def _atender(self):
+        metodo, parametros = self._parametros()
+        resposta = {"ok": True, "result": self.api.chamar(metodo, parametros)}
+        conteudo = json.dumps(resposta).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    do_GET = _atender
+    do_POST = _atender
+
+
+class TelegramLocal:
+    """Sobe o servidor em uma thread. Use como context manager em scripts e benchmarks."""
+
+    def __init__(self, host="127.0.0.1", porta=0, latencia=0.0):
+        self.api = BotApiLocal(latencia)
+        handler = type("Handler", (_Handler,), {"api": self.api})
+        self.servidor = ThreadingHTTPServer((host, porta), handler)
+        self.servidor.daemon_threads = True
+        self.url = f"http://{host}:{self.servidor.server_address[1]}"
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bot API do Telegram local (stand-in)")
+    parser.add_argument("--porta", type=int, default=9100)
+    parser.add_argument("--latencia", type=float, default=0.0, help="atraso por chamada (s)")
+    args = parser.parse_args()
+
+    local = TelegramLocal(porta=args.porta, latencia=args.latencia).iniciar()
+    print(f"Bot API local em {local.url} (Ctrl+C para parar)")
+    try:
+        vistos = 0
+        while True:
+            time.sleep(1)
+            for registro in local.api.enviadas[vistos:]:
+                print(f"[{registro['metodo']}] chat {registro['chat_id']}: {registro['texto']}")
+            vistos = len(local.api.enviadas)
+    except KeyboardInterrupt:
+        local.parar()
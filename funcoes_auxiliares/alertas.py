@@ -0,0 +1,179 @@
+"""
+Alertas de segurança enviados ao supervisor (compartilhado pelos modos síncrono e assíncrono).
+
+O monitor só enfileira (DespachanteAlertas.alertar); uma thread dedicada envia
+respeitando os limites do Telegram. Alertas repetidos do mesmo cartão dentro de
+JANELA_COALESCENCIA viram uma única mensagem de resumo ("5 tentativas em 40s"):
+o primeiro alerta da rajada sai na hora, o resumo sai quando a janela fecha.
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.envio_telegram import LimitadorTelegram, enviar_com_retentativa
+
+# =====================================================
+# CONFIGURAÇÕES
+JANELA_COALESCENCIA = 60     # segundos desde o primeiro alerta da rajada
+TAMANHO_MAXIMO_FILA = 10_000
+
+_PARAR = object()
+
+
+def deve_alertar(evento, classificacao):
+    """Flag do dispositivo ou regras do pontuador"""
+    return evento.get('fraudulento') == True or classificacao != "NORMAL"
+
+
+def formatar_alerta(evento, score, classificacao, motivos):
+    cartao = evento.get('cartao', 'N/A')
+    hora = evento.get('timestamp', 'N/A')
+    motivo = ', '.join(motivos) or "Sinalizado pelo dispositivo"
+    sala = f"\n🏫 **Sala:** {evento['sala']}" if evento.get('sala') else ""
+
+    return f"""
+🚨 **ALERTA DE SEGURANÇA** 🚨
+
+Foi detectada uma tentativa de acesso não autorizado!{sala}
+💳 **Cartão:** `{cartao}`
+⏰ **Horário:** {hora}
+⚠️ **Classificação:** {classificacao} (score {score})
+📝 **Motivo:** {motivo}
+        """
+
+
+def _segundos(ts):
+    try:
+        return datetime.fromisoformat(str(ts).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class Rajada:
+    """Alertas de um cartão dentro da janela (o primeiro já foi enviado)"""
+
+    def __init__(self, chegada, evento, score, classificacao, motivos):
+        self.inicio = chegada
+        self.ultima_chegada = chegada
+        self.quantidade = 1
+        self.primeiro_ts = self.ultimo_ts = evento.get('timestamp')
+        self.maior_score = score
+        self.classificacao = classificacao
+        self.motivos = dict.fromkeys(motivos or ["Sinalizado pelo dispositivo"])
+
+    def adicionar(self, chegada, evento, score, classificacao, motivos):
+        self.quantidade += 1
+        self.ultima_chegada = chegada
+        self.ultimo_ts = evento.get('timestamp')
+        if score >= self.maior_score:
+            self.maior_score, self.classificacao = score, classificacao
+        self.motivos.update(dict.fromkeys(motivos or ["Sinalizado pelo dispositivo"]))
+
+    def duracao(self):
+        """Segundos entre a primeira e a última tentativa (pelo horário do dispositivo, se houver)"""
+        inicio, fim = _segundos(self.primeiro_ts), _segundos(self.ultimo_ts)
+        if inicio is not None and fim is not None:
+            return abs(fim - inicio)
+        return self.ultima_chegada - self.inicio
+
+
+def formatar_resumo(cartao, rajada):
+    return f"""
+🔁 **ALERTAS AGRUPADOS**
+
+💳 **Cartão:** `{cartao}`
+📈 **{rajada.quantidade} tentativas em {rajada.duracao():.0f}s** ({rajada.primeiro_ts} → {rajada.ultimo_ts})
+⚠️ **Pior classificação:** {rajada.classificacao} (score {rajada.maior_score})
+📝 **Motivos:** {', '.join(rajada.motivos)}
+        """
+
+
+class DespachanteAlertas:
+    """
+    Fila de alertas drenada por uma thread dedicada.
+    enviar(chat_id, texto) é a função que fala com o Telegram (bloqueante).
+    """
+
+    def __init__(self, enviar, chat_id, janela=JANELA_COALESCENCIA, limitador=None):
+        self.enviar = enviar
+        self.chat_id = chat_id
+        self.janela = janela
+        self.limitador = limitador or LimitadorTelegram()
+        self.fila = queue.Queue(maxsize=TAMANHO_MAXIMO_FILA)
+        self.rajadas = {}   # cartao -> Rajada (acessado só pela thread de envio)
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, timeout=10):
+        """Envia os resumos pendentes e encerra a thread"""
+        self.fila.put(_PARAR)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def alertar(self, evento, score, classificacao, motivos):
+        """Não bloqueia: só enfileira. Com a fila cheia o alerta é descartado (e contado)."""
+        try:
+            self.fila.put_nowait((time.monotonic(), evento, score, classificacao, list(motivos)))
+        except queue.Full:
+            metricas.incrementar("alertas_total", resultado="descartado")
+        metricas.definir("alertas_fila", self.fila.qsize())
+
+    # =====================================================
+    # THREAD DE ENVIO
+    def _executar(self):
+        while True:
+            try:
+                item = self.fila.get(timeout=self._ate_proximo_fechamento())
+            except queue.Empty:
+                item = None
+
+            if item is _PARAR:
+                for cartao in list(self.rajadas):
+                    self._fechar(cartao)
+                return
+            if item is not None:
+                self._receber(*item)
+            self._fechar_expiradas(time.monotonic())
+            metricas.definir("alertas_fila", self.fila.qsize())
+
+    def _ate_proximo_fechamento(self):
+        if not self.rajadas:
+            return 1.0
+        primeira = min(r.inicio for r in self.rajadas.values())
+        return max(0.05, primeira + self.janela - time.monotonic())
+
+    def _receber(self, chegada, evento, score, classificacao, motivos):
+        cartao = str(evento.get('cartao', 'N/A'))
+        rajada = self.rajadas.get(cartao)
+        if rajada is not None and chegada - rajada.inicio < self.janela:
+            rajada.adicionar(chegada, evento, score, classificacao, motivos)
+            metricas.incrementar("alertas_total", resultado="agrupado")
+            return
+        if rajada is not None:
+            self._fechar(cartao)
+
+        self.rajadas[cartao] = Rajada(chegada, evento, score, classificacao, motivos)
+        if self._enviar(formatar_alerta(evento, score, classificacao, motivos), chegada, "alerta"):
+            print(f"[ALERTA ENVIADO] {classificacao} no cartão {cartao}")
+
+    def _fechar_expiradas(self, agora):
+        for cartao in [c for c, r in self.rajadas.items() if agora - r.inicio >= self.janela]:
+            self._fechar(cartao)
+
+    def _fechar(self, cartao):
+        rajada = self.rajadas.pop(cartao)
+        if rajada.quantidade > 1:
+            self._enviar(formatar_resumo(cartao, rajada), rajada.ultima_chegada, "resumo")
+
+    def _enviar(self, texto, chegada, tipo):
+        entregue = enviar_com_retentativa(self.enviar, self.chat_id, texto, self.limitador)
+        # Da detecção (entrada na fila) até a entrega; no resumo, desde a última tentativa
+        metricas.observar("alerta_envio_segundos", time.monotonic() - chegada, tipo=tipo)
+        metricas.incrementar("alertas_total", resultado="enviado" if entregue else "erro")
+        return entregue
@@ -1,105 +1,118 @@
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from math import sqrt
-import requests
-import json
-from datetime import timedelta
-import os
+import pandas as pd
 
-def analise_dados():
-    rows = []
+from funcoes_auxiliares.armazenamento_eventos import (
+    CAMINHO_BANCO,
+    ORIGEM_HISTORICO,
+    SALA_UNICA,
+    atualizar_sala,
+    caminho_banco,
+    carregar_agregados_diarios,
+    conectar,
+    contagem_por_origem,
+    reconstruir_agregados,
+    versao_dados,
+)
+from funcoes_auxiliares.modelo_eventos import carregar_tabela, datas
+from funcoes_auxiliares.previsao import selecionar_modelo
 
-    # ==========================================================
-    # 1. CARREGAR HISTÓRICO LOCAL (dadosreais.json)
-    arquivo_local = "dadosreais.json"
-    
-    if os.path.exists(arquivo_local):
-        try:
-            with open(arquivo_local, "r") as f:
-                data_local = json.load(f)
-            
-            for k, v in data_local.items():
-                ts = v.get("timestamp")
-                if ts:
-                    rows.append({"timestamp": pd.to_datetime(ts), "origem": "Histórico"})
-            print(f"Carregados {len(data_local)} registros do histórico local.")
-        except Exception as e:
-            print(f"Erro ao ler JSON local: {e}")
-    else:
-        print("Arquivo 'dadosreais.json' não encontrado. Usando apenas Firebase.")
+JANELA_MEDIA_MOVEL = 4
 
+def analise_dados(sincronizar=True, sala=SALA_UNICA):
+    """
+    Série diária de acessos da sala, média móvel e previsão do próximo dia.
+    Retorna um dicionário com os resultados (ou None se não houver dados);
+    o texto e o gráfico são montados por formatar_metricas() e pelo módulo graficos.
+    """
     # ==========================================================
-    # 2. CARREGAR DADOS EM TEMPO REAL (Firebase)
-    URL = "https://controle-de-acesso-iot-default-rtdb.firebaseio.com/eventos.json"
-    
-    try:
-        response = requests.get(URL)
-        if response.status_code == 200 and response.json():
-            data_cloud = response.json()
-            count_cloud = 0
-            for k, v in data_cloud.items():
-                ts = v.get("timestamp")
-                if ts:
-                    rows.append({"timestamp": pd.to_datetime(ts), "origem": "Tempo Real"})
-                    count_cloud += 1
-            print(f"Carregados {count_cloud} registros do Firebase.")
-    except Exception as e:
-        print(f"Erro ao baixar dados do Firebase: {e}")
+    # 1. SINCRONIZAR ARMAZENAMENTO LOCAL (histórico + eventos novos do Firebase)
+    caminho = caminho_banco(sala)
+    if sincronizar:
+        atualizar_sala(sala)
 
     # ==========================================================
-    # 3. LIMPEZA
-    if not rows:
-        print("Nenhum dado disponível (nem local, nem nuvem).")
-        return
-
-    df = pd.DataFrame(rows)
-    df = df.drop_duplicates(subset=["timestamp"])
-    
-    df["date"] = df["timestamp"].dt.date
+    # 2. CARREGAR AGREGADOS DIÁRIOS (mantidos na ingestão, O(dias))
+    daily = carregar_serie_diaria(caminho)
+    if daily.empty:
+        return None
 
-    daily = df.groupby("date").size().reset_index(name="acessos")
-    daily = daily.sort_values("date").reset_index(drop=True)
+    contagem = contagem_por_origem(caminho)
+    count_local = contagem.get(ORIGEM_HISTORICO, 0)
+    count_cloud = sum(contagem.values()) - count_local
 
     # ==========================================================
-    # 4. APLICAÇÃO DA MÉDIA MÓVEL E PREDIÇÃO
-    window = 4
+    # 3. MÉDIA MÓVEL (tendência do gráfico) E PREDIÇÃO
+    window = JANELA_MEDIA_MOVEL
     daily["ma"] = daily["acessos"].rolling(window).mean().fillna(0)
 
-    # --- LÓGICA DE VALIDAÇÃO (Performance no último dia real) ---
-    if len(daily) > window:
-        idx_validacao = daily.index[-1]
-        real_validacao = int(daily.loc[idx_validacao, "acessos"])
-        pred_validacao = daily.loc[idx_validacao-window:idx_validacao-1, "acessos"].mean()
-        
-        mae = abs(real_validacao - pred_validacao)
-        rmse = sqrt((real_validacao - pred_validacao)**2)
-        accuracy = (1 - mae / real_validacao) if real_validacao != 0 else 0
-        if accuracy < 0: accuracy = 0
+    # --- VALIDAÇÃO (backtest de todos os modelos em todos os dias) ---
+    selecao = selecionar_modelo(daily["date"].tolist(), daily["acessos"].to_numpy(),
+                                versao_dados(caminho), serie=caminho)
 
-        print("\n--- PERFORMANCE (Validação Último Dia) ---")
-        print(f"Data: {daily.iloc[-1]['date']}")
-        print(f"Real: {real_validacao} | Estimado: {pred_validacao:.2f}")
-        print(f"Acurácia: {accuracy:.2%}")
+    # --- LÓGICA DE PREVISÃO FUTURA (melhor modelo do backtest) ---
+    pred_futura = selecao["previsao"]
+    data_futura = selecao["data_futura"]
 
-    # --- LÓGICA DE PREVISÃO FUTURA ---
-    pred_futura = daily["acessos"].tail(window).mean()
-    ultima_data = daily.iloc[-1]["date"]
-    data_futura = ultima_data + timedelta(days=1)
+    return {
+        "daily": daily,
+        "window": window,
+        "modelos": selecao["modelos"],
+        "melhor_modelo": selecao["melhor"],
+        "data_futura": data_futura,
+        "pred_futura": pred_futura,
+        "registros_local": count_local,
+        "registros_firebase": count_cloud,
+    }
 
-    print(f"\nPREVISÃO PARA {data_futura}: {int(pred_futura)} acessos esperados.")
+def carregar_serie_diaria(caminho=CAMINHO_BANCO):
+    """DataFrame (date, acessos) a partir da tabela materializada de agregados"""
+    daily = pd.DataFrame(carregar_agregados_diarios(caminho), columns=["date", "acessos"])
+    daily["date"] = pd.to_datetime(daily["date"]).dt.date
+    return daily
 
-    # ==========================================================
-    # 5. PLOTAGEM
-    plt.plot(daily["date"], daily["acessos"], marker="o", label="Histórico Unificado", color='#1f77b4')
-    plt.plot(daily["date"], daily["ma"], linestyle='--', label=f"Tendência ({window}d)", color='#ff7f0e')
-    
-    # Ponto da Previsão Futura
-    plt.scatter([pd.to_datetime(data_futura)], [pred_futura], color='red', s=120, zorder=5, label=f"Prev: {data_futura}")
-    
-    plt.title(f"Análise de Demanda (Tempo Real)\nPrevisão {data_futura}: {int(pred_futura)} pessoas")
-    plt.xlabel("Data")
-    plt.ylabel("Acessos")
-    plt.grid(True, alpha=0.3)
-    plt.legend()
-    plt.xticks(rotation=45)
\ No newline at end of file
+def serie_diaria_completa(caminho=CAMINHO_BANCO):
+    """Recalcula a série diária varrendo todos os eventos (para conferência dos agregados)"""
+    dias, acessos = np.unique(datas(carregar_tabela(caminho)), return_counts=True)
+    return pd.DataFrame({"date": dias.astype(object), "acessos": acessos})
+
+def conferir_agregados(reconstruir=False, sala=SALA_UNICA):
+    """
+    Compara os agregados incrementais do banco da sala com o recálculo completo.
+    Com reconstruir=True, refaz os agregados antes de comparar.
+    """
+    caminho = caminho_banco(sala)
+    if reconstruir:
+        conn = conectar(caminho)
+        try:
+            reconstruir_agregados(conn)
+        finally:
+            conn.close()
+    incremental = carregar_serie_diaria(caminho)
+    completa = serie_diaria_completa(caminho)
+    return incremental["acessos"].astype(int).tolist() == completa["acessos"].astype(int).tolist() \
+        and incremental["date"].tolist() == completa["date"].tolist()
+
+def formatar_metricas(resultado):
+    """Texto das métricas no mesmo formato que o relatório de terminal usava"""
+    if resultado is None:
+        return "Nenhum dado disponível (nem local, nem nuvem).\n"
+
+    linhas = [
+        f"Carregados {resultado['registros_local']} registros do histórico local.",
+        f"Carregados {resultado['registros_firebase']} registros do Firebase.",
+    ]
+    modelos = resultado["modelos"]
+    if modelos:
+        dias = next(iter(modelos.values()))["dias"]
+        linhas += [
+            f"\n--- PERFORMANCE (Backtest em {dias} dias) ---",
+            f"{'Modelo':<15}{'MAE':>7}{'RMSE':>7}{'MAPE':>8}",
+        ]
+        for nome, m in sorted(modelos.items(), key=lambda item: item[1]["rmse"]):
+            marca = " *" if nome == resultado["melhor_modelo"] else ""
+            linhas.append(f"{nome:<15}{m['mae']:>7.2f}{m['rmse']:>7.2f}{m['mape']:>8.1%}{marca}")
+    modelo = resultado["melhor_modelo"] or "média simples"
+    linhas.append(
+        f"\nPREVISÃO PARA {resultado['data_futura']}: {int(resultado['pred_futura'])} acessos esperados ({modelo})."
+    )
+    return "\n".join(linhas) + "\n"
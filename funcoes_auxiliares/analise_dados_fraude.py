@@ -1,195 +1,189 @@
-import json
-import requests
-import os
-from datetime import datetime
-from collections import defaultdict, Counter
-import matplotlib.pyplot as plt
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+from funcoes_auxiliares.armazenamento_eventos import SALA_UNICA, atualizar_sala, caminho_banco
+from funcoes_auxiliares.deteccao_janela import detectar_colunas
+from funcoes_auxiliares.modelo_eventos import (
+    LEITOR_DESCONHECIDO,
+    LEITOR_ENTRADA,
+    LEITOR_SAIDA,
+    carregar_tabela,
+    horas_do_dia,
+    nomes_leitor,
+)
+from funcoes_auxiliares.pontuacao_tempo_real import (
+    LIMITE_PERMANENCIA_MIN,
+    LIMITE_SCORE_FRAUDE,
+    LIMITE_SCORE_SUSPEITO,
+)
 
+# =====================================================
+# PERFIL E MOTOR DE REGRAS
+def calcular_perfil(tabela):
+    """
+    Média das horas de entrada e de saída de cada cartão.
+    tabela: tabela colunar de modelo_eventos.
+    """
+    codigos = tabela["cartao"].cat.codes.to_numpy()
+    conhecidos = codigos >= 0
+    n = len(tabela["cartao"].cat.categories)
+    hora = horas_do_dia(tabela)
+    leitor = tabela["leitor"].to_numpy()
+
+    medias = {}
+    for coluna, codigo_leitor in (("media_entrada", LEITOR_ENTRADA), ("media_saida", LEITOR_SAIDA)):
+        mascara = conhecidos & (leitor == codigo_leitor)
+        soma = np.bincount(codigos[mascara], weights=hora[mascara], minlength=n)
+        qtd = np.bincount(codigos[mascara], minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias[coluna] = np.where(qtd > 0, soma / qtd, np.nan)
+    return pd.DataFrame(medias, index=tabela["cartao"].cat.categories)
+
+
+def motor_regras(tabela, entre_cartoes=True):
+    """
+    Aplica as regras de fraude de forma vetorizada, comparando cada evento com o
+    anterior do mesmo cartão (eventos ordenados por cartão e horário); as regras
+    de janela (deteccao_janela) rodam num laço em ordem cronológica.
+    tabela: tabela colunar de modelo_eventos (timestamp, cartao, leitor, permitido).
+    entre_cartoes=False: sem as regras de janela que comparam cartões diferentes
+    (para uma tabela que não tem o histórico da sala inteira).
+    Retorna um DataFrame com cartao, timestamp, leitor, score, classificacao e motivos.
+    """
+    # Ordem cronológica; cartões na ordem em que aparecem pela primeira vez
+    df = tabela.sort_values("timestamp", kind="stable")
+    codigos = df["cartao"].cat.codes.to_numpy()
+    _, primeira, inverso = np.unique(codigos, return_index=True, return_inverse=True)
+    grupo = np.argsort(np.argsort(primeira))[inverso]
+    ordem = np.argsort(grupo, kind="stable")
+    df = df.iloc[ordem].reset_index(drop=True)
+    grupo = grupo[ordem]
+
+    ts = df["timestamp"].to_numpy()
+    leitor = df["leitor"].to_numpy()
+    hora = horas_do_dia(df)
+
+    mesmo_cartao = np.r_[False, grupo[1:] == grupo[:-1]]
+    leitor_anterior = np.r_[LEITOR_DESCONHECIDO, leitor[:-1]]
+    eh_entrada = leitor == LEITOR_ENTRADA
+
+    # --- Regra 1: Sequência Inválida ---
+    r_sequencia = mesmo_cartao & (leitor == leitor_anterior)
+
+    # --- Regra 2: Permanência muito curta ---
+    tempo = np.r_[0, np.abs(np.diff(ts))] / 60
+    r_permanencia = (
+        mesmo_cartao & (leitor_anterior == LEITOR_ENTRADA) & (leitor == LEITOR_SAIDA)
+        & (tempo < LIMITE_PERMANENCIA_MIN)
+    )
+
+    # --- Regra 3: Horário Atípico (desvio de 4h ou mais da média de entrada) ---
+    soma = np.bincount(grupo, weights=np.where(eh_entrada, hora, 0))
+    qtd = np.bincount(grupo, weights=eh_entrada)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = (soma / qtd)[grupo]
+    r_horario = eh_entrada & (np.abs(hora - media) >= 4)
+
+    # --- Regra 4: Cartão Bloqueado ---
+    r_negado = ~df["permitido"].to_numpy()
+
+    # --- Regra 5: Padrões impossíveis na janela recente (detector percorre em ordem cronológica) ---
+    leitor_nome = nomes_leitor(leitor)
+    cronologica = np.argsort(ordem)
+    pontos_janela, motivos_cronologicos = detectar_colunas(
+        ts[cronologica].tolist(), df["cartao"].cat.codes.to_numpy()[cronologica].tolist(),
+        leitor_nome[cronologica].tolist(), (~r_negado)[cronologica].tolist(),
+        r_sequencia[cronologica].tolist(), entre_cartoes=entre_cartoes,
+    )
+    r_janela = np.zeros(len(df), dtype=np.int64)
+    r_janela[cronologica] = pontos_janela
+    motivos_janela = [None] * len(df)
+    for linha, m in zip(cronologica.tolist(), motivos_cronologicos):
+        motivos_janela[linha] = m
+
+    score = 3 * r_sequencia + 2 * r_permanencia + 3 * r_horario + 5 * r_negado + r_janela
+    classificacao = np.select(
+        [score >= LIMITE_SCORE_FRAUDE, score >= LIMITE_SCORE_SUSPEITO],
+        ["FRAUDULENTO", "SUSPEITO"],
+        default="NORMAL",
+    )
+
+    # Textos dos motivos só para os eventos que pontuaram
+    motivos = [[] for _ in range(len(df))]
+    for i in np.flatnonzero(score > 0):
+        if r_sequencia[i]:
+            motivos[i].append(f"Sequência inválida ({leitor_nome[i]} duplicada)")
+        if r_permanencia[i]:
+            motivos[i].append(f"Permanência suspeita ({int(tempo[i])}min)")
+        if r_horario[i]:
+            motivos[i].append("Horário fora do perfil habitual")
+        if r_negado[i]:
+            motivos[i].append("Acesso Negado pelo Hardware")
+        motivos[i] += motivos_janela[i]
+
+    return pd.DataFrame({
+        "cartao": df["cartao"],
+        "timestamp": pd.to_datetime(ts, unit="s"),
+        "leitor": leitor_nome,
+        "score": score.astype(np.int8),
+        "classificacao": classificacao,
+        "motivos": motivos,
+    })
 
-LIMITE_SCORE_FRAUDE = 4
-LIMITE_SCORE_SUSPEITO = 2
-LIMITE_PERMANENCIA_MIN = 1  # minutos
-
-# URL do Firebase
-URL_FIREBASE = "https://controle-de-acesso-iot-default-rtdb.firebaseio.com/eventos.json"
-
-def parse_timestamp(ts):
-    # Trata timestamps com ou sem milissegundos
-    try:
-        return datetime.fromisoformat(ts.replace('Z', '+00:00'))
-    except:
-        return datetime.now() # Fallback em caso de erro
-
-def minutos_entre(t1, t2):
-    return abs((t2 - t1).total_seconds()) / 60
 
 # =====================================================
 # FUNÇÃO PRINCIPAL
-def plotar_analise():
-    eventos = []
-    ids_processados = set()
-
-    # =====================================================
-    # 1. ETL: CARREGAR DADOS LOCAIS
-    if os.path.exists("dadosreais.json"):
-        try:
-            with open("dadosreais.json", "r", encoding="utf-8") as f:
-                dados_local = json.load(f)
-            
-            for id_evento, evento in dados_local.items():
-                # Normaliza para lista
-                eventos.append({
-                    "origem": "JSON",
-                    "cartao": evento.get("cartao"),
-                    "timestamp": parse_timestamp(evento.get("timestamp")),
-                    "leitor": evento.get("leitor"),
-                    "permitido": evento.get("acesso_permitido")
-                })
-                chave_unica = f"{evento.get('timestamp')}-{evento.get('cartao')}"
-                ids_processados.add(chave_unica)
-                
-            print(f"Carregados {len(dados_local)} eventos locais.")
-        except Exception as e:
-            print(f"Erro ao ler JSON local: {e}")
-
+def analise_fraude(sincronizar=True, sala=SALA_UNICA):
+    """
+    Executa o motor de regras sobre todo o histórico da sala.
+    Retorna {"resultados": DataFrame pontuado, "contagem": {classificação: qtd},
+    "total_eventos": n, "registros_local": ..., "registros_firebase": ...}
+    ou None se não houver eventos.
+    """
     # =====================================================
-    # 2. ETL: CARREGAR DADOS TEMPO REAL (FIREBASE)
-    try:
-        response = requests.get(URL_FIREBASE)
-        if response.status_code == 200 and response.json():
-            dados_cloud = response.json()
-            count_cloud = 0
-            
-            for id_evento, evento in dados_cloud.items():
-                ts_str = evento.get("timestamp")
-                cartao = evento.get("cartao")
-                
-                # Verifica duplicidade
-                chave_unica = f"{ts_str}-{cartao}"
-                if chave_unica in ids_processados:
-                    continue # Pula se já veio do JSON
-                
-                eventos.append({
-                    "origem": "Firebase",
-                    "cartao": cartao,
-                    "timestamp": parse_timestamp(ts_str),
-                    "leitor": evento.get("leitor"),
-                    "permitido": evento.get("acesso_permitido")
-                })
-                count_cloud += 1
-            print(f"Carregados {count_cloud} novos eventos do Firebase.")
-    except Exception as e:
-        print(f"Erro ao conectar no Firebase: {e}")
-
-    # =====================================================
-    # 3. ORDENAÇÃO E PREPARAÇÃO
-    if not eventos:
-        print("Nenhum evento para analisar.")
-        return
-
-    # Ordenação cronológica obrigatória para detectar sequência
-    eventos.sort(key=lambda x: x["timestamp"])
-
-    # =====================================================
-    # 4. AGRUPAMENTO E PERFIL
-    eventos_por_cartao = defaultdict(list)
-    for e in eventos:
-        eventos_por_cartao[e["cartao"]].append(e)
-    perfil = {}
-    for cartao, evs in eventos_por_cartao.items():
-        entradas = [e["timestamp"].hour for e in evs if e["leitor"] == "entrada"]
-        saidas = [e["timestamp"].hour for e in evs if e["leitor"] == "saida"]
-
-        perfil[cartao] = {
-            "media_entrada": sum(entradas) / len(entradas) if entradas else None,
-            "media_saida": sum(saidas) / len(saidas) if saidas else None
-        }
-# =====================================================
-    # 5. MOTOR DE REGRAS (DETECÇÃO DE FRAUDE)
-    resultados = []
-
-    for cartao, evs in eventos_por_cartao.items():
-        ultimo_evento = None
-
-        for e in evs:
-            score = 0
-            motivos = []
-
-            # --- Regra 1: Sequência Inválida ---
-            if ultimo_evento:
-                if ultimo_evento["leitor"] == e["leitor"]:
-                    score += 3
-                    motivos.append(f"Sequência inválida ({e['leitor']} duplicada)")
-
-            # --- Regra 2: Permanência muito curta  ---
-            if ultimo_evento and ultimo_evento["leitor"] == "entrada" and e["leitor"] == "saida":
-                tempo = minutos_entre(ultimo_evento["timestamp"], e["timestamp"])
-                if tempo < LIMITE_PERMANENCIA_MIN:
-                    score += 2
-                    motivos.append(f"Permanência suspeita ({int(tempo)}min)")
-
-            # --- Regra 3: Horário Atípico ---
-            media = perfil[cartao]["media_entrada"]
-            if e["leitor"] == "entrada" and media is not None:
-                # Se desviar mais de 4 horas da média habitual
-                if abs(e["timestamp"].hour - media) >= 4:
-                    score += 3
-                    motivos.append("Horário fora do perfil habitual")
-            
-            # --- Regra 4: Cartão Bloqueado ---
-            if e["permitido"] == False:
-                 score += 5
-                 motivos.append("Acesso Negado pelo Hardware")
-
-            if score >= LIMITE_SCORE_FRAUDE:
-                classificacao = "FRAUDULENTO"
-            elif score >= LIMITE_SCORE_SUSPEITO:
-                classificacao = "SUSPEITO"
-            else:
-                classificacao = "NORMAL"
-
-            resultados.append({
-                "cartao": cartao,
-                "timestamp": e["timestamp"],
-                "leitor": e["leitor"],
-                "score": score,
-                "classificacao": classificacao,
-                "motivos": motivos
-            })
-
-            ultimo_evento = e
+    # 1. ETL: SINCRONIZAR ARMAZENAMENTO LOCAL
+    if sincronizar:
+        atualizar_sala(sala)
 
     # =====================================================
-    # 6. RELATÓRIO NO TERMINAL
-    print("\n===== RELATÓRIO DE ANOMALIAS DETECTADAS =====")
-    fraudes_detectadas = 0
-    for r in resultados:
-        if r["classificacao"] != "NORMAL":
-            fraudes_detectadas += 1
-            print(f"🔴 [{r['classificacao']}] Cartão: {r['cartao']}")
-            print(f"   Hora: {r['timestamp'].strftime('%d/%m %H:%M')}")
-            print(f"   Motivo: {', '.join(r['motivos'])}")
-            print("-" * 40)
-    
-    if fraudes_detectadas == 0:
-        print("Nenhuma anomalia grave detectada nos registros.")
+    # 2. ETL: TABELA COLUNAR DEDUPLICADA (timestamp, cartao, leitor)
+    tabela = carregar_tabela(caminho_banco(sala))
+    if tabela.empty:
+        return None
 
     # =====================================================
-    # 7. PLOTAGEM 
-    classificacoes = [r["classificacao"] for r in resultados]
-    contagem = Counter(classificacoes)
-    cores = []
-    for k in contagem.keys():
-        if k == 'NORMAL': cores.append('green')
-        elif k == 'SUSPEITO': cores.append('orange')
-        elif k == 'FRAUDULENTO': cores.append('red')
-        else: cores.append('blue')
-
-    plt.bar(contagem.keys(), contagem.values(), color=cores)
-    plt.title(f"Auditoria de Segurança ({len(eventos)} eventos analisados)")
-    plt.xlabel("Categoria de Risco")
-    plt.ylabel("Qtd de Eventos")
-    plt.grid(axis='y', alpha=0.3)
-    
-    for i, v in enumerate(contagem.values()):
-        plt.text(i, v, str(v), ha='center', va='bottom', fontweight='bold')
\ No newline at end of file
+    # 3. MOTOR DE REGRAS (DETECÇÃO DE FRAUDE)
+    resultados = motor_regras(tabela)
+    do_historico = int((tabela["origem"] == 0).sum())
+
+    return {
+        "resultados": resultados,
+        "contagem": dict(Counter(resultados["classificacao"])),
+        "total_eventos": len(tabela),
+        "registros_local": do_historico,
+        "registros_firebase": len(tabela) - do_historico,
+    }
+
+
+def formatar_relatorio(resultado):
+    """Relatório de anomalias em texto (antes impresso no terminal)"""
+    if resultado is None:
+        return "Nenhum evento para analisar.\n"
+
+    linhas = [
+        f"Carregados {resultado['registros_local']} eventos locais.",
+        f"Carregados {resultado['registros_firebase']} novos eventos do Firebase.",
+        "\n===== RELATÓRIO DE ANOMALIAS DETECTADAS =====",
+    ]
+    resultados = resultado["resultados"]
+    anomalias = resultados[resultados["classificacao"] != "NORMAL"]
+    for r in anomalias.to_dict("records"):
+        linhas.append(f"🔴 [{r['classificacao']}] Cartão: {r['cartao']}")
+        linhas.append(f"   Hora: {r['timestamp'].strftime('%d/%m %H:%M')}")
+        linhas.append(f"   Motivo: {', '.join(r['motivos'])}")
+        linhas.append("-" * 40)
+
+    if len(anomalias) == 0:
+        linhas.append("Nenhuma anomalia grave detectada nos registros.")
+    return "\n".join(linhas) + "\n"
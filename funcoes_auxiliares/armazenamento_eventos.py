@@ -0,0 +1,407 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from funcoes_auxiliares import segmentos
+from funcoes_auxiliares.cliente_firebase import SALA_UNICA, URL_EVENTOS, requisitar, salas, url_no
+from funcoes_auxiliares.leitura_streaming import ler_lotes
+
+# =====================================================
+# CONFIGURAÇÕES
+ARQUIVO_HISTORICO = "dadosreais.json"
+CAMINHO_BANCO = os.getenv("caminho_banco_eventos", "eventos.db")
+
+INTERVALO_CONSULTA = 60    # segundos entre sincronizações pedidas por comandos dos bots
+
+ORIGEM_HISTORICO = "historico"
+ORIGEM_FIREBASE = "firebase"
+
+CAMPOS = (
+    "timestamp",
+    "cartao",
+    "acesso_permitido",
+    "acesso_negado",
+    "fraudulento",
+    "leitor",
+    "ocupacao_apos_evento",
+)
+
+# Índice por cartão: para cada UID, timestamps em ordem com o rowid do evento
+# (busca O(log n) + eventos do cartão, mantido pelo SQLite a cada inserção)
+_INDICE_CARTAO = "CREATE INDEX IF NOT EXISTS idx_unicos_cartao ON eventos_unicos (cartao, timestamp, linha)"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS eventos (
+    chave TEXT PRIMARY KEY,
+    origem TEXT NOT NULL,
+    timestamp TEXT,
+    cartao TEXT,
+    acesso_permitido INTEGER,
+    acesso_negado INTEGER,
+    fraudulento INTEGER,
+    leitor TEXT,
+    ocupacao_apos_evento INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+
+-- Agregados materializados (mantidos na ingestão).
+-- Acessos contam um evento por (timestamp, cartao, leitor), a mesma
+-- deduplicação de modelo_eventos.deduplicar(); 'linha' é o rowid da primeira
+-- ocorrência em eventos.
+CREATE TABLE IF NOT EXISTS eventos_unicos (
+    timestamp TEXT NOT NULL,
+    cartao TEXT,
+    leitor TEXT,
+    linha INTEGER NOT NULL,
+    UNIQUE (timestamp, cartao, leitor)
+);
+CREATE TABLE IF NOT EXISTS agregados_diarios (
+    data TEXT PRIMARY KEY,
+    acessos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agregados_horarios (
+    data TEXT NOT NULL,
+    hora INTEGER NOT NULL,
+    acessos INTEGER NOT NULL,
+    PRIMARY KEY (data, hora)
+);
+CREATE TABLE IF NOT EXISTS contagem_origem (
+    origem TEXT PRIMARY KEY,
+    registros INTEGER NOT NULL
+);
+"""
+
+_ultima_atualizacao = {}    # caminho do banco -> time.monotonic() da última sincronização
+_lock_atualizacao = threading.Lock()
+
+VERSAO_AGREGADOS = "1"
+CHAVE_DEDUP = ("timestamp", "cartao", "leitor")
+
+
+# =====================================================
+# CONEXÃO E METADADOS
+def conectar(caminho=CAMINHO_BANCO):
+    """Abre (e cria, se preciso) o banco SQLite local de eventos"""
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.executescript(_ESQUEMA)
+    if ler_meta(conn, "versao_agregados") != VERSAO_AGREGADOS:
+        reconstruir_agregados(conn)
+    conn.execute(_INDICE_CARTAO)
+    return conn
+
+
+def ler_meta(conn, chave, padrao=None):
+    linha = conn.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+    return linha[0] if linha else padrao
+
+
+def gravar_meta(conn, chave, valor):
+    conn.execute(
+        "INSERT INTO meta (chave, valor) VALUES (?, ?) "
+        "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor",
+        (chave, str(valor)),
+    )
+
+
+# =====================================================
+# INGESTÃO
+def inserir_eventos(conn, eventos, origem):
+    """
+    Grava um dicionário {chave: evento} no banco, ignorando chaves já conhecidas.
+    Retorna a quantidade de eventos novos.
+    """
+    linhas = []
+    for chave, evento in eventos.items():
+        if not isinstance(evento, dict):
+            continue
+        linhas.append((chave, origem) + tuple(evento.get(c) for c in CAMPOS))
+
+    # MAX(rowid) e a inserção na mesma transação de escrita: duas conexões
+    # sincronizando ao mesmo tempo (comandos, salas, tarefa periódica) leriam o
+    # mesmo MAX(rowid) e a segunda somaria de novo aos agregados as linhas da primeira
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    ultima_linha = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM eventos").fetchone()[0]
+    antes = conn.total_changes
+    conn.executemany(
+        "INSERT OR IGNORE INTO eventos (chave, origem, " + ", ".join(CAMPOS) + ") "
+        "VALUES (?, ?" + ", ?" * len(CAMPOS) + ")",
+        linhas,
+    )
+    novos = conn.total_changes - antes
+    if novos:
+        _atualizar_agregados(conn, ultima_linha)
+    return novos
+
+
+# =====================================================
+# AGREGADOS (acessos por dia e por hora)
+def _atualizar_agregados(conn, desde_linha):
+    """Soma aos agregados os eventos com rowid > desde_linha"""
+    conn.execute(
+        "INSERT INTO contagem_origem (origem, registros) "
+        "SELECT origem, COUNT(*) FROM eventos "
+        "WHERE rowid > ? AND timestamp IS NOT NULL AND timestamp != '' GROUP BY origem "
+        "ON CONFLICT(origem) DO UPDATE SET registros = registros + excluded.registros",
+        (desde_linha,),
+    )
+
+    ultimo_unico = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM eventos_unicos").fetchone()[0]
+    conn.execute(
+        "INSERT OR IGNORE INTO eventos_unicos (timestamp, cartao, leitor, linha) "
+        "SELECT timestamp, COALESCE(cartao, ''), COALESCE(leitor, ''), rowid FROM eventos "
+        "WHERE rowid > ? AND timestamp IS NOT NULL AND timestamp != '' ORDER BY rowid",
+        (desde_linha,),
+    )
+    conn.execute(
+        "INSERT INTO agregados_diarios (data, acessos) "
+        "SELECT substr(timestamp, 1, 10), COUNT(*) FROM eventos_unicos "
+        "WHERE rowid > ? GROUP BY 1 "
+        "ON CONFLICT(data) DO UPDATE SET acessos = acessos + excluded.acessos",
+        (ultimo_unico,),
+    )
+    conn.execute(
+        "INSERT INTO agregados_horarios (data, hora, acessos) "
+        "SELECT substr(timestamp, 1, 10), CAST(substr(timestamp, 12, 2) AS INTEGER), COUNT(*) "
+        "FROM eventos_unicos WHERE rowid > ? GROUP BY 1, 2 "
+        "ON CONFLICT(data, hora) DO UPDATE SET acessos = acessos + excluded.acessos",
+        (ultimo_unico,),
+    )
+
+
+def reconstruir_agregados(conn):
+    """
+    Recalcula todos os agregados a partir da tabela de eventos.
+    'geracao_agregados' muda a cada reconstrução: quem guarda posições em
+    eventos_unicos (ocupacao_serie) sabe que precisa recomeçar.
+    """
+    with conn:
+        for tabela in ("eventos_unicos", "agregados_diarios", "agregados_horarios", "contagem_origem"):
+            conn.execute(f"DELETE FROM {tabela}")
+        _atualizar_agregados(conn, 0)
+        gravar_meta(conn, "versao_agregados", VERSAO_AGREGADOS)
+        gravar_meta(conn, "geracao_agregados", int(ler_meta(conn, "geracao_agregados", 0)) + 1)
+
+
+def importar_historico_local(conn, arquivo=ARQUIVO_HISTORICO):
+    """Importa o JSON (ou JSONL) local apenas quando ele mudou desde a última importação"""
+    if not os.path.exists(arquivo):
+        print(f"Arquivo '{arquivo}' não encontrado. Usando apenas Firebase.")
+        return 0
+
+    assinatura = f"{os.path.getmtime(arquivo)}-{os.path.getsize(arquivo)}"
+    if ler_meta(conn, "assinatura_historico") == assinatura:
+        return 0
+
+    # Leitura em lotes: a memória não cresce com o tamanho do arquivo
+    novos = 0
+    with conn:
+        for lote in ler_lotes(arquivo):
+            novos += inserir_eventos(conn, lote, ORIGEM_HISTORICO)
+        gravar_meta(conn, "assinatura_historico", assinatura)
+    print(f"Importados {novos} registros do histórico local.")
+    return novos
+
+
+def importar_segmentos(conn, diretorio=segmentos.DIRETORIO_ARQUIVO):
+    """
+    Importa os dias arquivados de /eventos (segmentos.py) que ainda não estão no
+    banco ou que mudaram desde a última importação; os outros dias nem são abertos.
+    """
+    manifesto = segmentos.ler_manifesto(diretorio)
+    dias = manifesto["nos"].get("eventos", {})
+    importados = json.loads(ler_meta(conn, "segmentos_importados", "{}"))
+
+    novos = 0
+    for dia in segmentos.dias_disponiveis("eventos", manifesto=manifesto):
+        assinatura = f"{dias[dia]['registros']}:{dias[dia]['ultima_chave']}"
+        if importados.get(dia) == assinatura:
+            continue
+        with conn:
+            novos += inserir_eventos(conn, segmentos.ler_segmento("eventos", dia, diretorio), ORIGEM_HISTORICO)
+            importados[dia] = assinatura
+            gravar_meta(conn, "segmentos_importados", json.dumps(importados, sort_keys=True))
+    if novos:
+        print(f"Importados {novos} registros do arquivo de segmentos.")
+    return novos
+
+
+def sincronizar_firebase(conn, url=URL_EVENTOS, timeout=15):
+    """
+    Baixa somente os eventos com chave posterior à última sincronizada.
+    As push keys do Firebase são ordenáveis, então orderBy="$key"&startAt=<ultima>
+    devolve apenas o que chegou depois (startAt é inclusivo, por isso a última é descartada).
+    """
+    ultima_chave = ler_meta(conn, "ultima_chave_firebase")
+
+    params = {"orderBy": '"$key"'}
+    if ultima_chave:
+        params["startAt"] = json.dumps(ultima_chave)
+
+    response = requisitar(url, params=params, timeout=timeout)
+    dados_cloud = response.json() or {}
+    dados_cloud.pop(ultima_chave, None)
+
+    if not dados_cloud:
+        return 0
+
+    with conn:
+        novos = inserir_eventos(conn, dados_cloud, ORIGEM_FIREBASE)
+        # Outra sincronização pode ter gravado uma chave mais nova enquanto esta baixava
+        gravar_meta(conn, "ultima_chave_firebase",
+                    max(max(dados_cloud), ler_meta(conn, "ultima_chave_firebase") or ""))
+    return novos
+
+
+def atualizar_armazenamento(caminho=CAMINHO_BANCO, arquivo=ARQUIVO_HISTORICO, url=URL_EVENTOS,
+                            diretorio=segmentos.DIRETORIO_ARQUIVO):
+    """
+    Garante o histórico local e os segmentos arquivados importados e traz os
+    eventos novos do Firebase. arquivo=None: sem histórico local (salas de /salas/<id>).
+    """
+    conn = conectar(caminho)
+    try:
+        if arquivo is not None:
+            try:
+                importar_historico_local(conn, arquivo)
+            except Exception as e:
+                print(f"Erro ao ler JSON local: {e}")
+
+        try:
+            importar_segmentos(conn, diretorio)
+        except Exception as e:
+            print(f"Erro ao ler o arquivo de segmentos: {e}")
+
+        try:
+            novos = sincronizar_firebase(conn, url)
+            print(f"Sincronizados {novos} novos eventos do Firebase.")
+        except Exception as e:
+            print(f"Erro ao sincronizar com o Firebase: {e}")
+    finally:
+        conn.close()
+
+
+def atualizar_se_vencido(caminho=CAMINHO_BANCO, intervalo=INTERVALO_CONSULTA, arquivo=ARQUIVO_HISTORICO, url=URL_EVENTOS,
+                         diretorio=segmentos.DIRETORIO_ARQUIVO):
+    """
+    atualizar_armazenamento, no máximo uma vez por 'intervalo' segundos por banco
+    (para comandos interativos)
+    """
+    with _lock_atualizacao:
+        if time.monotonic() - _ultima_atualizacao.get(caminho, float("-inf")) < intervalo:
+            return
+        atualizar_armazenamento(caminho, arquivo, url, diretorio)
+        _ultima_atualizacao[caminho] = time.monotonic()
+
+
+# =====================================================
+# SALAS
+def caminho_banco(sala=SALA_UNICA):
+    """Banco da sala: CAMINHO_BANCO para a sala única, eventos_<sala>.db ao lado dele para as outras"""
+    if sala == SALA_UNICA:
+        return CAMINHO_BANCO
+    raiz, extensao = os.path.splitext(CAMINHO_BANCO)
+    return f"{raiz}_{sala}{extensao}"
+
+
+def diretorio_arquivo(sala=SALA_UNICA):
+    """Segmentos arquivados da sala: DIRETORIO_ARQUIVO para a sala única, <diretório>_<sala> para as outras"""
+    if sala == SALA_UNICA:
+        return segmentos.DIRETORIO_ARQUIVO
+    return f"{segmentos.DIRETORIO_ARQUIVO.rstrip(os.sep)}_{sala}"
+
+
+def banco_sala(sala=SALA_UNICA):
+    """
+    Argumentos de atualizar_armazenamento/atualizar_se_vencido para a sala:
+    {caminho, arquivo, url, diretorio}. O histórico local (dadosreais.json) é da
+    sala única; cada sala tem o seu banco, o seu nó no Firebase e os seus segmentos.
+    """
+    if sala == SALA_UNICA:
+        return {"caminho": CAMINHO_BANCO, "arquivo": ARQUIVO_HISTORICO, "url": URL_EVENTOS,
+                "diretorio": segmentos.DIRETORIO_ARQUIVO}
+    return {"caminho": caminho_banco(sala), "arquivo": None, "url": url_no("eventos", sala),
+            "diretorio": diretorio_arquivo(sala)}
+
+
+def atualizar_sala(sala=SALA_UNICA):
+    """atualizar_armazenamento do banco da sala"""
+    atualizar_armazenamento(**banco_sala(sala))
+
+
+def atualizar_salas():
+    """atualizar_sala de todas as salas configuradas (tarefa periódica do supervisor)"""
+    for sala in salas():
+        atualizar_sala(sala)
+
+
+# =====================================================
+# LEITURA
+def normalizar_cartao(cartao):
+    """UIDs são gravados em hexadecimal maiúsculo (ex.: C2514920)"""
+    return str(cartao).strip().upper()
+
+
+def ultima_chave_sincronizada(caminho=CAMINHO_BANCO):
+    conn = conectar(caminho)
+    try:
+        return ler_meta(conn, "ultima_chave_firebase")
+    finally:
+        conn.close()
+
+
+def versao_dados(caminho=CAMINHO_BANCO):
+    """Identifica o conteúdo atual do armazenamento (muda a cada evento inserido)"""
+    conn = conectar(caminho)
+    try:
+        maior_linha = conn.execute("SELECT MAX(rowid) FROM eventos").fetchone()[0]
+        return f"{maior_linha or 0}:{ler_meta(conn, 'ultima_chave_firebase', '')}"
+    finally:
+        conn.close()
+
+
+def carregar_agregados_diarios(caminho=CAMINHO_BANCO):
+    """Lista [(data 'AAAA-MM-DD', acessos)] em ordem de data"""
+    conn = conectar(caminho)
+    try:
+        return conn.execute("SELECT data, acessos FROM agregados_diarios ORDER BY data").fetchall()
+    finally:
+        conn.close()
+
+
+def carregar_agregados_horarios(caminho=CAMINHO_BANCO):
+    """Lista [(data, hora, acessos)] em ordem de data e hora"""
+    conn = conectar(caminho)
+    try:
+        return conn.execute(
+            "SELECT data, hora, acessos FROM agregados_horarios ORDER BY data, hora"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def contagem_por_origem(caminho=CAMINHO_BANCO):
+    """{origem: qtd de eventos com timestamp}"""
+    conn = conectar(caminho)
+    try:
+        return dict(conn.execute("SELECT origem, registros FROM contagem_origem").fetchall())
+    finally:
+        conn.close()
+
+
+def carregar_eventos(caminho=CAMINHO_BANCO):
+    """Retorna todos os eventos armazenados como lista de dicionários"""
+    conn = conectar(caminho)
+    conn.row_factory = sqlite3.Row
+    try:
+        linhas = conn.execute(
+            "SELECT chave, origem, " + ", ".join(CAMPOS) + " FROM eventos ORDER BY rowid"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(linha) for linha in linhas]
@@ -0,0 +1,165 @@
+"""
+Retenção: tira do Firebase o que passou do horizonte e guarda em segmentos locais.
+
+Para /eventos e /movimentos, lê o nó em páginas (orderBy="$key" + limitToFirst),
+separa os registros com timestamp anterior ao limite, grava-os nos segmentos
+diários (segmentos.py) e só então apaga esses registros do Firebase com um PATCH
+multi-caminho ({chave: null, ...}) por página. Os eventos também entram no
+banco local antes de sair do Firebase, então as análises não perdem nada.
+Em /presenca saem só os cartões fora da sala sem movimento desde o limite.
+Cada sala tem os seus nós, o seu banco e o seu diretório de segmentos
+(armazenamento_eventos.banco_sala); sem --sala, todas as salas configuradas.
+
+Uso (cron ou manual):
+    python -m funcoes_auxiliares.arquivamento --horizonte 30
+    python -m funcoes_auxiliares.arquivamento --horizonte 30 --sala lab1
+    python -m funcoes_auxiliares.arquivamento --historico dadosreais.json   # divide o JSON local em segmentos
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+from funcoes_auxiliares import metricas, segmentos
+from funcoes_auxiliares.armazenamento_eventos import (
+    ORIGEM_FIREBASE,
+    caminho_banco,
+    conectar,
+    diretorio_arquivo,
+    inserir_eventos,
+)
+from funcoes_auxiliares.cliente_firebase import SALA_UNICA, requisitar, salas, url_no
+from funcoes_auxiliares.fluxo_eventos import momento_da_chave
+from funcoes_auxiliares.leitura_streaming import ler_lotes
+
+# =====================================================
+# CONFIGURAÇÕES
+HORIZONTE_DIAS = int(os.getenv("horizonte_arquivo_dias", "30"))
+TAMANHO_PAGINA = 2000       # registros por GET
+NOS_COM_HISTORICO = ("eventos", "movimentos")
+
+
+def limite_do_horizonte(horizonte_dias=HORIZONTE_DIAS, agora=None):
+    """Instante de corte no formato do firmware (AAAA-MM-DDTHH:MM:SS, relógio local)"""
+    agora = agora or datetime.now()
+    return (agora - timedelta(days=horizonte_dias)).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _anterior_ao_limite(chave, registro, limite):
+    ts = registro.get("timestamp") if isinstance(registro, dict) else None
+    if isinstance(ts, str) and len(ts) >= 19:
+        return ts[:19] < limite
+    momento = momento_da_chave(chave)
+    if momento is not None:
+        return datetime.fromtimestamp(momento).strftime("%Y-%m-%dT%H:%M:%S") < limite
+    return False
+
+
+def _paginas(url, tamanho=TAMANHO_PAGINA):
+    """Percorre um nó em páginas de 'tamanho' registros, em ordem de chave"""
+    ultima = None
+    while True:
+        params = {"orderBy": '"$key"', "limitToFirst": tamanho + (1 if ultima else 0)}
+        if ultima:
+            params["startAt"] = json.dumps(ultima)
+        pagina = requisitar(url, params=params).json() or {}
+        pagina.pop(ultima, None)   # startAt é inclusivo
+        if not pagina:
+            return
+        yield pagina
+        ultima = max(pagina)
+        if len(pagina) < tamanho:
+            return
+
+
+def _apagar(url, chaves):
+    """Remove várias chaves de um nó numa única escrita multi-caminho"""
+    if chaves:
+        requisitar(url, metodo="PATCH", corpo={chave: None for chave in chaves})
+
+
+def arquivar_no(no, limite, diretorio=segmentos.DIRETORIO_ARQUIVO, conn=None, apagar=True,
+                tamanho_pagina=TAMANHO_PAGINA, sala=SALA_UNICA):
+    """Arquiva (e, se apagar=True, remove do Firebase) os registros de 'no' da sala anteriores ao limite"""
+    url = url_no(no, sala)
+    arquivados = 0
+    for pagina in _paginas(url, tamanho_pagina):
+        antigos = {k: v for k, v in pagina.items() if _anterior_ao_limite(k, v, limite)}
+        if not antigos:
+            continue
+        if conn is not None and no == "eventos":
+            with conn:
+                inserir_eventos(conn, antigos, ORIGEM_FIREBASE)
+        segmentos.gravar_segmentos(no, antigos, diretorio)
+        if apagar:
+            _apagar(url, list(antigos))
+        arquivados += len(antigos)
+    metricas.incrementar("arquivamento_registros_total", arquivados, no=no)
+    return arquivados
+
+
+def arquivar_presenca(limite, diretorio=segmentos.DIRETORIO_ARQUIVO, apagar=True, sala=SALA_UNICA):
+    """Arquiva os cartões de /presenca da sala que estão fora dela e sem movimento desde o limite"""
+    url = url_no("presenca", sala)
+    presenca = requisitar(url).json() or {}
+    parados = {
+        uid: registro for uid, registro in presenca.items()
+        if isinstance(registro, dict) and not registro.get("dentro")
+        and _anterior_ao_limite(uid, registro, limite)
+    }
+    if parados:
+        segmentos.gravar_segmentos("presenca", parados, diretorio)
+        if apagar:
+            _apagar(url, list(parados))
+    metricas.incrementar("arquivamento_registros_total", len(parados), no="presenca")
+    return len(parados)
+
+
+def arquivar(horizonte_dias=HORIZONTE_DIAS, diretorio=None, apagar=True, sala=SALA_UNICA):
+    """
+    Roda a retenção nos três nós da sala, com os eventos indo para o banco da sala.
+    diretorio=None: o diretório de segmentos da sala. Retorna {no: registros arquivados}
+    """
+    limite = limite_do_horizonte(horizonte_dias)
+    diretorio = diretorio_arquivo(sala) if diretorio is None else diretorio
+    conn = conectar(caminho_banco(sala))
+    try:
+        resultado = {
+            no: arquivar_no(no, limite, diretorio, conn, apagar, sala=sala)
+            for no in NOS_COM_HISTORICO
+        }
+    finally:
+        conn.close()
+    resultado["presenca"] = arquivar_presenca(limite, diretorio, apagar, sala)
+    return resultado
+
+
+def arquivar_historico_local(arquivo, diretorio=segmentos.DIRETORIO_ARQUIVO):
+    """Divide um JSON {chave: evento} (ex.: dadosreais.json) em segmentos diários de /eventos"""
+    gravados = {}
+    for lote in ler_lotes(arquivo):
+        gravados.update(segmentos.gravar_segmentos("eventos", lote, diretorio))
+    return gravados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizonte", type=int, default=HORIZONTE_DIAS, help="dias mantidos no Firebase")
+    parser.add_argument("--diretorio", help="diretório dos segmentos (padrão: o da sala)")
+    parser.add_argument("--sala", help="só esta sala (padrão: todas as salas configuradas)")
+    parser.add_argument("--sem-apagar", action="store_true", help="só copia para os segmentos")
+    parser.add_argument("--historico", help="arquivo JSON local a dividir em segmentos (não usa o Firebase)")
+    args = parser.parse_args()
+
+    if args.historico:
+        diretorio = args.diretorio or segmentos.DIRETORIO_ARQUIVO
+        dias = arquivar_historico_local(args.historico, diretorio)
+        print(f"{sum(dias.values())} eventos em {len(dias)} segmentos diários em '{diretorio}'.")
+    else:
+        lista = [args.sala] if args.sala is not None else salas()
+        if args.diretorio and len(lista) > 1:
+            parser.error("--diretorio só vale para uma sala (use --sala)")
+        for sala in lista:
+            resultado = arquivar(args.horizonte, args.diretorio, apagar=not args.sem_apagar, sala=sala)
+            for no, quantidade in resultado.items():
+                print(f"{'[' + sala + '] ' if sala else ''}/{no}: {quantidade} registros arquivados")
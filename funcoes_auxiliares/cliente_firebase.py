@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from funcoes_auxiliares import metricas
+
+# =====================================================
+# CONFIGURAÇÕES
+URL_BASE = os.getenv("url_firebase", "https://controle-de-acesso-iot-default-rtdb.firebaseio.com")
+URL_ESTADO = f"{URL_BASE}/estado.json"
+URL_EVENTOS = f"{URL_BASE}/eventos.json"
+
+# Salas monitoradas (ex.: salas=biblioteca,estudos2): cada uma em /salas/<id>/estado,
+# /salas/<id>/eventos e /salas/<id>/presenca. Sem a variável, a sala única dos nós da raiz.
+SALAS = tuple(s.strip() for s in os.getenv("salas", "").split(",") if s.strip())
+SALA_UNICA = ""
+
+TIMEOUT = 10                                        # segundos
+TTL_ESTADO = float(os.getenv("ttl_estado", "2"))    # segundos de cache do /estado
+TAMANHO_POOL = 20                                   # conexões keep-alive por host
+
+_sessao = None
+_lock_sessao = threading.Lock()
+
+_cache = {}       # chave -> (expira_em, valor)
+_em_voo = {}      # chave -> _Voo
+_lock = threading.Lock()
+_contadores = {"hits": 0, "misses": 0, "coalescidas": 0, "erros": 0}
+
+
+class _Voo:
+    """Busca em andamento, compartilhada pelas threads que pedem a mesma URL"""
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+# =====================================================
+# SESSÃO COMPARTILHADA
+def sessao():
+    """Sessão HTTP única (pool de conexões keep-alive) usada pelos dois bots"""
+    global _sessao
+    if _sessao is None:
+        with _lock_sessao:
+            if _sessao is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=TAMANHO_POOL, max_retries=3
+                )
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _sessao = s
+    return _sessao
+
+
+def requisitar(url, params=None, timeout=TIMEOUT, metodo="GET", corpo=None):
+    """
+    Requisição (GET por padrão) pela sessão compartilhada, registrando duração e
+    erros por caminho do Firebase. 'corpo' vai como JSON (PUT/PATCH/POST).
+    """
+    caminho = urlsplit(url).path
+    inicio = time.perf_counter()
+    try:
+        resp = sessao().request(metodo, url, params=params, json=corpo, timeout=timeout)
+        resp.raise_for_status()
+        return resp
+    except Exception as e:
+        metricas.incrementar("firebase_erros_total", caminho=caminho, tipo=type(e).__name__)
+        raise
+    finally:
+        metricas.observar("firebase_requisicao_segundos", time.perf_counter() - inicio, caminho=caminho)
+
+
+# =====================================================
+# CACHE + COALESCÊNCIA
+def buscar_json(url, params=None, ttl=0, timeout=TIMEOUT):
+    """
+    GET que devolve o JSON da resposta.
+    - ttl > 0: reaproveita a última resposta por ttl segundos;
+    - chamadas simultâneas para a mesma URL compartilham uma única requisição.
+    Erros HTTP/rede são propagados para todas as threads que esperavam.
+    """
+    chave = (url, tuple(sorted((params or {}).items())))
+
+    with _lock:
+        em_cache = _cache.get(chave)
+        if em_cache and em_cache[0] > time.monotonic():
+            _contadores["hits"] += 1
+            metricas.incrementar("firebase_cache_total", resultado="hit")
+            return em_cache[1]
+
+        voo = _em_voo.get(chave)
+        dono = voo is None
+        if dono:
+            voo = _Voo()
+            _em_voo[chave] = voo
+            _contadores["misses"] += 1
+        else:
+            _contadores["coalescidas"] += 1
+    metricas.incrementar("firebase_cache_total", resultado="miss" if dono else "coalescida")
+
+    if not dono:
+        voo.pronto.wait()
+        if voo.erro:
+            raise voo.erro
+        return voo.valor
+
+    try:
+        voo.valor = requisitar(url, params=params, timeout=timeout).json()
+        if ttl > 0:
+            with _lock:
+                _cache[chave] = (time.monotonic() + ttl, voo.valor)
+        return voo.valor
+    except Exception as e:
+        voo.erro = e
+        with _lock:
+            _contadores["erros"] += 1
+        raise
+    finally:
+        with _lock:
+            _em_voo.pop(chave, None)
+        voo.pronto.set()
+
+
+# =====================================================
+# SALAS
+def salas():
+    """Ids das salas configuradas; (SALA_UNICA,) sem a variável 'salas'"""
+    return SALAS or (SALA_UNICA,)
+
+
+def separar_sala(argumento):
+    """
+    Separa a sala do começo do argumento de um comando ("/pico lab1 2025-01-01 10:00").
+    Retorna (sala ou None, resto); na sala única, sempre (None, argumento).
+    """
+    partes = (argumento or "").strip().split(maxsplit=1)
+    if SALAS and partes and partes[0] in SALAS:
+        return partes[0], partes[1] if len(partes) > 1 else ""
+    return None, (argumento or "").strip()
+
+
+def url_no(no, sala=SALA_UNICA):
+    """URL REST de um nó da sala ('estado', 'eventos', 'presenca/<uid>', ...)"""
+    if sala == SALA_UNICA:
+        return f"{URL_BASE}/{no}.json"
+    return f"{URL_BASE}/salas/{sala}/{no}.json"
+
+
+def buscar_estado(ttl=None, sala=SALA_UNICA):
+    """Dicionário do nó /estado da sala (ocupacao_atual, limite_ocupacao, ...)"""
+    return buscar_json(url_no("estado", sala), ttl=TTL_ESTADO if ttl is None else ttl) or {}
+
+
+def buscar_estados(ttl=None, lista=None):
+    """
+    {sala: estado} das salas em 'lista' (todas, por padrão), com as requisições
+    feitas ao mesmo tempo (o tempo total é o da sala mais lenta, não a soma).
+    A sala cuja busca falhou aparece com a exceção no lugar do estado.
+    """
+    lista = salas() if lista is None else tuple(lista)
+    if not lista:
+        return {}
+    if len(lista) == 1:
+        try:
+            return {lista[0]: buscar_estado(ttl, lista[0])}
+        except Exception as e:
+            return {lista[0]: e}
+
+    with ThreadPoolExecutor(max_workers=min(len(lista), TAMANHO_POOL)) as executor:
+        futuros = {sala: executor.submit(buscar_estado, ttl, sala) for sala in lista}
+    estados = {}
+    for sala, futuro in futuros.items():
+        try:
+            estados[sala] = futuro.result()
+        except Exception as e:
+            estados[sala] = e
+    return estados
+
+
+def buscar_presenca(cartao=None, sala=SALA_UNICA):
+    """Nó /presenca/<uid> gravado pelo firmware ({dentro, timestamp}), ou None; sem cartão, o nó inteiro"""
+    if cartao is None:
+        return buscar_json(url_no("presenca", sala)) or {}
+    return buscar_json(url_no(f"presenca/{cartao}", sala))
+
+
+def invalidar_cache():
+    with _lock:
+        _cache.clear()
+
+
+def estatisticas():
+    """Contadores de hits/misses/coalescidas/erros desde o início do processo"""
+    with _lock:
+        return dict(_contadores)
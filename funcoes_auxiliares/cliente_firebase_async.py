@@ -0,0 +1,207 @@
+"""
+Cliente assíncrono (aiohttp) do Firebase para o modo asyncio do supervisor.
+
+Mesmo comportamento do cliente_firebase síncrono — sessão única com pool de
+conexões, cache com TTL, coalescência de pedidos iguais e métricas por caminho —
+e um OuvinteEventos cooperativo que segue o /eventos sem ocupar uma thread.
+Tudo aqui deve ser usado de dentro do mesmo event loop.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.cliente_firebase import SALA_UNICA, TAMANHO_POOL, TIMEOUT, TTL_ESTADO, salas, url_no
+from funcoes_auxiliares.fluxo_eventos import TIMEOUT_LEITURA, OuvinteEventos
+
+_sessao = None
+_cache = {}     # chave -> (expira_em, valor)
+_em_voo = {}    # chave -> Task compartilhada
+
+
+# =====================================================
+# SESSÃO + REQUISIÇÕES
+def sessao():
+    """ClientSession única do event loop (criada no primeiro uso)"""
+    global _sessao
+    if _sessao is None or _sessao.closed:
+        _sessao = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=TAMANHO_POOL))
+    return _sessao
+
+
+async def fechar():
+    global _sessao
+    if _sessao is not None and not _sessao.closed:
+        await _sessao.close()
+    _sessao = None
+
+
+async def requisitar_json(url, params=None, timeout=TIMEOUT):
+    """GET que devolve o JSON da resposta, registrando duração e erros por caminho"""
+    caminho = urlsplit(url).path
+    inicio = time.perf_counter()
+    try:
+        async with sessao().get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+    except Exception as e:
+        metricas.incrementar("firebase_erros_total", caminho=caminho, tipo=type(e).__name__)
+        raise
+    finally:
+        metricas.observar("firebase_requisicao_segundos", time.perf_counter() - inicio, caminho=caminho)
+
+
+async def buscar_json(url, params=None, ttl=0, timeout=TIMEOUT):
+    """
+    Igual ao buscar_json síncrono. A requisição roda numa Task compartilhada:
+    se um comando for cancelado (timeout), os outros que esperam a mesma URL
+    continuam recebendo a resposta.
+    """
+    chave = (url, tuple(sorted((params or {}).items())))
+
+    em_cache = _cache.get(chave)
+    if em_cache and em_cache[0] > time.monotonic():
+        metricas.incrementar("firebase_cache_total", resultado="hit")
+        return em_cache[1]
+
+    tarefa = _em_voo.get(chave)
+    if tarefa is None:
+        metricas.incrementar("firebase_cache_total", resultado="miss")
+        tarefa = asyncio.ensure_future(requisitar_json(url, params, timeout))
+        _em_voo[chave] = tarefa
+
+        def concluir(t):
+            _em_voo.pop(chave, None)
+            if ttl > 0 and not t.cancelled() and t.exception() is None:
+                _cache[chave] = (time.monotonic() + ttl, t.result())
+
+        tarefa.add_done_callback(concluir)
+    else:
+        metricas.incrementar("firebase_cache_total", resultado="coalescida")
+
+    return await asyncio.shield(tarefa)
+
+
+async def buscar_estado(ttl=None, sala=SALA_UNICA):
+    """Dicionário do nó /estado da sala (ocupacao_atual, limite_ocupacao, ...)"""
+    return await buscar_json(url_no("estado", sala), ttl=TTL_ESTADO if ttl is None else ttl) or {}
+
+
+async def buscar_estados(ttl=None, lista=None):
+    """{sala: estado ou exceção} das salas em 'lista' (todas, por padrão), buscados ao mesmo tempo"""
+    lista = salas() if lista is None else tuple(lista)
+    estados = await asyncio.gather(*(buscar_estado(ttl, sala) for sala in lista), return_exceptions=True)
+    return dict(zip(lista, estados))
+
+
+async def buscar_presenca(cartao=None, sala=SALA_UNICA):
+    """Nó /presenca/<uid> gravado pelo firmware ({dentro, timestamp}), ou None; sem cartão, o nó inteiro"""
+    if cartao is None:
+        return await buscar_json(url_no("presenca", sala)) or {}
+    return await buscar_json(url_no(f"presenca/{cartao}", sala))
+
+
+# =====================================================
+# STREAMING
+async def ler_sse(resposta):
+    """Versão assíncrona de fluxo_eventos.ler_sse (sem limite de tamanho de linha)"""
+    tipo, dados = None, []
+    pendente = b""
+    # iter_any entrega os chunks como chegam; o put inicial pode ter megabytes numa linha só
+    async for pedaco in resposta.content.iter_any():
+        pendente += pedaco
+        *linhas, pendente = pendente.split(b"\n")
+        for bruta in linhas:
+            linha = bruta.decode("utf-8").rstrip("\r")
+            if linha == "":
+                if tipo is not None:
+                    yield tipo, json.loads("\n".join(dados) or "null")
+                tipo, dados = None, []
+            elif linha.startswith("event:"):
+                tipo = linha[len("event:"):].strip()
+            elif linha.startswith("data:"):
+                dados.append(linha[len("data:"):].strip())
+
+
+class OuvinteEventosAsync(OuvinteEventos):
+    """
+    OuvinteEventos cooperativo: mesma lógica de entrega (ordem de chave, backfill
+    por startAt, apenas_novos) e mesma política de reconexão (passos), mas
+    ao_receber é uma corrotina e a espera de rede não bloqueia o event loop.
+    Cancelar a Task de executar() encerra o ouvinte.
+    """
+
+    def __init__(self, url_eventos, ao_receber, ultima_chave=None, apenas_novos=False):
+        super().__init__(url_eventos, None, ultima_chave=ultima_chave, sessao=sessao(),
+                         apenas_novos=apenas_novos)
+        self.ao_receber_async = ao_receber
+        self._lote = deque()
+
+    def _receber(self, chave, evento):
+        # Os deltas entram num lote despachado (await) depois de cada evento SSE
+        self._lote.append((chave, evento))
+
+    def _ultima_vista(self):
+        return self._lote[-1][0] if self._lote else self.ultima_chave
+
+    async def _despachar(self):
+        """
+        Entrega o lote em ordem. Cada evento só sai do lote (e ultima_chave só
+        avança) depois que ao_receber termina: se ele falhar ou a Task for
+        cancelada, o resto do lote continua pendente e é entregue na próxima
+        conexão, como a reentrega do OuvinteEventos síncrono.
+        """
+        while self._lote:
+            chave, evento = self._lote[0]
+            await self.ao_receber_async(chave, evento)
+            self._lote.popleft()
+            self.ultima_chave = chave
+
+    async def escutar_stream(self):
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=TIMEOUT_LEITURA)
+        async with sessao().get(
+            self.url,
+            params=self._consulta(),
+            headers={"Accept": "text/event-stream"},
+            timeout=timeout,
+        ) as resposta:
+            resposta.raise_for_status()
+            self._validar_stream(resposta.headers.get("Content-Type"))
+            async for tipo, dados in ler_sse(resposta):
+                if self.parar:
+                    return
+                self._tratar_sse(tipo, dados)
+                await self._despachar()
+        raise ConnectionError("Stream encerrado")
+
+    async def consultar(self):
+        self._tratar_consulta(await requisitar_json(self.url, self._consulta()))
+        await self._despachar()
+
+    async def executar(self):
+        """Mesmo laço de SeguidorStream.executar, com await no lugar das chamadas bloqueantes"""
+        passos = self.passos()
+        passo = next(passos, None)
+        while passo is not None:
+            erro = None
+            if passo == "stream":
+                try:
+                    await self.escutar_stream()
+                except Exception as e:
+                    erro = e
+            elif passo == "consulta":
+                try:
+                    with metricas.cronometrar("polling_consulta_segundos"):
+                        await self.consultar()
+                except Exception as e:
+                    erro = e
+            else:
+                await asyncio.sleep(passo)
+            try:
+                passo = passos.send(erro)
+            except StopIteration:
+                return
@@ -0,0 +1,221 @@
+"""
+Detecção de padrões impossíveis com uma janela deslizante de eventos recentes.
+
+As regras de pontuacao_tempo_real/analise_dados_fraude comparam cada evento só
+com o anterior do mesmo cartão. Este detector guarda os eventos dos últimos
+JANELA_SEGUNDOS em índices ordenados por horário (por cartão e por leitor) e a
+lista de quem está dentro da sala, e sinaliza:
+
+    simultaneo   o mesmo cartão liberado no mesmo leitor duas vezes em poucos segundos
+                 (cartão clonado: duas pessoas com o mesmo UID)
+    leitor       dois cartões no mesmo leitor dentro do cooldown do firmware
+                 (leituras que um único leitor não consegue produzir)
+    presente     entrada de um cartão que já está dentro (contradiz o /presenca),
+                 quando a Regra 1 ainda não marcou a entrada repetida
+    sala_vazia   saída com a sala vazia de um cartão cuja presença é conhecida
+                 e que não acabou de sair (ex.: entrou sem acesso liberado)
+
+Os cartões sem presença conhecida (sem evento nem registro no /presenca nas
+últimas 24 h, PRAZO_CONHECIDO) não pontuam na saída: no começo do histórico, ou
+logo após um reinício sem /presenca, a lista de quem está dentro ainda não diz
+nada sobre a sala.
+
+Cada evento custa O(log n) no tamanho da janela do leitor (microssegundos)
+e a memória fica limitada aos eventos da janela, aos cartões presentes e aos
+cartões com atividade dentro de PRAZO_CONHECIDO.
+O mesmo detector roda evento a evento no monitor (via PontuadorFraude) e em lote
+sobre o histórico (detectar_colunas, usado pelo motor_regras). leitor e
+sala_vazia comparam cartões diferentes; com entre_cartoes=False (histórico de
+um cartão só, no /cartao) elas ficam de fora em vez de darem resultados errados.
+"""
+import bisect
+from collections import OrderedDict, deque
+from datetime import datetime
+
+# =====================================================
+# CONFIGURAÇÕES
+JANELA_SEGUNDOS = 600          # eventos mais antigos que isso (pelo horário do evento) saem dos índices
+LIMITE_SIMULTANEO = 10         # segundos: mesmo cartão, mesmo leitor
+COOLDOWN_LEITOR = 1.2          # segundos: COOLDOWN_RFID do firmware
+RESOLUCAO_TIMESTAMP = 1.0      # o firmware grava o horário em segundos inteiros
+PRAZO_CONHECIDO = 24 * 3600    # segundos sem atividade até a presença de um cartão deixar de ser conhecida
+
+PESOS = {"simultaneo": 5, "leitor": 4, "presente": 2, "sala_vazia": 4}
+
+
+class DetectorJanela:
+    """
+    Estado da janela de uma sala: índices por cartão e por leitor com
+    (timestamp, ...) em ordem, {cartão: timestamp da entrada} de quem está dentro
+    e os cartões com presença conhecida, em ordem de última atividade.
+    Eventos fora de ordem são inseridos na posição certa; os mais velhos que a
+    janela inteira são ignorados.
+    """
+
+    def __init__(self, janela=JANELA_SEGUNDOS, entre_cartoes=True):
+        self.janela = janela
+        self.entre_cartoes = entre_cartoes
+        self.eventos = deque()        # (ts, cartao, leitor) de todos os eventos da janela
+        self.por_cartao = {}          # cartao -> deque[(ts, leitor, permitido)]
+        self.por_leitor = {}          # leitor -> deque[(ts, cartao)]
+        self.presentes = {}           # cartao -> ts da entrada
+        self.conhecidos = OrderedDict()   # cartao -> última atividade (eventos ou /presenca), mais antigos primeiro
+        self.mais_recente = None
+
+    # =====================================================
+    # ESTADO DA SALA
+    def carregar_presenca(self, presenca):
+        """Substitui quem está dentro pelo nó /presenca do firmware ({uid: {dentro, timestamp}})"""
+        self.presentes = {
+            str(uid): _segundos(registro.get("timestamp"))
+            for uid, registro in (presenca or {}).items()
+            if isinstance(registro, dict) and registro.get("dentro")
+        }
+        registros = sorted(
+            (_segundos(registro.get("timestamp")) if isinstance(registro, dict) else 0, str(uid))
+            for uid, registro in (presenca or {}).items()
+        )
+        for ts, uid in registros:
+            self._conhecer(uid, ts)
+
+    def _conhecer(self, cartao, ts):
+        if self.mais_recente is not None:
+            ts = max(ts, self.mais_recente)   # mantém a ordem de última atividade
+        self.conhecidos.pop(cartao, None)
+        self.conhecidos[cartao] = ts
+
+    def _esquecer(self, limite):
+        """
+        Tira dos conhecidos os cartões sem atividade desde 'limite'. Esquecer um
+        cartão que está dentro não muda nada: com ele dentro a sala não está
+        vazia, e a saída dele o torna conhecido de novo.
+        """
+        conhecidos = self.conhecidos
+        while conhecidos and next(iter(conhecidos.values())) < limite:
+            conhecidos.popitem(last=False)
+
+    def _expirar(self, limite):
+        eventos, por_cartao, por_leitor = self.eventos, self.por_cartao, self.por_leitor
+        while eventos and eventos[0][0] < limite:
+            _, cartao, leitor = eventos.popleft()
+            fila = por_cartao[cartao]
+            fila.popleft()
+            if not fila:
+                del por_cartao[cartao]
+            fila = por_leitor[leitor]
+            fila.popleft()
+            if not fila:
+                del por_leitor[leitor]
+
+    # =====================================================
+    # REGRAS
+    def verificar(self, ts, cartao, leitor, permitido=True, repetido=False):
+        """
+        Registra um evento (ts em segundos) e devolve (score, motivos) das regras da janela.
+        repetido: o evento anterior do cartão foi no mesmo leitor (a Regra 1 já pontuou).
+        Repetições exatas (mesmo cartão, leitor e horário: reenvio do firmware) não pontuam.
+        """
+        if self.mais_recente is not None and ts < self.mais_recente - self.janela:
+            return 0, []
+        if self.mais_recente is None or ts > self.mais_recente:
+            self.mais_recente = ts
+            self._expirar(ts - self.janela)
+            self._esquecer(ts - PRAZO_CONHECIDO)
+
+        fila_cartao = self.por_cartao.get(cartao)
+        if fila_cartao is None:
+            fila_cartao = self.por_cartao[cartao] = deque()
+        fila_leitor = self.por_leitor.get(leitor)
+        if fila_leitor is None:
+            fila_leitor = self.por_leitor[leitor] = deque()
+        if (ts, leitor, permitido) in fila_cartao:
+            return 0, []
+
+        score, motivos = 0, []
+
+        # --- Mesmo cartão liberado no mesmo leitor em poucos segundos ---
+        # (a fila de um cartão tem poucas passagens, então basta percorrê-la;
+        # tentativas negadas repetidas são alguém insistindo, não um clone)
+        if permitido and fila_cartao:
+            perto = 0
+            for t, l, p in fila_cartao:
+                if p and l == leitor and abs(ts - t) <= LIMITE_SIMULTANEO:
+                    perto += 1
+            if perto:
+                score += PESOS["simultaneo"]
+                motivos.append(f"Uso quase simultâneo ({perto + 1} passagens em {LIMITE_SIMULTANEO}s, possível clone)")
+
+        # --- Dois cartões no mesmo leitor mais rápido que o cooldown ---
+        # (empates de horário ficam juntos na fila ordenada, então bastam os vizinhos)
+        for t, c in (_vizinhos(fila_leitor, (ts, cartao)) if self.entre_cartoes else ()):
+            if c != cartao and abs(ts - t) < COOLDOWN_LEITOR - RESOLUCAO_TIMESTAMP:
+                score += PESOS["leitor"]
+                motivos.append(f"Leituras mais rápidas que o leitor permite ({leitor})")
+                break
+
+        # --- Presença: só acessos liberados mudam quem está dentro ---
+        if leitor == "entrada" and permitido:
+            if cartao in self.presentes and not repetido:
+                score += PESOS["presente"]
+                minutos = max(0, int((ts - self.presentes[cartao]) / 60))
+                motivos.append(f"Entrada com o cartão já dentro (há {minutos}min)")
+            self.presentes[cartao] = ts
+        elif leitor == "saida":
+            if self.entre_cartoes and not self.presentes and not repetido and cartao in self.conhecidos:
+                score += PESOS["sala_vazia"]
+                motivos.append("Saída com a sala vazia")
+            self.presentes.pop(cartao, None)
+        self._conhecer(cartao, ts)
+
+        item = (ts, cartao, leitor)
+        if not self.eventos or ts >= self.eventos[-1][0]:
+            self.eventos.append(item)
+            fila_cartao.append((ts, leitor, permitido))
+            fila_leitor.append((ts, cartao))
+        else:
+            bisect.insort(self.eventos, item)
+            bisect.insort(fila_cartao, (ts, leitor, permitido))
+            bisect.insort(fila_leitor, (ts, cartao))
+        return score, motivos
+
+    def verificar_evento(self, evento, ts=None, repetido=False):
+        """verificar() a partir do dicionário do firmware (ts já convertido, se o chamador tiver)"""
+        if ts is None:
+            ts = _segundos(evento.get("timestamp"))
+        return self.verificar(ts, str(evento.get("cartao")), str(evento.get("leitor")),
+                              evento.get("acesso_permitido") != False, repetido)
+
+
+def _segundos(ts):
+    try:
+        return datetime.fromisoformat(str(ts).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return datetime.now().timestamp()
+
+
+def _vizinhos(fila, item):
+    """Os elementos imediatamente antes e depois da posição de 'item' na fila ordenada"""
+    if not fila:
+        return ()
+    if item >= fila[-1]:
+        return (fila[-1],)
+    posicao = bisect.bisect_left(fila, item)
+    return [fila[i] for i in (posicao - 1, posicao) if 0 <= i < len(fila)]
+
+
+# =====================================================
+# LOTE
+def detectar_colunas(ts, cartoes, leitores, permitidos, repetidos, janela=JANELA_SEGUNDOS, entre_cartoes=True):
+    """
+    Roda o detector sobre colunas já em ordem cronológica, como listas Python
+    (ts em segundos, leitores "entrada"/"saida", permitidos e repetidos bool). Retorna
+    (scores, motivos) alinhados às colunas; motivos[i] é uma lista (vazia quando
+    o evento não pontuou).
+    """
+    verificar = DetectorJanela(janela, entre_cartoes).verificar
+    scores, motivos = [], []
+    for t, cartao, leitor, permitido, repetido in zip(ts, cartoes, leitores, permitidos, repetidos):
+        score, m = verificar(t, cartao, leitor, permitido, repetido)
+        scores.append(score)
+        motivos.append(m)
+    return scores, motivos
@@ -0,0 +1,123 @@
+"""
+Envio de mensagens dentro dos limites do Telegram.
+
+O Telegram aceita ~30 mensagens/s por bot e ~1 mensagem/s por chat; acima disso
+responde 429 com parameters.retry_after. LimitadorTelegram combina um balde de
+tokens global com um intervalo mínimo por chat, e enviar_com_retentativa
+respeita o retry_after (ou faz backoff exponencial em erros de rede).
+"""
+import os
+import threading
+import time
+
+from funcoes_auxiliares import metricas
+
+# =====================================================
+# CONFIGURAÇÕES
+MENSAGENS_POR_SEGUNDO = 25      # abaixo do limite global de 30/s
+RAJADA_GLOBAL = 25
+INTERVALO_POR_CHAT = 1.0        # segundos entre mensagens para o mesmo chat
+TENTATIVAS_ENVIO = 5
+ESPERA_MAXIMA_ENVIO = 60        # teto do backoff (s)
+URL_API_TELEGRAM = os.getenv("url_api_telegram")   # outro servidor da Bot API (ex.: ferramentas/telegram_local.py)
+
+
+def configurar_api(url=URL_API_TELEGRAM, assincrono=False):
+    """Aponta o telebot para outro servidor da Bot API; sem url, mantém api.telegram.org"""
+    if not url:
+        return
+    if assincrono:
+        from telebot import asyncio_helper as helper
+    else:
+        from telebot import apihelper as helper
+    helper.API_URL = url.rstrip("/") + "/bot{0}/{1}"
+
+
+class BaldeTokens:
+    """Balde de tokens thread-safe: 'taxa' tokens/s, no máximo 'capacidade' acumulados"""
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self, agora):
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def reservar(self, quantidade=1):
+        """Consome 'quantidade' tokens (pode ficar negativo) e devolve quantos segundos esperar"""
+        with self._lock:
+            self._repor(time.monotonic())
+            self.tokens -= quantidade
+            return max(0.0, -self.tokens / self.taxa)
+
+    def consumir(self, quantidade=1):
+        espera = self.reservar(quantidade)
+        if espera:
+            time.sleep(espera)
+        return espera
+
+
+class LimitadorTelegram:
+    def __init__(self, taxa=MENSAGENS_POR_SEGUNDO, rajada=RAJADA_GLOBAL, intervalo_chat=INTERVALO_POR_CHAT):
+        self.balde = BaldeTokens(taxa, rajada)
+        self.intervalo_chat = intervalo_chat
+        self._livre_em = {}   # chat_id -> instante em que o chat aceita a próxima mensagem
+        self._lock = threading.Lock()
+
+    def aguardar(self, chat_id):
+        """Bloqueia até poder enviar para chat_id sem estourar nenhum limite"""
+        with self._lock:
+            agora = time.monotonic()
+            livre = max(agora, self._livre_em.get(chat_id, agora))
+            self._livre_em[chat_id] = livre + self.intervalo_chat
+            if len(self._livre_em) > 10_000:
+                self._livre_em = {c: t for c, t in self._livre_em.items() if t > agora}
+        espera = max(livre - time.monotonic(), self.balde.reservar())
+        if espera > 0:
+            metricas.observar("telegram_espera_limite_segundos", espera)
+            time.sleep(espera)
+
+    def penalizar(self, segundos):
+        """Depois de um 429, ninguém envia nada por 'segundos' (o limite é do bot inteiro)"""
+        self.balde.reservar(segundos * self.balde.taxa)
+
+
+def retry_after(erro):
+    """Segundos pedidos pelo Telegram num 429 (ApiTelegramException), ou None"""
+    if getattr(erro, "error_code", None) != 429:
+        return None
+    parametros = (getattr(erro, "result_json", None) or {}).get("parameters") or {}
+    return float(parametros.get("retry_after", 1))
+
+
+def enviar_com_retentativa(enviar, chat_id, texto, limitador, tentativas=TENTATIVAS_ENVIO):
+    """
+    Chama enviar(chat_id, texto) respeitando o limitador.
+    429: espera retry_after e tenta de novo; erro 4xx definitivo (chat bloqueou o bot,
+    Markdown inválido): desiste na hora; outros erros: backoff exponencial.
+    Retorna True se a mensagem foi entregue.
+    """
+    for tentativa in range(tentativas):
+        limitador.aguardar(chat_id)
+        try:
+            with metricas.cronometrar("telegram_envio_segundos"):
+                enviar(chat_id, texto)
+            return True
+        except Exception as e:
+            espera = retry_after(e)
+            if espera is not None:
+                # A próxima volta do laço espera no limitador já penalizado
+                metricas.incrementar("telegram_429_total")
+                limitador.penalizar(espera)
+                continue
+            codigo = getattr(e, "error_code", None)
+            if codigo is not None and 400 <= codigo < 500:
+                print(f"Mensagem para {chat_id} recusada pelo Telegram: {e}")
+                return False
+            print(f"Erro ao enviar para {chat_id} (tentativa {tentativa + 1}): {e}")
+            time.sleep(min(ESPERA_MAXIMA_ENVIO, 2 ** tentativa))
+    return False
@@ -0,0 +1,342 @@
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from funcoes_auxiliares import metricas
+
+# =====================================================
+# CONFIGURAÇÕES
+TIMEOUT_LEITURA = 90        # Firebase manda keep-alive a cada ~30s
+ESPERA_MAXIMA = 60          # teto do backoff de reconexão (s)
+FALHAS_ATE_POLLING = 5      # falhas seguidas do stream antes de cair para polling
+INTERVALO_POLLING = 3       # segundos entre consultas no modo polling
+TENTATIVAS_STREAM = 20      # ciclos de polling antes de tentar o stream de novo
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+class StreamIndisponivel(Exception):
+    """O servidor não respondeu como text/event-stream"""
+
+
+def _consulta_a_partir(ultima_chave):
+    params = {"orderBy": '"$key"'}
+    if ultima_chave:
+        params["startAt"] = json.dumps(ultima_chave)
+    return params
+
+
+def momento_da_chave(chave):
+    """
+    Instante (epoch, s) em que o servidor gerou a push key: os 8 primeiros
+    caracteres são os milissegundos em base 64. None se a chave não for uma push key.
+    """
+    if not isinstance(chave, str) or len(chave) != 20:
+        return None
+    ms = 0
+    for c in chave[:8]:
+        valor = PUSH_CHARS.find(c)
+        if valor < 0:
+            return None
+        ms = ms * 64 + valor
+    return ms / 1000
+
+
+# =====================================================
+# CHAVES DE PUSH (geradas localmente pelo gateway de borda e pelo Firebase local)
+class GeradorChavePush:
+    """Gera chaves no mesmo formato das push keys do Firebase (ordenáveis pelo tempo)"""
+
+    def __init__(self):
+        self._ultimo_ms = 0
+        self._aleatorio = [0] * 12
+        self._lock = threading.Lock()
+
+    def __call__(self, agora_ms=None):
+        with self._lock:
+            agora = int(agora_ms if agora_ms is not None else time.time() * 1000)
+            if agora <= self._ultimo_ms:
+                # Mesmo milissegundo: incrementa a parte aleatória para manter a ordem
+                agora = self._ultimo_ms
+                i = 11
+                while i >= 0 and self._aleatorio[i] == 63:
+                    self._aleatorio[i] = 0
+                    i -= 1
+                self._aleatorio[i] += 1
+            else:
+                self._aleatorio = [random.randrange(64) for _ in range(12)]
+            self._ultimo_ms = agora
+
+            prefixo = []
+            for _ in range(8):
+                prefixo.append(PUSH_CHARS[agora % 64])
+                agora //= 64
+            return "".join(reversed(prefixo)) + "".join(PUSH_CHARS[i] for i in self._aleatorio)
+
+
+gerar_chave_push = GeradorChavePush()
+
+
+def ler_sse(resposta):
+    """Gera (tipo, dados) a partir das linhas de um stream Server-Sent Events"""
+    tipo, dados = None, []
+    # chunk_size=None entrega cada chunk assim que chega (sem esperar encher um buffer)
+    for linha in resposta.iter_lines(chunk_size=None, decode_unicode=True):
+        if linha is None:
+            continue
+        if linha == "":
+            if tipo is not None:
+                yield tipo, json.loads("\n".join(dados) or "null")
+            tipo, dados = None, []
+        elif linha.startswith("event:"):
+            tipo = linha[len("event:"):].strip()
+        elif linha.startswith("data:"):
+            dados.append(linha[len("data:"):].strip())
+
+
+class SeguidorStream:
+    """
+    Segue um nó do Firebase pelo stream (Accept: text/event-stream), com reconexão
+    em backoff exponencial e, se o stream falhar repetidamente, polling com GET.
+    As subclasses dizem o que fazer com os deltas (_tratar_delta) e com o valor
+    lido no polling (_tratar_consulta), e a consulta usada nos dois (_consulta).
+    """
+
+    def __init__(self, url, sessao=None, rotulos=None):
+        self.url = url
+        self.sessao = sessao or requests.Session()
+        self.rotulos = rotulos or {}     # rótulos extras de stream_conexoes_total
+        self.parar = False
+        self.conectado = False
+
+    def _consulta(self):
+        return None
+
+    def _tratar_delta(self, tipo, dados):
+        raise NotImplementedError
+
+    def _tratar_consulta(self, valor):
+        raise NotImplementedError
+
+    def _tratar_sse(self, tipo, dados):
+        """Um evento do stream; levanta ConnectionError quando o servidor encerra"""
+        if tipo in ("put", "patch"):
+            self._tratar_delta(tipo, dados)
+        elif tipo in ("cancel", "auth_revoked"):
+            raise ConnectionError(f"Stream encerrado pelo servidor ({tipo})")
+
+    def _validar_stream(self, tipo_conteudo):
+        """Confere que a resposta é um stream SSE e marca a conexão"""
+        if "text/event-stream" not in (tipo_conteudo or ""):
+            raise StreamIndisponivel(tipo_conteudo)
+        self.conectado = True
+        metricas.incrementar("stream_conexoes_total", **self.rotulos)
+
+    # =====================================================
+    # MODOS
+    def escutar_stream(self):
+        """Consome o stream até ele cair. Levanta exceção em caso de erro de rede."""
+        resposta = self.sessao.get(
+            self.url,
+            params=self._consulta(),
+            headers={"Accept": "text/event-stream"},
+            stream=True,
+            timeout=(10, TIMEOUT_LEITURA),
+        )
+        with resposta:
+            resposta.raise_for_status()
+            self._validar_stream(resposta.headers.get("Content-Type"))
+            for tipo, dados in ler_sse(resposta):
+                if self.parar:
+                    return
+                self._tratar_sse(tipo, dados)
+        raise ConnectionError("Stream encerrado")
+
+    def consultar(self):
+        """Uma rodada do modo polling"""
+        resp = self.sessao.get(self.url, params=self._consulta(), timeout=10)
+        resp.raise_for_status()
+        self._tratar_consulta(resp.json())
+
+    def passos(self):
+        """
+        Política de reconexão como um gerador de passos, para o laço síncrono
+        (executar) e o assíncrono (cliente_firebase_async) seguirem a mesma regra.
+        Produz "stream", "consulta" ou os segundos a esperar; quem executa devolve
+        por send() a exceção do passo, ou None.
+        """
+        falhas = 0
+        while not self.parar:
+            if falhas < FALHAS_ATE_POLLING:
+                self.conectado = False
+                erro = yield "stream"
+                if erro is None:
+                    falhas = 0
+                    continue
+                # Queda de um stream que estava saudável conta como primeira falha
+                falhas = 1 if self.conectado else falhas + 1
+                metricas.incrementar("stream_quedas_total", tipo=type(erro).__name__)
+                espera = min(ESPERA_MAXIMA, 2 ** falhas)
+                print(f"⚠️ Stream de {urlsplit(self.url).path} caiu ({erro}). Reconectando em {espera}s...")
+                yield espera
+                continue
+
+            print(f"📡 Stream de {urlsplit(self.url).path} indisponível, usando polling.")
+            metricas.incrementar("stream_fallback_polling_total")
+            for _ in range(TENTATIVAS_STREAM):
+                if self.parar:
+                    return
+                erro = yield "consulta"
+                if erro is not None:
+                    metricas.incrementar("polling_erros_total", tipo=type(erro).__name__)
+                    print(f"⚠️ Oscilação na rede ({urlsplit(self.url).path}): {erro}")
+                    yield 5
+                yield INTERVALO_POLLING
+            falhas = 0
+
+    def executar(self):
+        """Laço principal: stream com reconexão; polling como fallback"""
+        passos = self.passos()
+        passo = next(passos, None)
+        while passo is not None:
+            erro = None
+            if passo == "stream":
+                try:
+                    self.escutar_stream()
+                except Exception as e:
+                    erro = e
+            elif passo == "consulta":
+                try:
+                    with metricas.cronometrar("polling_consulta_segundos"):
+                        self.consultar()
+                except Exception as e:
+                    erro = e
+            else:
+                time.sleep(passo)
+            try:
+                passo = passos.send(erro)
+            except StopIteration:
+                return
+
+
+class OuvinteEventos(SeguidorStream):
+    """
+    Acompanha o nó /eventos do Firebase e chama ao_receber(chave, evento) uma vez
+    por evento novo, em ordem de chave.
+
+    Modo principal: streaming (Accept: text/event-stream) com os deltas put/patch.
+    A cada (re)conexão o stream é aberto com orderBy="$key"&startAt=<última chave>,
+    então o put inicial já traz tudo que chegou durante a queda (backfill do buraco).
+    Se o stream falhar repetidamente, cai para polling com a mesma consulta
+    incremental (que, ao contrário de limitToLast=1, não perde rajadas).
+
+    Com apenas_novos=True e sem última chave, o primeiro lote recebido só marca a
+    posição atual (não reentrega o histórico inteiro).
+    """
+
+    def __init__(self, url_eventos, ao_receber, ultima_chave=None, sessao=None, apenas_novos=False):
+        super().__init__(url_eventos, sessao)
+        self.ao_receber = ao_receber
+        self.ultima_chave = ultima_chave
+        self._marcar_posicao = apenas_novos and ultima_chave is None
+
+    def _consulta(self):
+        return _consulta_a_partir(self.ultima_chave)
+
+    # =====================================================
+    # ENTREGA
+    def _entregar(self, eventos):
+        """Entrega eventos {chave: evento} com chave maior que a última processada"""
+        if self._marcar_posicao:
+            # Nó vazio (null) também marca a posição: o próximo evento já é novo
+            self._marcar_posicao = False
+            if isinstance(eventos, dict) and eventos:
+                self.ultima_chave = max(eventos)
+            return
+        if not isinstance(eventos, dict):
+            return
+        for chave in sorted(eventos):
+            evento = eventos[chave]
+            if not isinstance(evento, dict):
+                continue
+            vista = self._ultima_vista()
+            if vista is not None and chave <= vista:
+                continue
+            self._receber(chave, evento)
+
+    def _receber(self, chave, evento):
+        # ultima_chave só avança depois de ao_receber: se ele falhar, a reconexão reentrega o evento
+        self.ao_receber(chave, evento)
+        self.ultima_chave = chave
+
+    def _ultima_vista(self):
+        """Maior chave já recebida (entregue ou à espera de entrega)"""
+        return self.ultima_chave
+
+    def _tratar_consulta(self, valor):
+        self._entregar(valor)
+
+    def _tratar_delta(self, tipo, dados):
+        caminho = (dados or {}).get("path", "/")
+        valor = (dados or {}).get("data")
+        partes = [p for p in caminho.strip("/").split("/") if p]
+
+        if not partes:
+            # put em "/" = nó inteiro (ou filtrado); patch em "/" = vários filhos
+            self._entregar(valor)
+        elif len(partes) == 1 and valor is not None:
+            if tipo == "put":
+                self._entregar({partes[0]: valor})
+            elif partes[0] != self._ultima_vista():
+                # patch parcial de um evento ainda não visto: trata como novo
+                self._entregar({partes[0]: valor})
+        # Escritas em subcampos de eventos já processados são ignoradas
+
+
+class ObservadorNo(SeguidorStream):
+    """
+    Mantém uma cópia local de um nó pequeno do Firebase (ex.: /estado) seguindo
+    o stream e chama ao_mudar(valor) a cada alteração. Uma única conexão substitui
+    as consultas repetidas de todos os usuários. Cai para polling como o OuvinteEventos.
+    """
+
+    def __init__(self, url, ao_mudar, sessao=None):
+        super().__init__(url, sessao, rotulos={"no": url.rsplit("/", 1)[-1]})
+        self.ao_mudar = ao_mudar
+        self.valor = None
+
+    def _tratar_delta(self, tipo, dados):
+        caminho = (dados or {}).get("path", "/")
+        novo = (dados or {}).get("data")
+        partes = [p for p in caminho.strip("/").split("/") if p]
+
+        if not partes and tipo == "put":
+            self.valor = novo
+        else:
+            if not isinstance(self.valor, dict):
+                self.valor = {}
+            no = self.valor
+            for p in partes[:-1]:
+                if not isinstance(no.get(p), dict):
+                    no[p] = {}
+                no = no[p]
+            if tipo == "patch":
+                alvo = no.setdefault(partes[-1], {}) if partes else no
+                for chave, valor in (novo or {}).items():
+                    if valor is None:
+                        alvo.pop(chave, None)
+                    else:
+                        alvo[chave] = valor
+            elif novo is None:
+                no.pop(partes[-1], None)
+            else:
+                no[partes[-1]] = novo
+        self.ao_mudar(self.valor)
+
+    def _tratar_consulta(self, valor):
+        if valor != self.valor:
+            self._tratar_delta("put", {"path": "/", "data": valor})
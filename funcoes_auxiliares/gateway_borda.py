@@ -0,0 +1,562 @@
+"""
+Gateway de borda: recebe as escritas do leitor na rede local e as leva ao Firebase em lotes.
+
+O firmware abre uma conexão TLS nova por escrita (/estado, /presenca, /eventos,
+/movimentos) e espera até 3 s pela resposta de cada uma. Com o gateway, o
+dispositivo fala HTTP simples com keep-alive na rede local, no mesmo formato da
+API REST do Firebase (só troca host/porta):
+
+    PUT   /estado.json            {ocupacao_atual, limite_ocupacao, ...}
+    PUT   /presenca/<uid>.json    {dentro, timestamp}
+    POST  /eventos.json           {timestamp, cartao, leitor, ...}  -> {"name": <push key>}
+    POST  /movimentos.json        {timestamp}                       -> {"name": <push key>}
+    GET   /saude.json             escritas pendentes, último envio, falhas
+
+Com várias salas (cliente_firebase.url_no), os mesmos nós ficam sob
+/salas/<id>/ (ex.: POST /salas/lab1/eventos.json) e seguem as mesmas regras.
+
+A resposta sai assim que a escrita está no WAL (gravada com fsync), sem esperar o
+Firebase. Uma thread junta as escritas pendentes e as envia como um PATCH
+multi-caminho na raiz ({"eventos/<chave>": ..., "estado": ..., ...}) pela sessão
+keep-alive de cliente_firebase, a cada INTERVALO_ENVIO ou quando o lote enche.
+
+- push keys são geradas aqui, no instante em que o gateway recebe o evento;
+- POST repetido (mesmo X-Id-Evento ou, sem ele, mesmo corpo no mesmo nó) devolve a
+  chave já gerada em vez de criar outro evento;
+- PUT no mesmo caminho substitui o valor ainda não enviado (só o último sobe),
+  e PUT com o valor já gravado é ignorado;
+- o buffer nunca tem um caminho e um descendente dele ao mesmo tempo (o Firebase
+  recusa um PATCH multi-caminho assim): a escrita num filho de um caminho
+  pendente (PUT /presenca/<uid> depois de PUT /presenca) entra no valor do
+  ancestral, e a escrita num ancestral descarta os descendentes pendentes;
+- um lote recusado pelo Firebase (4xx) é dividido até isolar as escritas
+  recusadas, que saem do buffer e vão para o arquivo <wal>.recusadas em vez de
+  travar a fila; erros de rede, 5xx, 408 e 429 continuam com nova tentativa;
+- o WAL guarda cada escrita com um número de sequência e, depois de cada PATCH
+  aceito, a marca {"confirmado": seq}: ao reiniciar, o que não foi confirmado é
+  reenviado com as mesmas chaves (reenviar um PATCH já aplicado não duplica nada).
+
+O PATCH na raiz exige permissão de escrita na raiz nas regras do Firebase.
+
+Uso:
+    python -m funcoes_auxiliares.gateway_borda --porta 8080 --wal gateway.wal
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.cliente_firebase import URL_BASE, requisitar
+from funcoes_auxiliares.fluxo_eventos import gerar_chave_push
+
+# =====================================================
+# CONFIGURAÇÕES
+PORTA_GATEWAY = int(os.getenv("porta_gateway", "8080"))
+PORTA_METRICAS = int(os.getenv("porta_metricas_gateway", "9466"))
+CAMINHO_WAL = os.getenv("caminho_wal_gateway", "gateway.wal")
+SINCRONIZAR_WAL = os.getenv("wal_fsync", "1") != "0"   # fsync a cada escrita recebida
+
+INTERVALO_ENVIO = 0.5          # segundos entre PATCHes
+TAMANHO_LOTE = 500             # escritas por PATCH
+MAXIMO_PENDENTES = 50_000      # acima disso o gateway responde 503 (o dispositivo tenta de novo)
+JANELA_DEDUP = 10_000          # POSTs recentes lembrados para descartar repetições
+TAMANHO_COMPACTAR = 4 << 20    # bytes do WAL antes de reescrevê-lo só com o pendente
+ESPERA_MAXIMA_ENVIO = 30       # teto do backoff quando o Firebase falha (s)
+
+NOS_COM_PUSH = ("eventos", "movimentos")
+NOS_COM_PUT = ("estado", "presenca")
+STATUS_TRANSITORIOS = (408, 429)   # 4xx que valem nova tentativa
+
+
+def _partes(caminho):
+    caminho = urlsplit(caminho).path
+    if caminho.endswith(".json"):
+        caminho = caminho[:-len(".json")]
+    return [p for p in caminho.strip("/").split("/") if p]
+
+
+def _separar_sala(partes):
+    """(prefixo "salas/<id>/" ou "", partes do nó) de um caminho com ou sem sala"""
+    if len(partes) >= 3 and partes[0] == "salas":
+        return f"salas/{partes[1]}/", partes[2:]
+    return "", partes
+
+
+def _no_com_put(caminho):
+    """O caminho está sob /estado ou /presenca (pode ter ancestrais e descendentes no buffer)"""
+    _, partes_no = _separar_sala(caminho.split("/"))
+    return partes_no[0] in NOS_COM_PUT
+
+
+def _mesclar(valor, relativo, sub):
+    """Cópia de 'valor' com 'sub' gravado no caminho 'relativo' (lista de chaves); None apaga"""
+    raiz = copy.deepcopy(valor) if isinstance(valor, dict) else {}
+    no = raiz
+    for p in relativo[:-1]:
+        if not isinstance(no.get(p), dict):
+            no[p] = {}
+        no = no[p]
+    if sub is None:
+        no.pop(relativo[-1], None)
+    else:
+        no[relativo[-1]] = sub
+    return raiz
+
+
+def _recusado(erro):
+    """O Firebase recusou o conteúdo do PATCH (4xx): reenviar igual não vai passar"""
+    resposta = getattr(erro, "response", None)
+    status = getattr(resposta, "status_code", None)
+    return (isinstance(erro, requests.HTTPError) and status is not None
+            and 400 <= status < 500 and status not in STATUS_TRANSITORIOS)
+
+
+def _assinatura(no, valor, id_evento=None):
+    """Identidade de um POST para a deduplicação: o ID do dispositivo ou o conteúdo"""
+    if id_evento:
+        return f"{no}:{id_evento}"
+    conteudo = json.dumps(valor, sort_keys=True, separators=(",", ":"))
+    return f"{no}:" + hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+
+# =====================================================
+# WAL (write-ahead log)
+class LogEscritas:
+    """
+    Arquivo JSON Lines só de acréscimo:
+        {"seq": n, "caminho": "eventos/<chave>", "valor": {...}, "assinatura": ...}
+        {"confirmado": n}     tudo com seq <= n já está no Firebase
+        {"dedup": [[assinatura, caminho], ...]}   janela de deduplicação (após compactar)
+    """
+
+    def __init__(self, caminho, sincronizar=SINCRONIZAR_WAL):
+        self.caminho = caminho
+        self.sincronizar = sincronizar
+        self._arquivo = None
+
+    def ler(self):
+        """Devolve (escritas não confirmadas em ordem, último seq, último confirmado, janela de dedup)"""
+        escritas, confirmado, ultimo_seq, dedup = [], 0, 0, []
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        break          # última linha cortada por uma queda no meio da gravação
+                    if "confirmado" in registro:
+                        confirmado = max(confirmado, registro["confirmado"])
+                    elif "dedup" in registro:
+                        dedup.extend(registro["dedup"])
+                    else:
+                        escritas.append(registro)
+                        ultimo_seq = max(ultimo_seq, registro["seq"])
+                        if registro.get("assinatura"):
+                            dedup.append([registro["assinatura"], registro["caminho"]])
+        except FileNotFoundError:
+            pass
+        pendentes = [e for e in escritas if e["seq"] > confirmado]
+        return pendentes, max(ultimo_seq, confirmado), confirmado, dedup
+
+    def _abrir(self):
+        if self._arquivo is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+            self._arquivo = open(self.caminho, "a", encoding="utf-8")
+        return self._arquivo
+
+    def acrescentar(self, registro):
+        arquivo = self._abrir()
+        arquivo.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n")
+        arquivo.flush()
+        if self.sincronizar:
+            os.fsync(arquivo.fileno())
+
+    def tamanho(self):
+        return self._abrir().tell()
+
+    def reescrever(self, registros):
+        """Troca o WAL (de forma atômica) por um só com 'registros'"""
+        self.fechar()
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            for registro in registros:
+                f.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+# =====================================================
+# GATEWAY
+class GatewayBorda:
+    """
+    Buffer + deduplicação + WAL + envio em lote. receber() é chamado pelas threads
+    do servidor HTTP; a thread de envio é a única que fala com o Firebase.
+    """
+
+    def __init__(self, url_base=URL_BASE, caminho_wal=CAMINHO_WAL, host="0.0.0.0", porta=PORTA_GATEWAY,
+                 intervalo=INTERVALO_ENVIO, tamanho_lote=TAMANHO_LOTE, sincronizar_wal=SINCRONIZAR_WAL):
+        self.url_raiz = f"{url_base}/.json"
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self.wal = LogEscritas(caminho_wal, sincronizar_wal)
+        self.caminho_recusadas = caminho_wal + ".recusadas"
+
+        self.pendentes = OrderedDict()   # caminho -> (seq, valor, recebido_em), em ordem de seq
+        self.pendentes_put = set()       # caminhos pendentes sob /estado e /presenca
+        self.dedup = OrderedDict()       # assinatura -> caminho do POST
+        self.gravados = {}               # caminho de PUT -> último valor aceito
+        self.seq = 0
+        self.confirmado = 0
+        self.ultimo_envio = None
+        self.falhas_seguidas = 0
+        self.recusadas = 0
+
+        self._lock = threading.Lock()
+        self._condicao = threading.Condition(self._lock)
+        self._parar = threading.Event()
+        self._thread_envio = None
+        self._recuperar()
+
+        handler = type("Handler", (_Handler,), {"gateway": self})
+        self.servidor = ThreadingHTTPServer((host, porta), handler)
+        self.servidor.daemon_threads = True
+        self.url = f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{self.servidor.server_address[1]}"
+
+    def _recuperar(self):
+        """Recoloca no buffer o que ficou no WAL sem confirmação (queda antes do envio)"""
+        escritas, self.seq, self.confirmado, dedup = self.wal.ler()
+        for assinatura, caminho in dedup[-JANELA_DEDUP:]:
+            self.dedup[assinatura] = caminho
+        agora = time.time()
+        for escrita in escritas:
+            caminho, valor = self._sobre_ancestral(escrita["caminho"], escrita["valor"])
+            self._colocar(caminho, escrita["seq"], valor, agora)
+        if escritas:
+            print(f"Gateway: {len(escritas)} escritas não confirmadas recuperadas do WAL.")
+        metricas.definir("gateway_pendentes", len(self.pendentes))
+
+    # =====================================================
+    # RECEPÇÃO (threads do servidor HTTP)
+    def receber(self, metodo, partes, valor, id_evento=None):
+        """
+        Aplica uma escrita do dispositivo. Retorna (status HTTP, corpo da resposta),
+        com a mesma resposta que o Firebase daria.
+        """
+        prefixo, partes_no = _separar_sala(partes)
+        if not partes_no or partes_no[0] not in NOS_COM_PUSH + NOS_COM_PUT:
+            return 404, {"error": "caminho não suportado pelo gateway"}
+        no = partes_no[0]
+        caminho = "/".join(partes)
+
+        with self._condicao:
+            if len(self.pendentes) >= MAXIMO_PENDENTES:
+                metricas.incrementar("gateway_recusadas_total", no=no)
+                return 503, {"error": "buffer cheio"}
+
+            if metodo == "POST":
+                if no not in NOS_COM_PUSH or len(partes_no) != 1:
+                    return 405, {"error": "POST só em /eventos e /movimentos"}
+                # Deduplicação por sala: o mesmo evento em duas salas são dois eventos
+                assinatura = _assinatura(prefixo + no, valor, id_evento)
+                if assinatura in self.dedup:
+                    metricas.incrementar("gateway_duplicados_total", no=no)
+                    return 200, {"name": self.dedup[assinatura].rsplit("/", 1)[-1]}
+                caminho = f"{prefixo}{no}/{gerar_chave_push()}"
+                self._registrar(caminho, valor, assinatura)
+                self.dedup[assinatura] = caminho
+                if len(self.dedup) > JANELA_DEDUP:
+                    self.dedup.popitem(last=False)
+                resposta = {"name": caminho.rsplit("/", 1)[-1]}
+
+            elif no not in NOS_COM_PUT:
+                return 405, {"error": "em /eventos e /movimentos só POST"}
+
+            elif metodo in ("PUT", "DELETE"):
+                valor = None if metodo == "DELETE" else valor
+                if caminho in self.gravados and self.gravados[caminho] == valor:
+                    metricas.incrementar("gateway_duplicados_total", no=no)
+                    return 200, valor
+                self._registrar(caminho, valor)
+                self.gravados[caminho] = valor
+                resposta = valor
+
+            elif metodo == "PATCH":
+                if not isinstance(valor, dict):
+                    return 400, {"error": "PATCH espera um objeto"}
+                for filho, sub in valor.items():
+                    self._registrar(f"{caminho}/{filho.strip('/')}", sub)
+                resposta = valor
+            else:
+                return 405, {"error": f"método {metodo} não suportado"}
+
+            metricas.incrementar("gateway_escritas_total", no=no, metodo=metodo)
+            metricas.definir("gateway_pendentes", len(self.pendentes))
+            if len(self.pendentes) >= self.tamanho_lote:
+                self._condicao.notify()
+        return 200, resposta
+
+    def _registrar(self, caminho, valor, assinatura=None):
+        """WAL primeiro, buffer depois (chamado com o lock)"""
+        if _no_com_put(caminho):
+            self._esquecer_gravados(caminho)
+            caminho, valor = self._sobre_ancestral(caminho, valor)
+        self.seq += 1
+        registro = {"seq": self.seq, "caminho": caminho, "valor": valor}
+        if assinatura:
+            registro["assinatura"] = assinatura
+        with metricas.cronometrar("gateway_wal_segundos"):
+            self.wal.acrescentar(registro)
+        self._colocar(caminho, self.seq, valor, time.time())
+
+    def _sobre_ancestral(self, caminho, valor):
+        """
+        (caminho, valor) a gravar no buffer: a escrita num descendente de um
+        caminho pendente vira o valor do ancestral com o filho atualizado
+        """
+        if not self.pendentes_put:
+            return caminho, valor
+        partes = caminho.split("/")
+        for i in range(1, len(partes)):
+            ancestral = "/".join(partes[:i])
+            if ancestral in self.pendentes_put:
+                _, valor_ancestral, _ = self.pendentes[ancestral]
+                return ancestral, _mesclar(valor_ancestral, partes[i:], valor)
+        return caminho, valor
+
+    def _colocar(self, caminho, seq, valor, recebido_em):
+        """Põe a escrita no buffer, descartando os descendentes pendentes (chamado com o lock)"""
+        if _no_com_put(caminho):
+            prefixo = caminho + "/"
+            for descendente in [c for c in self.pendentes_put if c.startswith(prefixo)]:
+                del self.pendentes[descendente]
+                self.pendentes_put.discard(descendente)
+            self.pendentes_put.add(caminho)
+        # Um valor novo para o mesmo caminho substitui o pendente e vai para o fim da fila
+        self.pendentes.pop(caminho, None)
+        self.pendentes[caminho] = (seq, valor, recebido_em)
+
+    def _esquecer_gravados(self, caminho):
+        """Uma escrita muda o valor gravado dos ancestrais e dos descendentes do caminho"""
+        partes = caminho.split("/")
+        for i in range(1, len(partes)):
+            self.gravados.pop("/".join(partes[:i]), None)
+        prefixo = caminho + "/"
+        for descendente in [c for c in self.gravados if c.startswith(prefixo)]:
+            del self.gravados[descendente]
+
+    # =====================================================
+    # ENVIO (thread única)
+    def enviar_lote(self):
+        """
+        Envia até tamanho_lote escritas pendentes num PATCH multi-caminho.
+        Retorna quantas saíram do buffer (0 se não havia nada), incluindo as
+        recusadas pelo Firebase. Levanta a exceção da requisição se o Firebase
+        falhar de outro jeito (as escritas continuam pendentes).
+        """
+        with self._lock:
+            lote = []
+            for caminho, (seq, valor, recebido_em) in self.pendentes.items():
+                lote.append((caminho, seq, valor, recebido_em))
+                if len(lote) >= self.tamanho_lote:
+                    break
+        if not lote:
+            return 0
+
+        inicio = time.perf_counter()
+        recusadas = self._enviar(lote)
+        metricas.observar("gateway_envio_segundos", time.perf_counter() - inicio)
+
+        with self._lock:
+            for caminho, seq, _, _ in lote:
+                # Se chegou um valor mais novo durante o envio, ele continua pendente
+                if self.pendentes.get(caminho, (None,))[0] == seq:
+                    del self.pendentes[caminho]
+                    self.pendentes_put.discard(caminho)
+            if recusadas:
+                self._guardar_recusadas(recusadas)
+            # Tudo até o maior seq do lote foi enviado ou substituído por um valor mais novo
+            self.confirmado = max(seq for _, seq, _, _ in lote)
+            self.wal.acrescentar({"confirmado": self.confirmado})
+            if self.wal.tamanho() > TAMANHO_COMPACTAR:
+                self._compactar()
+            self.ultimo_envio = time.time()
+            metricas.definir("gateway_pendentes", len(self.pendentes))
+
+        metricas.incrementar("gateway_lotes_total")
+        metricas.incrementar("gateway_enviadas_total", len(lote) - len(recusadas))
+        metricas.observar("gateway_atraso_segundos", time.time() - min(r for _, _, _, r in lote))
+        return len(lote)
+
+    def _enviar(self, lote):
+        """
+        PATCH do lote; se o Firebase recusar (4xx), divide o lote ao meio até
+        isolar as escritas recusadas, enviando as outras. Retorna as recusadas.
+        """
+        try:
+            requisitar(self.url_raiz, metodo="PATCH", corpo={caminho: valor for caminho, _, valor, _ in lote})
+            return []
+        except Exception as e:
+            if not _recusado(e):
+                raise
+            if len(lote) == 1:
+                print(f"Gateway: Firebase recusou a escrita em {lote[0][0]} ({e})")
+                return lote
+            meio = len(lote) // 2
+            return self._enviar(lote[:meio]) + self._enviar(lote[meio:])
+
+    def _guardar_recusadas(self, recusadas):
+        """Tira as escritas recusadas da fila, guardando-as para inspeção (chamado com o lock)"""
+        agora = time.time()
+        with open(self.caminho_recusadas, "a", encoding="utf-8") as f:
+            for caminho, seq, valor, _ in recusadas:
+                registro = {"seq": seq, "caminho": caminho, "valor": valor, "recusado_em": agora}
+                f.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.recusadas += len(recusadas)
+        metricas.incrementar("gateway_recusadas_firebase_total", len(recusadas))
+
+    def _compactar(self):
+        """Reescreve o WAL só com o pendente e a janela de dedup (chamado com o lock)"""
+        registros = [{"confirmado": self.confirmado}]
+        if self.dedup:
+            registros.append({"dedup": [[a, c] for a, c in self.dedup.items()]})
+        registros += [{"seq": seq, "caminho": caminho, "valor": valor}
+                      for caminho, (seq, valor, _) in self.pendentes.items()]
+        self.wal.reescrever(registros)
+        metricas.incrementar("gateway_compactacoes_total")
+
+    def _laco_envio(self):
+        while not self._parar.is_set():
+            with self._condicao:
+                if len(self.pendentes) < self.tamanho_lote:
+                    self._condicao.wait(self.intervalo)
+            try:
+                while self.enviar_lote() >= self.tamanho_lote:
+                    pass   # lote cheio: provavelmente há mais, envia sem esperar
+                self.falhas_seguidas = 0
+            except Exception as e:
+                self.falhas_seguidas += 1
+                metricas.incrementar("gateway_envio_erros_total", tipo=type(e).__name__)
+                espera = min(ESPERA_MAXIMA_ENVIO, self.intervalo * 2 ** self.falhas_seguidas)
+                print(f"Gateway: envio ao Firebase falhou ({e}). Nova tentativa em {espera:.1f}s")
+                self._parar.wait(espera)
+
+    def esvaziar(self, timeout=30.0):
+        """Envia tudo o que está pendente (usado ao parar e em testes). True se esvaziou."""
+        limite = time.monotonic() + timeout
+        while self.pendentes and time.monotonic() < limite:
+            try:
+                self.enviar_lote()
+            except Exception as e:
+                print(f"Gateway: envio ao Firebase falhou ({e})")
+                time.sleep(min(1.0, max(0.0, limite - time.monotonic())))
+        return not self.pendentes
+
+    def saude(self):
+        with self._lock:
+            return {
+                "pendentes": len(self.pendentes),
+                "seq": self.seq,
+                "confirmado": self.confirmado,
+                "ultimo_envio": self.ultimo_envio,
+                "falhas_seguidas": self.falhas_seguidas,
+                "recusadas": self.recusadas,
+            }
+
+    # =====================================================
+    # CICLO DE VIDA
+    def iniciar(self):
+        self._thread_envio = threading.Thread(target=self._laco_envio, name="gateway-envio", daemon=True)
+        self._thread_envio.start()
+        threading.Thread(target=self.servidor.serve_forever, name="gateway-http", daemon=True).start()
+        return self
+
+    def parar(self, esvaziar=True):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        self._parar.set()
+        with self._condicao:
+            self._condicao.notify_all()
+        if self._thread_envio is not None:
+            self._thread_envio.join()
+        if esvaziar:
+            self.esvaziar()
+        self.wal.fechar()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+# =====================================================
+# SERVIDOR HTTP
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"    # keep-alive: o dispositivo reaproveita a conexão
+    disable_nagle_algorithm = True
+    gateway = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, valor):
+        conteudo = json.dumps(valor).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def _escrever(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        try:
+            valor = json.loads(self.rfile.read(tamanho) or b"null")
+        except json.JSONDecodeError:
+            return self._responder(400, {"error": "JSON inválido"})
+        status, resposta = self.gateway.receber(
+            self.command, _partes(self.path), valor, self.headers.get("X-Id-Evento")
+        )
+        self._responder(status, resposta)
+
+    def do_GET(self):
+        if _partes(self.path) == ["saude"]:
+            return self._responder(200, self.gateway.saude())
+        self._responder(404, {"error": "o gateway só aceita escritas"})
+
+    do_PUT = _escrever
+    do_POST = _escrever
+    do_PATCH = _escrever
+    do_DELETE = _escrever
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=PORTA_GATEWAY)
+    parser.add_argument("--wal", default=CAMINHO_WAL)
+    parser.add_argument("--url", default=URL_BASE, help="URL base do Firebase")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_ENVIO, help="segundos entre envios")
+    args = parser.parse_args()
+
+    metricas.iniciar_servidor(PORTA_METRICAS)
+    gateway = GatewayBorda(args.url, args.wal, porta=args.porta, intervalo=args.intervalo).iniciar()
+    print(f"🛰️ Gateway de borda em {gateway.url} → {args.url} (Ctrl+C para parar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        gateway.parar()
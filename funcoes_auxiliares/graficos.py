@@ -0,0 +1,293 @@
+"""
+Gráficos das análises do supervisor, gerados num pool de processos com cache por versão.
+
+pandas, matplotlib e as análises só são importados dentro dos processos do pool
+(e por aquecer, em segundo plano): importar este módulo no bot não custa o
+carregamento da pilha de análise, então o bot volta a responder logo após reiniciar.
+"""
+import asyncio
+import importlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.armazenamento_eventos import SALA_UNICA, atualizar_sala, caminho_banco, versao_dados
+from funcoes_auxiliares.cliente_firebase import salas
+
+# =====================================================
+# CONFIGURAÇÕES
+# Um processo por análise (2 por sala) até o número de núcleos: com as salas em
+# paralelo, o tempo de resposta não cresce com a quantidade de salas
+PROCESSOS_RENDER = int(os.getenv("processos_render", "0")) or max(2, min(os.cpu_count() or 1, 2 * len(salas())))
+AQUECER = os.getenv("aquecer_analises", "1") != "0"
+ATRASO_AQUECIMENTO = 1.0   # segundos: deixa o bot atender primeiro o que chegou durante a parada
+
+# Carregados nos processos do pool (desenho + análises) e no processo do bot (/pico, /cartao)
+PILHA_POOL = ("matplotlib.figure", "matplotlib.backends.backend_agg",
+              "funcoes_auxiliares.analise_dados", "funcoes_auxiliares.analise_dados_fraude")
+PILHA_BOT = ("funcoes_auxiliares.ocupacao_serie", "funcoes_auxiliares.historico_cartao")
+
+_pool = None
+_cache = {}        # (tipo, sala) -> (versao, (png, texto))
+_em_andamento = {} # (tipo, sala, versao) -> Future
+_esperando = {}    # Future -> qtd de pedidos assíncronos aguardando
+_lock = threading.Lock()
+
+
+# =====================================================
+# DESENHO (Figure explícita, sem estado global do pyplot)
+def _para_png(fig):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    FigureCanvasAgg(fig)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+
+def desenhar_ocupacao(resultado):
+    import pandas as pd
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+
+    daily = resultado["daily"]
+    window = resultado["window"]
+    data_futura = resultado["data_futura"]
+    pred_futura = resultado["pred_futura"]
+
+    ax.plot(daily["date"], daily["acessos"], marker="o", label="Histórico Unificado", color='#1f77b4')
+    ax.plot(daily["date"], daily["ma"], linestyle='--', label=f"Tendência ({window}d)", color='#ff7f0e')
+
+    # Ponto da Previsão Futura
+    ax.scatter([pd.to_datetime(data_futura)], [pred_futura], color='red', s=120, zorder=5, label=f"Prev: {data_futura}")
+
+    ax.set_title(f"Análise de Demanda (Tempo Real)\nPrevisão {data_futura}: {int(pred_futura)} pessoas")
+    ax.set_xlabel("Data")
+    ax.set_ylabel("Acessos")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    ax.tick_params(axis='x', labelrotation=45)
+    return _para_png(fig)
+
+
+def desenhar_fraude(resultado):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+
+    contagem = resultado["contagem"]
+    cores = []
+    for k in contagem.keys():
+        if k == 'NORMAL': cores.append('green')
+        elif k == 'SUSPEITO': cores.append('orange')
+        elif k == 'FRAUDULENTO': cores.append('red')
+        else: cores.append('blue')
+
+    ax.bar(list(contagem.keys()), list(contagem.values()), color=cores)
+    ax.set_title(f"Auditoria de Segurança ({resultado['total_eventos']} eventos analisados)")
+    ax.set_xlabel("Categoria de Risco")
+    ax.set_ylabel("Qtd de Eventos")
+    ax.grid(axis='y', alpha=0.3)
+
+    for i, v in enumerate(contagem.values()):
+        ax.text(i, v, str(v), ha='center', va='bottom', fontweight='bold')
+    return _para_png(fig)
+
+
+# =====================================================
+# TAREFAS EXECUTADAS NOS PROCESSOS DO POOL
+# Cada tarefa devolve (png, texto, (segundos de análise, segundos de desenho));
+# as durações são registradas nas métricas pelo processo do bot.
+def _produzir_ocupacao(sala):
+    from funcoes_auxiliares.analise_dados import analise_dados, formatar_metricas
+    inicio = time.perf_counter()
+    resultado = analise_dados(sincronizar=False, sala=sala)
+    meio = time.perf_counter()
+    png = desenhar_ocupacao(resultado) if resultado else None
+    return png, formatar_metricas(resultado), (meio - inicio, time.perf_counter() - meio)
+
+
+def _produzir_fraude(sala):
+    from funcoes_auxiliares.analise_dados_fraude import analise_fraude
+    inicio = time.perf_counter()
+    resultado = analise_fraude(sincronizar=False, sala=sala)
+    meio = time.perf_counter()
+    png = desenhar_fraude(resultado) if resultado else None
+    return png, "", (meio - inicio, time.perf_counter() - meio)
+
+
+def _carregar(modulos):
+    """Importa os módulos (tarefa de aquecimento; devolve o pid de quem carregou)"""
+    for nome in modulos:
+        importlib.import_module(nome)
+    return os.getpid()
+
+
+_PRODUTORES = {"ocupacao": _produzir_ocupacao, "fraude": _produzir_fraude}
+
+
+def _obter_pool():
+    """Pool de processos (criado no primeiro uso); quem chama deve segurar _lock"""
+    global _pool
+    if _pool is None:
+        # spawn: o processo pai tem threads (bot + monitor), fork não é seguro
+        _pool = ProcessPoolExecutor(
+            max_workers=PROCESSOS_RENDER, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+# =====================================================
+# API USADA PELOS BOTS
+def _reservar(tipo, sala=SALA_UNICA):
+    """
+    Sincroniza o banco da sala e devolve (versao, resultado em cache ou None, Future).
+    Pedidos simultâneos da mesma sala e versão recebem o mesmo Future do pool.
+    """
+    with metricas.cronometrar("sincronizacao_segundos"):
+        atualizar_sala(sala)
+    versao = versao_dados(caminho_banco(sala))
+
+    with _lock:
+        em_cache = _cache.get((tipo, sala))
+        if em_cache and em_cache[0] == versao:
+            metricas.incrementar("graficos_cache_total", tipo=tipo, resultado="hit")
+            return versao, em_cache[1], None
+        futuro = _em_andamento.get((tipo, sala, versao))
+        novo = futuro is None
+        if novo:
+            futuro = _obter_pool().submit(_PRODUTORES[tipo], sala)
+            _em_andamento[(tipo, sala, versao)] = futuro
+    if novo:
+        # Fora do _lock: se a tarefa já terminou, o callback roda nesta thread e pega o _lock
+        futuro.add_done_callback(lambda f: _concluir(tipo, sala, versao, f))
+        metricas.incrementar("graficos_cache_total", tipo=tipo, resultado="miss")
+    return versao, None, futuro
+
+
+def _concluir(tipo, sala, versao, futuro):
+    """Callback do Future (uma vez por tarefa): guarda no cache e registra as durações"""
+    ok = not futuro.cancelled() and futuro.exception() is None
+    with _lock:
+        if ok:
+            png, texto, (segundos_analise, segundos_render) = futuro.result()
+            _cache[(tipo, sala)] = (versao, (png, texto))
+        _em_andamento.pop((tipo, sala, versao), None)
+    if not ok:
+        metricas.incrementar("graficos_erros_total", tipo=tipo)
+        return
+    metricas.observar("analise_segundos", segundos_analise, tipo=tipo)
+    metricas.observar("render_segundos", segundos_render, tipo=tipo)
+
+
+def gerar(tipo, sala=SALA_UNICA):
+    """
+    Retorna (png_bytes, texto) da análise 'ocupacao' ou 'fraude' da sala.
+    O resultado fica em cache pela versão do armazenamento (última chave/linha),
+    então pedidos repetidos sem eventos novos não recalculam nem redesenham.
+    Pedidos simultâneos da mesma versão compartilham a mesma tarefa do pool.
+    """
+    _, em_cache, futuro = _reservar(tipo, sala)
+    if em_cache is not None:
+        return em_cache
+    png, texto, _ = futuro.result()
+    return png, texto
+
+
+def gerar_salas(tipo):
+    """
+    {sala: (png_bytes, texto) ou exceção} de todas as salas. As sincronizações
+    correm em threads e as análises em processos do pool ao mesmo tempo.
+    """
+    lista = salas()
+    with ThreadPoolExecutor(max_workers=len(lista)) as executor:
+        futuros = {sala: executor.submit(gerar, tipo, sala) for sala in lista}
+    resultados = {}
+    for sala, futuro in futuros.items():
+        try:
+            resultados[sala] = futuro.result()
+        except Exception as e:
+            resultados[sala] = e
+    return resultados
+
+
+async def gerar_async(tipo, timeout, sala=SALA_UNICA):
+    """
+    Versão para o bot assíncrono: a sincronização roda numa thread e a tarefa do
+    pool é aguardada sem bloquear o event loop, por no máximo 'timeout' segundos.
+    Em caso de timeout (ou cancelamento do comando) a tarefa ainda na fila é
+    cancelada; se já estiver rodando num processo, ela termina e alimenta o cache
+    para o próximo pedido. Levanta asyncio.TimeoutError.
+    """
+    _, em_cache, futuro = await asyncio.to_thread(_reservar, tipo, sala)
+    if em_cache is not None:
+        return em_cache
+    with _lock:
+        _esperando[futuro] = _esperando.get(futuro, 0) + 1
+    try:
+        # shield: o timeout de um pedido não cancela o Future que outros aguardam
+        png, texto, _ = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(futuro)), timeout)
+        return png, texto
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        with _lock:
+            ultimo = _esperando.get(futuro) == 1
+        if ultimo and futuro.cancel():
+            metricas.incrementar("graficos_cancelados_total", tipo=tipo)
+        raise
+    finally:
+        with _lock:
+            _esperando[futuro] -= 1
+            if not _esperando[futuro]:
+                del _esperando[futuro]
+
+
+async def gerar_salas_async(tipo, timeout):
+    """gerar_salas para o bot assíncrono: {sala: (png, texto) ou exceção}, cada sala com seu timeout"""
+    lista = salas()
+    resultados = await asyncio.gather(*(gerar_async(tipo, timeout, sala) for sala in lista),
+                                      return_exceptions=True)
+    return dict(zip(lista, resultados))
+
+
+def aquecer(atraso=ATRASO_AQUECIMENTO, esperar=False):
+    """
+    Carrega a pilha de análise em segundo plano, depois que o bot já está no ar:
+    importa PILHA_BOT neste processo e sobe os processos do pool (cada um
+    importando PILHA_POOL). O primeiro /analise_*, /pico ou /cartao deixa de pagar
+    o import; um pedido que chegue antes simplesmente espera o import em curso.
+    Devolve a thread (esperar=True bloqueia até terminar).
+    """
+    def carregar():
+        time.sleep(atraso)
+        inicio = time.perf_counter()
+        try:
+            _carregar(PILHA_BOT)
+            with _lock:
+                pool = _obter_pool()
+            tarefas = [pool.submit(_carregar, PILHA_POOL) for _ in range(PROCESSOS_RENDER)]
+            for tarefa in tarefas:
+                tarefa.result()
+        except Exception as e:
+            metricas.incrementar("aquecimento_erros_total")
+            print(f"Aquecimento da análise falhou: {e}")
+            return
+        metricas.observar("aquecimento_segundos", time.perf_counter() - inicio)
+
+    thread = threading.Thread(target=carregar, name="aquecimento", daemon=True)
+    thread.start()
+    if esperar:
+        thread.join()
+    return thread
+
+
+def encerrar():
+    """Desliga o pool de processos (tarefas na fila são canceladas)"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,123 @@
+"""
+Histórico de um cartão a partir do índice por cartão do armazenamento local.
+
+eventos_unicos tem um índice (cartao, timestamp, linha): para cada UID, os
+timestamps em ordem com o rowid do evento. Buscar um cartão custa O(log n)
+mais os eventos daquele cartão, em vez de varrer o histórico inteiro como o
+/analise_fraude. O motor_regras roda sobre esse recorte com entre_cartoes=False:
+as regras que só olham o próprio cartão (sequência, permanência, horário, acesso
+negado, uso simultâneo, entrada com o cartão já dentro) dão os mesmos scores da
+análise completa; as que comparam cartões diferentes (leitor mais rápido que o
+cooldown, saída com a sala vazia) precisam da sala inteira e ficam de fora, com
+um aviso no texto do /cartao.
+"""
+import numpy as np
+
+from funcoes_auxiliares.analise_dados_fraude import calcular_perfil, motor_regras
+from funcoes_auxiliares.armazenamento_eventos import CAMINHO_BANCO, conectar, normalizar_cartao
+from funcoes_auxiliares.modelo_eventos import LEITOR_ENTRADA, construir_tabela, horas_do_dia
+
+# =====================================================
+# CONFIGURAÇÕES
+EVENTOS_RECENTES = 10
+
+
+def _ler_cartao(conn, cartao):
+    """Eventos do cartão em ordem de horário, via índice (sem varrer a tabela de eventos)"""
+    return conn.execute(
+        "SELECT u.timestamp, u.leitor, e.acesso_permitido, e.fraudulento "
+        "FROM eventos_unicos u INDEXED BY idx_unicos_cartao JOIN eventos e ON e.rowid = u.linha "
+        "WHERE u.cartao = ? ORDER BY u.timestamp",
+        (cartao,),
+    ).fetchall()
+
+
+def consultar_cartao(cartao, recentes=EVENTOS_RECENTES, caminho=CAMINHO_BANCO):
+    """
+    Resumo de um cartão. Retorna None se ele nunca apareceu, ou
+    {"cartao", "total", "recentes": DataFrame pontuado (mais novo primeiro),
+     "perfil": {"media_entrada", "media_saida", "entradas_por_hora": array de 24},
+     "contagem": {classificação: qtd}, "maior_score", "dentro": bool, "ultimo": dict}
+    """
+    cartao = normalizar_cartao(cartao)
+    conn = conectar(caminho)
+    try:
+        linhas = _ler_cartao(conn, cartao)
+    finally:
+        conn.close()
+    if not linhas:
+        return None
+
+    ts, leitores, permitidos, fraudulentos = zip(*linhas)
+    tabela = construir_tabela(ts, [cartao] * len(ts), leitores, permitidos, fraudulentos)
+    if tabela.empty:
+        return None
+
+    pontuados = motor_regras(tabela, entre_cartoes=False)
+    perfil = calcular_perfil(tabela).iloc[0]
+    entradas = tabela["leitor"].to_numpy() == LEITOR_ENTRADA
+
+    # Dentro da sala se o último evento foi uma entrada liberada
+    ultimo = tabela.iloc[-1]
+    dentro = bool(ultimo["leitor"] == LEITOR_ENTRADA and ultimo["permitido"])
+
+    return {
+        "cartao": cartao,
+        "total": len(tabela),
+        "recentes": pontuados.iloc[::-1].head(recentes).reset_index(drop=True),
+        "perfil": {
+            "media_entrada": None if np.isnan(perfil["media_entrada"]) else float(perfil["media_entrada"]),
+            "media_saida": None if np.isnan(perfil["media_saida"]) else float(perfil["media_saida"]),
+            "entradas_por_hora": np.bincount(horas_do_dia(tabela)[entradas], minlength=24),
+        },
+        "contagem": pontuados["classificacao"].value_counts().to_dict(),
+        "maior_score": int(pontuados["score"].max()),
+        "dentro": dentro,
+        "ultimo": pontuados.iloc[-1].to_dict(),
+    }
+
+
+# =====================================================
+# TEXTO PARA O BOT
+def _hora(media):
+    if media is None:
+        return "—"
+    return f"{int(media):02d}:{int(round((media % 1) * 60)) % 60:02d}"
+
+
+def formatar_cartao(resumo, presenca=None):
+    """
+    Texto do /cartao. 'presenca' é o nó /presenca/<uid> do Firebase ({dentro, timestamp}),
+    quando disponível; sem ele, o estado vem do último evento armazenado.
+    """
+    perfil = resumo["perfil"]
+    if presenca is not None and "dentro" in presenca:
+        dentro = bool(presenca["dentro"])
+        origem = "tempo real"
+    else:
+        dentro = resumo["dentro"]
+        origem = "último evento"
+
+    por_hora = perfil["entradas_por_hora"]
+    horas_frequentes = [f"{h:02d}h ({por_hora[h]})" for h in np.argsort(por_hora, kind="stable")[::-1][:3]
+                        if por_hora[h] > 0]
+    contagem = resumo["contagem"]
+
+    linhas = [
+        f"💳 **Cartão** `{resumo['cartao']}`",
+        f"{'🟢 Dentro da sala' if dentro else '⚪ Fora da sala'} ({origem})",
+        "",
+        f"📊 **Perfil:** entrada média {_hora(perfil['media_entrada'])}, "
+        f"saída média {_hora(perfil['media_saida'])}",
+        f"🕒 **Horários de entrada mais comuns:** {', '.join(horas_frequentes) or '—'}",
+        f"⚠️ **Risco:** maior score {resumo['maior_score']} — "
+        f"{contagem.get('FRAUDULENTO', 0)} fraudulentos, {contagem.get('SUSPEITO', 0)} suspeitos "
+        f"em {resumo['total']} eventos",
+        "ℹ️ Sem as regras entre cartões (leitor, sala vazia): veja o /analise_fraude",
+        "",
+        "**Últimos eventos:**",
+    ]
+    for r in resumo["recentes"].to_dict("records"):
+        marca = {"FRAUDULENTO": "🔴", "SUSPEITO": "🟠"}.get(r["classificacao"], "▫️")
+        linhas.append(f"{marca} {r['timestamp'].strftime('%d/%m %H:%M')} {r['leitor'] or '?'} (score {r['score']})")
+    return "\n".join(linhas)
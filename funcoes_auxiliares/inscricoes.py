@@ -0,0 +1,183 @@
+"""
+Avisos de vaga do aluno_bot.
+
+Quem pede /avisar_vaga com a sala lotada entra numa tabela SQLite indexada por
+sala e ordem de inscrição. O observador do /estado (um por sala) chama
+NotificadorVagas.atualizar_estado(); quando a sala deixa de estar lotada, os
+inscritos dela são avisados em lotes (primeiro quem se inscreveu antes), com
+envio paralelo limitado pelo LimitadorTelegram, e saem da lista. Se a sala lotar
+de novo no meio do envio, o restante espera a próxima vaga.
+
+Cada lote é retirado da lista numa única instrução (DELETE ... RETURNING, SQLite
+3.35+) antes do envio, então dois notificadores nunca avisam o mesmo inscrito.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.cliente_firebase import SALA_UNICA
+from funcoes_auxiliares.envio_telegram import LimitadorTelegram, enviar_com_retentativa
+
+# =====================================================
+# CONFIGURAÇÕES
+CAMINHO_BANCO_INSCRICOES = os.getenv("caminho_banco_inscricoes", "inscricoes.db")
+TAMANHO_LOTE = 200          # inscritos lidos/removidos por vez
+ENVIOS_PARALELOS = 8        # requisições simultâneas ao Telegram (o limitador controla a taxa)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS inscricoes (
+    chat_id   INTEGER NOT NULL,
+    sala      TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    PRIMARY KEY (chat_id, sala)
+);
+CREATE INDEX IF NOT EXISTS idx_inscricoes_ordem ON inscricoes (sala, criado_em, chat_id);
+"""
+
+
+# =====================================================
+# ARMAZENAMENTO
+def conectar(caminho=CAMINHO_BANCO_INSCRICOES):
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.executescript(_ESQUEMA)
+    return conn
+
+
+def inscrever(chat_id, sala=SALA_UNICA, caminho=CAMINHO_BANCO_INSCRICOES):
+    """Retorna False se o chat já estava inscrito nesta sala"""
+    conn = conectar(caminho)
+    try:
+        with conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO inscricoes (chat_id, sala, criado_em) VALUES (?, ?, ?)",
+                (chat_id, sala, time.time()),
+            )
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def cancelar(chat_id, sala=None, caminho=CAMINHO_BANCO_INSCRICOES):
+    """Cancela a inscrição na sala (sala=None: em todas). Retorna False se o chat não estava inscrito"""
+    conn = conectar(caminho)
+    try:
+        with conn:
+            if sala is None:
+                cur = conn.execute("DELETE FROM inscricoes WHERE chat_id = ?", (chat_id,))
+            else:
+                cur = conn.execute("DELETE FROM inscricoes WHERE chat_id = ? AND sala = ?", (chat_id, sala))
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def contar(sala=None, caminho=CAMINHO_BANCO_INSCRICOES):
+    conn = conectar(caminho)
+    try:
+        if sala is None:
+            return conn.execute("SELECT COUNT(*) FROM inscricoes").fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM inscricoes WHERE sala = ?", (sala,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def retirar_lote(sala, ate, tamanho=TAMANHO_LOTE, caminho=CAMINHO_BANCO_INSCRICOES):
+    """
+    Remove da lista e devolve os primeiros chat_ids da sala inscritos até o
+    instante 'ate', em ordem de inscrição (usa o índice). A leitura e a remoção
+    são a mesma instrução, então quem já foi retirado não volta em outro lote.
+    """
+    conn = conectar(caminho)
+    try:
+        with conn:
+            linhas = conn.execute(
+                "DELETE FROM inscricoes WHERE rowid IN ("
+                "SELECT rowid FROM inscricoes WHERE sala = ? AND criado_em <= ? "
+                "ORDER BY criado_em, chat_id LIMIT ?) RETURNING criado_em, chat_id",
+                (sala, ate, tamanho),
+            ).fetchall()
+        return [chat_id for _, chat_id in sorted(linhas)]
+    finally:
+        conn.close()
+
+
+# =====================================================
+# NOTIFICAÇÃO
+def sala_lotada(estado):
+    estado = estado or {}
+    return estado.get('ocupacao_atual', 0) >= estado.get('limite_ocupacao', 10)
+
+
+def formatar_aviso(estado, sala=""):
+    qtd = estado.get('ocupacao_atual', 0)
+    limite = estado.get('limite_ocupacao', 10)
+    return f"""
+🟢 **Abriu vaga na sala{' ' + sala if sala else ''}!**
+
+👥 Pessoas: {qtd} / {limite}
+_Corra, outras pessoas também foram avisadas._
+    """
+
+
+class NotificadorVagas:
+    """
+    enviar(chat_id, texto) fala com o Telegram (bloqueante).
+    atualizar_estado() é chamado pelo observador do /estado; o envio roda numa thread própria.
+    Com várias salas há um notificador por sala, cada um avisando só os inscritos
+    da sua sala; o limitador deve ser o mesmo para todos (o limite do Telegram é
+    por bot, não por sala).
+    """
+
+    def __init__(self, enviar, caminho=CAMINHO_BANCO_INSCRICOES, limitador=None, sala=""):
+        self.enviar = enviar
+        self.caminho = caminho
+        self.sala = sala
+        self.limitador = limitador or LimitadorTelegram()
+        self.estado = None
+        self._vaga_aberta = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        return self
+
+    def atualizar_estado(self, estado):
+        anterior, self.estado = self.estado, dict(estado or {})
+        if not sala_lotada(self.estado) and (anterior is None or sala_lotada(anterior)):
+            self._vaga_aberta.set()
+
+    def _executar(self):
+        while True:
+            self._vaga_aberta.wait()
+            self._vaga_aberta.clear()
+            try:
+                self.notificar()
+            except Exception as e:
+                print(f"Erro ao avisar inscritos: {e}")
+
+    def notificar(self):
+        """Avisa os inscritos até a lista acabar ou a sala lotar de novo. Retorna quantos foram avisados."""
+        inicio = time.time()
+        avisados = 0
+        with ThreadPoolExecutor(ENVIOS_PARALELOS) as executor:
+            while not sala_lotada(self.estado):
+                # O lote sai da lista antes do envio: quem falhar (ex.: bloqueou o bot) não é tentado de novo
+                lote = retirar_lote(self.sala, inicio, caminho=self.caminho)
+                if not lote:
+                    break
+                texto = formatar_aviso(self.estado, self.sala)
+                entregues = list(executor.map(
+                    lambda chat_id: enviar_com_retentativa(self.enviar, chat_id, texto, self.limitador),
+                    lote,
+                ))
+                avisados += sum(entregues)
+                metricas.incrementar("vagas_avisos_total", sum(entregues), resultado="enviado")
+                metricas.incrementar("vagas_avisos_total", len(lote) - sum(entregues), resultado="erro")
+        if avisados:
+            metricas.observar("vagas_notificacao_segundos", time.time() - inicio)
+            print(f"[VAGA] {avisados} inscritos avisados em {time.time() - inicio:.1f}s")
+        return avisados
@@ -0,0 +1,142 @@
+"""
+Leitura incremental de históricos grandes, com memória constante.
+
+Dois formatos:
+    JSON   o objeto {push_id: evento} do Firebase / dadosreais.json (indentado ou não)
+    JSONL  um registro por linha: {"_chave": ..., campos...} (gerador_eventos) ou
+           {push_id: evento} (segmentos do arquivamento); .gz é aberto comprimido
+
+O JSON é lido em blocos de TAMANHO_BLOCO caracteres; cada chave sai de uma regex
+e cada evento do scanner em C do módulo json, então só um bloco e um lote ficam
+em memória, não importa o tamanho do arquivo. ler_lotes entrega dicionários {chave: evento} de tamanho
+fixo, prontos para inserir_eventos; modelo_eventos.lotes_de_arquivo converte
+cada lote direto para a tabela colunar.
+"""
+import gzip
+import json
+import os
+import re
+
+# =====================================================
+# CONFIGURAÇÕES
+TAMANHO_BLOCO = 1 << 20     # caracteres lidos por vez
+TAMANHO_LOTE = 10_000       # eventos por lote
+
+_ESPACO = re.compile(r"[ \t\n\r]*")
+_PAR = re.compile(r'[ \t\n\r]*,?[ \t\n\r]*"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*')   # , "chave":
+_SEPARADOR = re.compile(r"[ \t\n\r]*([,}])")
+_FECHA = re.compile(r"[ \t\n\r]*}")
+_VIRGULA = re.compile(r"[ \t\n\r]*,?")
+
+
+def _abrir(arquivo):
+    if arquivo.endswith(".gz"):
+        return gzip.open(arquivo, "rt", encoding="utf-8")
+    return open(arquivo, "r", encoding="utf-8")
+
+
+def eh_jsonl(arquivo):
+    return arquivo.endswith((".jsonl", ".jsonl.gz", ".ndjson"))
+
+
+# =====================================================
+# JSON {chave: evento}
+def iterar_json(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """(chave, evento) do objeto de primeiro nível, sem carregar o arquivo inteiro"""
+    decodificar = json.JSONDecoder().scan_once     # scanner em C usado pelo json.loads
+    with _abrir(arquivo) as f:
+        buffer, pos, fim_arquivo = "", 0, False
+        corte_invalido = -1
+
+        def ler_mais():
+            nonlocal buffer, pos, fim_arquivo, corte_invalido
+            if fim_arquivo:
+                raise ValueError(f"'{arquivo}' terminou no meio de um objeto JSON")
+            bloco = f.read(tamanho_bloco)
+            fim_arquivo = not bloco
+            buffer, pos, corte_invalido = buffer[pos:] + bloco, 0, corte_invalido - pos
+
+        while _ESPACO.match(buffer, pos).end() >= len(buffer) and not fim_arquivo:
+            ler_mais()
+        pos = _ESPACO.match(buffer, pos).end()
+        if buffer.startswith("null", pos) or pos >= len(buffer):
+            return
+        if buffer[pos] != "{":
+            raise ValueError(f"'{arquivo}' não é um objeto JSON {{chave: evento}}")
+        pos += 1
+
+        while True:
+            # Caminho rápido: todos os pares completos do buffer num único json.loads.
+            # O corte fica no último "}," — se ele cair dentro de uma string ou de um
+            # objeto aninhado o trecho não é JSON válido e seguimos par a par.
+            corte = buffer.rfind("},", pos)
+            if corte > pos and corte != corte_invalido:
+                inicio = _VIRGULA.match(buffer, pos).end()
+                try:
+                    pares = json.loads("{" + buffer[inicio:corte + 1] + "}")
+                except json.JSONDecodeError:
+                    pares, corte_invalido = None, corte
+                if pares is not None:
+                    yield from pares.items()
+                    pos = corte + 1
+                    if len(buffer) - pos < tamanho_bloco // 2 and not fim_arquivo:
+                        ler_mais()
+                    continue
+
+            par = _PAR.match(buffer, pos)
+            if par is None or par.end() >= len(buffer):
+                if _FECHA.match(buffer, pos):
+                    return
+                ler_mais()
+                continue
+            try:
+                evento, p = decodificar(buffer, par.end())
+            except (StopIteration, json.JSONDecodeError):   # evento cortado no fim do bloco
+                ler_mais()
+                continue
+            # Um número no fim do bloco pode estar cortado ("-0" de "-0.5"):
+            # só aceita o valor se o separador seguinte já estiver no buffer
+            separador = _SEPARADOR.match(buffer, p)
+            if separador is None:
+                ler_mais()
+                continue
+
+            chave = par.group(1)
+            yield (json.loads(f'"{chave}"') if "\\" in chave else chave), evento
+            if separador.group(1) == "}":
+                return
+            pos = p
+
+
+# =====================================================
+# JSON LINES
+def iterar_jsonl(arquivo):
+    """(chave, evento) de cada linha; linhas sem chave recebem '<arquivo>:<nº da linha>'"""
+    nome = os.path.basename(arquivo)
+    with _abrir(arquivo) as f:
+        for numero, linha in enumerate(f, 1):
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            if "_chave" in registro:
+                yield registro.pop("_chave"), registro
+            elif len(registro) == 1 and isinstance(next(iter(registro.values())), dict):
+                yield from registro.items()
+            else:
+                yield f"{nome}:{numero}", registro
+
+
+def iterar_registros(arquivo):
+    return iterar_jsonl(arquivo) if eh_jsonl(arquivo) else iterar_json(arquivo)
+
+
+def ler_lotes(arquivo, tamanho=TAMANHO_LOTE):
+    """Dicionários {chave: evento} com até 'tamanho' eventos, em ordem de arquivo"""
+    lote = {}
+    for chave, evento in iterar_registros(arquivo):
+        lote[chave] = evento
+        if len(lote) >= tamanho:
+            yield lote
+            lote = {}
+    if lote:
+        yield lote
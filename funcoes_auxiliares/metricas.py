@@ -0,0 +1,202 @@
+"""
+Instrumentação dos bots: contadores, medidores e histogramas de latência.
+
+Tudo fica em memória no processo do bot. Os valores são expostos em texto no
+formato do Prometheus (servidor HTTP em localhost, GET /metrics) e resumidos
+com p50/p95/p99 pelo comando /metrics do supervisor.
+
+Os histogramas usam buckets fixos (memória constante por série); os percentis
+são estimados por interpolação linear dentro do bucket, como o histogram_quantile
+do Prometheus.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =====================================================
+# CONFIGURAÇÕES
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # segundos
+PERCENTIS = (0.5, 0.95, 0.99)
+HOST_METRICAS = os.getenv("host_metricas", "127.0.0.1")
+
+_lock = threading.Lock()
+_contadores = {}   # (nome, rotulos) -> valor
+_medidores = {}    # (nome, rotulos) -> valor
+_histogramas = {}  # (nome, rotulos) -> Histograma
+
+
+class Histograma:
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS) + 1)  # último = acima do maior bucket (+Inf)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(BUCKETS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def percentil(self, q):
+        if self.total == 0:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for i, qtd in enumerate(self.contagens):
+            if qtd and acumulado + qtd >= alvo:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                inferior = BUCKETS[i - 1] if i else 0.0
+                return inferior + (BUCKETS[i] - inferior) * (alvo - acumulado) / qtd
+            acumulado += qtd
+        return BUCKETS[-1]
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+
+# =====================================================
+# REGISTRO
+def incrementar(nome, valor=1, **rotulos):
+    chave = _chave(nome, rotulos)
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+def definir(nome, valor, **rotulos):
+    with _lock:
+        _medidores[_chave(nome, rotulos)] = valor
+
+
+def observar(nome, segundos, **rotulos):
+    chave = _chave(nome, rotulos)
+    with _lock:
+        histograma = _histogramas.get(chave)
+        if histograma is None:
+            histograma = _histogramas[chave] = Histograma()
+        histograma.observar(segundos)
+
+
+@contextmanager
+def cronometrar(nome, **rotulos):
+    """with cronometrar("analise_segundos", tipo="fraude"): ... (registra mesmo com exceção)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nome, time.perf_counter() - inicio, **rotulos)
+
+
+def cronometrado(nome, **rotulos):
+    """Decorador para handlers: @cronometrado("bot_comando_segundos", bot="aluno", comando="ocupacao")"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with cronometrar(nome, **rotulos):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def limpar():
+    with _lock:
+        _contadores.clear()
+        _medidores.clear()
+        _histogramas.clear()
+
+
+# =====================================================
+# EXPOSIÇÃO
+def _formatar_rotulos(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}"
+
+
+def texto_prometheus():
+    """Todas as séries no formato de exposição em texto do Prometheus"""
+    with _lock:
+        contadores = sorted(_contadores.items())
+        medidores = sorted(_medidores.items())
+        histogramas = sorted(
+            (chave, (list(h.contagens), h.soma, h.total)) for chave, h in _histogramas.items()
+        )
+
+    linhas = []
+    declarados = set()
+    for tipo, series in (("counter", contadores), ("gauge", medidores)):
+        for (nome, rotulos), valor in series:
+            if nome not in declarados:
+                linhas.append(f"# TYPE {nome} {tipo}")
+                declarados.add(nome)
+            linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor}")
+
+    for (nome, rotulos), (contagens, soma, total) in histogramas:
+        if nome not in declarados:
+            linhas.append(f"# TYPE {nome} histogram")
+            declarados.add(nome)
+        acumulado = 0
+        for limite, qtd in zip(BUCKETS + ("+Inf",), contagens):
+            acumulado += qtd
+            linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, [('le', limite)])} {acumulado}")
+        linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {soma:.6f}")
+        linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {total}")
+    return "\n".join(linhas) + "\n"
+
+
+def resumo():
+    """Texto curto para o Telegram: percentis de cada histograma e os contadores"""
+    with _lock:
+        histogramas = sorted(
+            (nome, rotulos, h.total, [h.percentil(q) for q in PERCENTIS])
+            for (nome, rotulos), h in _histogramas.items()
+        )
+        contadores = sorted(_contadores.items())
+        medidores = sorted(_medidores.items())
+
+    if not (histogramas or contadores or medidores):
+        return "Nenhuma métrica registrada ainda."
+
+    linhas = []
+    for nome, rotulos, total, percentis in histogramas:
+        valores = " ".join(
+            f"p{int(q * 100)}={p * 1000:.0f}ms" for q, p in zip(PERCENTIS, percentis)
+        )
+        linhas.append(f"{nome}{_formatar_rotulos(rotulos)} n={total} {valores}")
+    for (nome, rotulos), valor in contadores + medidores:
+        linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor}")
+    return "\n".join(linhas)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        corpo = texto_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+def iniciar_servidor(porta, host=HOST_METRICAS):
+    """Serve GET /metrics numa thread daemon. Retorna o servidor (ou None se a porta estiver ocupada)"""
+    try:
+        servidor = ThreadingHTTPServer((host, porta), _Handler)
+    except OSError as e:
+        print(f"⚠️ Endpoint de métricas indisponível em {host}:{porta}: {e}")
+        return None
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    print(f"📊 Métricas em http://{host}:{servidor.server_address[1]}/metrics")
+    return servidor
@@ -0,0 +1,151 @@
+"""
+Representação colunar compacta dos eventos, compartilhada pelas análises.
+
+Cada evento ocupa ~16 bytes em vez de um dicionário Python:
+    timestamp   int64   segundos desde 1970 (relógio local do dispositivo, sem fuso)
+    cartao      category (códigos int8/int16 + dicionário de UIDs)
+    leitor      uint8   0 = entrada, 1 = saida, 255 = desconhecido
+    permitido   bool    (ausente conta como permitido)
+    fraudulento bool
+    ocupacao    int16   ocupacao_apos_evento (-1 quando ausente)
+    origem      uint8   0 = histórico local, 1 = Firebase
+"""
+import numpy as np
+import pandas as pd
+
+from funcoes_auxiliares.armazenamento_eventos import (
+    CAMINHO_BANCO,
+    CHAVE_DEDUP,
+    ORIGEM_HISTORICO,
+    conectar,
+)
+from funcoes_auxiliares.leitura_streaming import TAMANHO_LOTE, ler_lotes
+
+LEITORES = ("entrada", "saida")
+LEITOR_ENTRADA = 0
+LEITOR_SAIDA = 1
+LEITOR_DESCONHECIDO = 255
+
+COLUNAS = ("timestamp", "cartao", "leitor", "permitido", "fraudulento", "ocupacao", "origem")
+
+
+def _para_epoch(timestamps):
+    """Array de strings ISO -> int64 (segundos); inválidos viram NaT e são marcados"""
+    dt = pd.to_datetime(pd.Series(timestamps, dtype=object), format="ISO8601", errors="coerce")
+    if getattr(dt.dt, "tz", None) is not None:
+        dt = dt.dt.tz_localize(None)
+    validos = dt.notna().to_numpy()
+    segundos = dt.to_numpy(dtype="datetime64[s]", na_value=np.datetime64("NaT")).astype(np.int64)
+    return segundos, validos
+
+
+def _codificar_leitor(leitores):
+    codigos = np.full(len(leitores), LEITOR_DESCONHECIDO, dtype=np.uint8)
+    leitores = np.asarray(leitores, dtype=object)
+    for codigo, nome in enumerate(LEITORES):
+        codigos[leitores == nome] = codigo
+    return codigos
+
+
+def _coluna(valores, padrao, dtype):
+    """Converte uma coluna crua (com None) para numpy, preenchendo ausentes com 'padrao'"""
+    serie = pd.Series(valores, dtype=object)
+    return serie.where(serie.notna(), padrao).to_numpy().astype(dtype)
+
+
+def construir_tabela(timestamps, cartoes, leitores, permitidos, fraudulentos=None,
+                     ocupacoes=None, origens=None):
+    """
+    Monta a tabela colunar a partir de colunas cruas (listas/arrays do JSON ou SQLite).
+    Eventos sem timestamp válido são descartados.
+    """
+    n = len(timestamps)
+    segundos, validos = _para_epoch(timestamps)
+
+    permitido = _coluna(permitidos, True, bool)
+    fraudulento = np.zeros(n, dtype=bool) if fraudulentos is None else _coluna(fraudulentos, False, bool)
+    ocupacao = np.full(n, -1, dtype=np.int16) if ocupacoes is None else _coluna(ocupacoes, -1, np.int16)
+    origem = np.zeros(n, dtype=np.uint8) if origens is None else \
+        np.asarray(origens, dtype=np.uint8)
+
+    tabela = pd.DataFrame({
+        "timestamp": segundos,
+        "cartao": pd.Categorical(cartoes),
+        "leitor": _codificar_leitor(leitores),
+        "permitido": permitido,
+        "fraudulento": fraudulento,
+        "ocupacao": ocupacao,
+        "origem": origem,
+    })
+    return tabela[validos].reset_index(drop=True)
+
+
+def deduplicar(tabela):
+    """Remove eventos repetidos em (timestamp, cartao, leitor), mantendo a primeira ocorrência"""
+    return tabela.drop_duplicates(subset=list(CHAVE_DEDUP)).reset_index(drop=True)
+
+
+def carregar_tabela(caminho=CAMINHO_BANCO, dedup=True):
+    """Lê o armazenamento local direto para a tabela colunar"""
+    conn = conectar(caminho)
+    try:
+        linhas = conn.execute(
+            "SELECT timestamp, cartao, leitor, acesso_permitido, fraudulento, "
+            "ocupacao_apos_evento, origem FROM eventos ORDER BY rowid"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    if not linhas:
+        return construir_tabela([], [], [], [])
+    ts, cartoes, leitores, permitidos, fraudulentos, ocupacoes, origens = zip(*linhas)
+    origens = [0 if o == ORIGEM_HISTORICO else 1 for o in origens]
+    tabela = construir_tabela(ts, cartoes, leitores, permitidos, fraudulentos, ocupacoes, origens)
+    return deduplicar(tabela) if dedup else tabela
+
+
+def _tabela_do_lote(lote):
+    eventos = list(lote.values())
+    coluna = lambda campo: [e.get(campo) if isinstance(e, dict) else None for e in eventos]
+    return construir_tabela(
+        coluna("timestamp"), coluna("cartao"), coluna("leitor"), coluna("acesso_permitido"),
+        coluna("fraudulento"), coluna("ocupacao_apos_evento"),
+    )
+
+
+def lotes_de_arquivo(arquivo, tamanho=TAMANHO_LOTE):
+    """Tabelas colunares de até 'tamanho' eventos lidas em streaming de um JSON/JSONL"""
+    for lote in ler_lotes(arquivo, tamanho):
+        yield _tabela_do_lote(lote)
+
+
+def carregar_tabela_arquivo(arquivo, dedup=True, tamanho=TAMANHO_LOTE):
+    """
+    Tabela colunar de um arquivo de histórico sem montar o dicionário inteiro:
+    o pico de memória fica em torno de duas vezes a tabela final (~16 bytes/evento,
+    na concatenação dos lotes) em vez de várias vezes o tamanho do JSON.
+    """
+    tabelas = list(lotes_de_arquivo(arquivo, tamanho))
+    if not tabelas:
+        return construir_tabela([], [], [], [])
+    cartoes = pd.api.types.union_categoricals([t["cartao"] for t in tabelas])
+    tabela = pd.concat([t.drop(columns="cartao") for t in tabelas], ignore_index=True)
+    tabela.insert(1, "cartao", cartoes)
+    return deduplicar(tabela) if dedup else tabela
+
+
+# =====================================================
+# CONVERSÕES DE APOIO
+def horas_do_dia(tabela):
+    return ((tabela["timestamp"].to_numpy() // 3600) % 24).astype(np.int8)
+
+
+def datas(tabela):
+    return tabela["timestamp"].to_numpy().astype("datetime64[s]").astype("datetime64[D]")
+
+
+def nomes_leitor(codigos):
+    """Códigos uint8 -> nomes ('entrada'/'saida'/None)"""
+    nomes = np.array(LEITORES + (None,), dtype=object)
+    codigos = np.asarray(codigos)
+    return nomes[np.where(codigos == LEITOR_DESCONHECIDO, len(LEITORES), codigos)]
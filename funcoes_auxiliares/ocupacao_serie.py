@@ -0,0 +1,387 @@
+"""
+Curva de ocupação da sala reconstruída a partir dos eventos.
+
+O firmware soma 1 numa entrada permitida e subtrai 1 numa saída (nunca abaixo
+de zero). Isso é uma soma acumulada "refletida" em zero, então a curva inteira
+sai vetorizada: S = L0 + cumsum(delta); ocupacao = S - min(0, min acumulado de S).
+Onde o evento trouxe ocupacao_apos_evento, o valor reconstruído é conferido
+(divergências apontam reinícios do ESP32 ou eventos perdidos).
+
+Para consultas rápidas, duas tabelas no mesmo banco dos eventos, mantidas de
+forma incremental a partir de eventos_unicos (só os eventos novos são lidos):
+    ocupacao_serie  (timestamp, ocupacao)       nível após cada segundo com mudança
+    ocupacao_cubo   (dia_semana, hora, ...)     pessoa-segundos, segundos observados e pico
+"""
+import calendar
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.armazenamento_eventos import (
+    CAMINHO_BANCO,
+    SALA_UNICA,
+    atualizar_se_vencido,
+    banco_sala,
+    conectar,
+    gravar_meta,
+    ler_meta,
+)
+from funcoes_auxiliares.modelo_eventos import LEITOR_ENTRADA, LEITOR_SAIDA, construir_tabela
+
+# =====================================================
+# CONFIGURAÇÕES
+LACUNA_MAXIMA = 2 * 86400           # intervalos sem eventos maiores que isso não entram no cubo
+DIAS_SEMANA = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ocupacao_serie (
+    timestamp INTEGER PRIMARY KEY,
+    ocupacao INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ocupacao_cubo (
+    dia_semana INTEGER NOT NULL,
+    hora INTEGER NOT NULL,
+    pessoa_segundos REAL NOT NULL,
+    segundos REAL NOT NULL,
+    pico INTEGER NOT NULL,
+    PRIMARY KEY (dia_semana, hora)
+);
+"""
+
+# =====================================================
+# RECONSTRUÇÃO VETORIZADA
+def _variacoes(leitor, permitido):
+    """+1 por entrada permitida, -1 por saída, 0 no resto (negadas, leitor desconhecido)"""
+    delta = np.zeros(len(leitor), dtype=np.int64)
+    delta[(leitor == LEITOR_ENTRADA) & permitido] = 1
+    delta[leitor == LEITOR_SAIDA] = -1
+    return delta
+
+
+def _niveis(delta, inicial=0):
+    """Ocupação após cada evento: soma acumulada que nunca fica abaixo de zero"""
+    soma = inicial + np.cumsum(delta)
+    return soma - np.minimum(0, np.minimum.accumulate(soma))
+
+
+def reconstruir_ocupacao(tabela, inicial=0):
+    """
+    Curva de ocupação de uma tabela colunar (modelo_eventos), em ordem de horário,
+    partindo de 'inicial' pessoas. Retorna DataFrame (timestamp, ocupacao, registrada);
+    registrada = -1 quando o evento não trouxe ocupacao_apos_evento.
+    """
+    ordem = np.argsort(tabela["timestamp"].to_numpy(), kind="stable")
+    leitor = tabela["leitor"].to_numpy()[ordem]
+    permitido = tabela["permitido"].to_numpy()[ordem]
+    return pd.DataFrame({
+        "timestamp": tabela["timestamp"].to_numpy()[ordem],
+        "ocupacao": _niveis(_variacoes(leitor, permitido), inicial).astype(np.int32),
+        "registrada": tabela["ocupacao"].to_numpy()[ordem],
+    })
+
+
+def conferir_ocupacao(tabela):
+    """Compara a curva reconstruída com ocupacao_apos_evento, onde ele existe"""
+    curva = reconstruir_ocupacao(tabela)
+    com_registro = curva["registrada"].to_numpy() >= 0
+    diferenca = np.abs(curva["ocupacao"].to_numpy() - curva["registrada"].to_numpy())[com_registro]
+    divergentes = np.flatnonzero(diferenca)
+
+    primeira = None
+    if len(divergentes):
+        linha = curva[com_registro].iloc[divergentes[0]]
+        primeira = {
+            "timestamp": _para_datetime(linha["timestamp"]).isoformat(),
+            "reconstruida": int(linha["ocupacao"]),
+            "registrada": int(linha["registrada"]),
+        }
+    return {
+        "eventos": len(curva),
+        "comparados": int(com_registro.sum()),
+        "divergentes": len(divergentes),
+        "maior_diferenca": int(diferenca.max()) if len(diferenca) else 0,
+        "primeira_divergencia": primeira,
+    }
+
+
+# =====================================================
+# CUBO DIA DA SEMANA x HORA
+def _celula(horas):
+    """Hora absoluta (epoch // 3600) -> índice dia_semana * 24 + hora (segunda = 0)"""
+    return ((horas // 24 + 3) % 7) * 24 + horas % 24
+
+
+def _integrar(inicios, fins, niveis):
+    """
+    Distribui intervalos [inicio, fim) com ocupação constante pelas 168 células.
+    Retorna (pessoa_segundos, segundos, pico), arrays de 168 posições (pico -1 = vazio).
+    """
+    usar = (fins > inicios) & (fins - inicios <= LACUNA_MAXIMA)
+    inicios, fins, niveis = inicios[usar], fins[usar], niveis[usar]
+    pico = np.full(168, -1, dtype=np.int64)
+    if not len(inicios):
+        return np.zeros(168), np.zeros(168), pico
+
+    # Um pedaço por hora coberta por cada intervalo
+    primeira = inicios // 3600
+    pedacos = (fins - 1) // 3600 - primeira + 1
+    qual = np.repeat(np.arange(len(inicios)), pedacos)
+    deslocamento = np.arange(pedacos.sum()) - np.repeat(np.cumsum(pedacos) - pedacos, pedacos)
+    horas = primeira[qual] + deslocamento
+
+    duracao = np.minimum(fins[qual], (horas + 1) * 3600) - np.maximum(inicios[qual], horas * 3600)
+    celulas = _celula(horas)
+    np.maximum.at(pico, celulas, niveis[qual])
+    return (
+        np.bincount(celulas, weights=duracao * niveis[qual], minlength=168),
+        np.bincount(celulas, weights=duracao, minlength=168),
+        pico,
+    )
+
+
+# =====================================================
+# MANUTENÇÃO INCREMENTAL
+def _ler_novos(conn, desde_unico):
+    """Eventos de eventos_unicos com rowid > desde_unico, com permissão e ocupação registrada"""
+    linhas = conn.execute(
+        "SELECT u.rowid, u.timestamp, e.leitor, e.acesso_permitido, e.ocupacao_apos_evento "
+        "FROM eventos_unicos u JOIN eventos e ON e.rowid = u.linha "
+        "WHERE u.rowid > ? ORDER BY u.rowid",
+        (desde_unico,),
+    ).fetchall()
+    if not linhas:
+        return None, desde_unico
+    ultimo = linhas[-1][0]
+    _, ts, leitores, permitidos, ocupacoes = zip(*linhas)
+    tabela = construir_tabela(ts, [None] * len(ts), leitores, permitidos, ocupacoes=ocupacoes)
+    return tabela, ultimo
+
+
+def _recomecar(conn):
+    conn.execute("DELETE FROM ocupacao_serie")
+    conn.execute("DELETE FROM ocupacao_cubo")
+    for chave in ("ocupacao_ultimo_unico", "ocupacao_ultimo_ts", "ocupacao_nivel",
+                  "ocupacao_comparados", "ocupacao_divergentes"):
+        conn.execute("DELETE FROM meta WHERE chave = ?", (chave,))
+    gravar_meta(conn, "ocupacao_geracao", ler_meta(conn, "geracao_agregados", "0"))
+
+
+def _aplicar(conn, curva, ultimo_ts, nivel):
+    """Soma um trecho da curva (posterior a ultimo_ts) à série, ao cubo e à conferência"""
+    ts = curva["timestamp"].to_numpy()
+    niveis = curva["ocupacao"].to_numpy().astype(np.int64)
+
+    # Série: nível ao fim de cada segundo, só quando muda
+    fim_do_segundo = np.append(ts[1:] != ts[:-1], True)
+    ts_s, niveis_s = ts[fim_do_segundo], niveis[fim_do_segundo]
+    anteriores = np.concatenate(([nivel if ultimo_ts is not None else -1], niveis_s[:-1]))
+    mudou = niveis_s != anteriores
+    conn.executemany(
+        "INSERT OR REPLACE INTO ocupacao_serie (timestamp, ocupacao) VALUES (?, ?)",
+        zip(ts_s[mudou].tolist(), niveis_s[mudou].tolist()),
+    )
+
+    # Cubo: cada evento inicia um intervalo que vai até o próximo
+    if ultimo_ts is not None:
+        inicios, niveis_intervalo = np.concatenate(([ultimo_ts], ts[:-1])), np.concatenate(([nivel], niveis[:-1]))
+    else:
+        inicios, niveis_intervalo = ts[:-1], niveis[:-1]
+    fins = ts if ultimo_ts is not None else ts[1:]
+    pessoa_segundos, segundos, picos = _integrar(inicios, fins, niveis_intervalo)
+    np.maximum.at(picos, _celula(ts // 3600), niveis)
+
+    celulas = np.flatnonzero((segundos > 0) | (picos >= 0))
+    conn.executemany(
+        "INSERT INTO ocupacao_cubo (dia_semana, hora, pessoa_segundos, segundos, pico) "
+        "VALUES (?, ?, ?, ?, ?) ON CONFLICT(dia_semana, hora) DO UPDATE SET "
+        "pessoa_segundos = pessoa_segundos + excluded.pessoa_segundos, "
+        "segundos = segundos + excluded.segundos, pico = MAX(pico, excluded.pico)",
+        [(int(c // 24), int(c % 24), float(pessoa_segundos[c]), float(segundos[c]), max(0, int(picos[c])))
+         for c in celulas],
+    )
+
+    registrada = curva["registrada"].to_numpy()
+    com_registro = registrada >= 0
+    gravar_meta(conn, "ocupacao_comparados",
+                int(ler_meta(conn, "ocupacao_comparados", 0)) + int(com_registro.sum()))
+    gravar_meta(conn, "ocupacao_divergentes",
+                int(ler_meta(conn, "ocupacao_divergentes", 0)) + int((registrada != niveis)[com_registro].sum()))
+    gravar_meta(conn, "ocupacao_ultimo_ts", int(ts[-1]))
+    gravar_meta(conn, "ocupacao_nivel", int(niveis[-1]))
+
+
+def atualizar_ocupacao(conn):
+    """
+    Incorpora à série e ao cubo os eventos únicos ainda não processados.
+    Eventos fora de ordem (mais antigos que o último processado) ou uma
+    reconstrução dos agregados fazem tudo ser recalculado do zero.
+    Retorna a quantidade de eventos processados.
+    """
+    conn.executescript(_ESQUEMA)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")   # um atualizador por vez entre threads/processos
+        if ler_meta(conn, "ocupacao_geracao") != ler_meta(conn, "geracao_agregados", "0"):
+            _recomecar(conn)
+
+        desde = int(ler_meta(conn, "ocupacao_ultimo_unico", 0))
+        tabela, ultimo = _ler_novos(conn, desde)
+        if tabela is None:
+            return 0
+
+        ultimo_ts = ler_meta(conn, "ocupacao_ultimo_ts")
+        ultimo_ts = int(ultimo_ts) if ultimo_ts is not None else None
+        if ultimo_ts is not None and len(tabela) and tabela["timestamp"].min() < ultimo_ts:
+            metricas.incrementar("ocupacao_recalculos_total")
+            _recomecar(conn)
+            tabela, ultimo = _ler_novos(conn, 0)
+            ultimo_ts = None
+
+        if len(tabela):
+            nivel = int(ler_meta(conn, "ocupacao_nivel", 0)) if ultimo_ts is not None else 0
+            _aplicar(conn, reconstruir_ocupacao(tabela, nivel), ultimo_ts, nivel)
+        gravar_meta(conn, "ocupacao_ultimo_unico", ultimo)
+    metricas.incrementar("ocupacao_eventos_processados_total", len(tabela))
+    return len(tabela)
+
+
+def sincronizar(caminho=CAMINHO_BANCO, **banco):
+    """
+    Traz eventos novos (se a última sincronização venceu) e atualiza série e cubo.
+    banco: os outros argumentos de atualizar_se_vencido (sincronizar(**banco_sala(sala)))
+    """
+    atualizar_se_vencido(caminho, **banco)
+    conn = conectar(caminho)
+    try:
+        atualizar_ocupacao(conn)
+    finally:
+        conn.close()
+
+
+# =====================================================
+# CONSULTAS
+def _para_segundos(instante):
+    """datetime ou texto ISO -> segundos no mesmo relógio sem fuso dos eventos"""
+    if isinstance(instante, str):
+        instante = datetime.fromisoformat(instante.strip().replace(" ", "T", 1))
+    if instante.tzinfo is not None:
+        instante = instante.replace(tzinfo=None)
+    return calendar.timegm(instante.timetuple())
+
+
+def _para_datetime(segundos):
+    return datetime.fromtimestamp(int(segundos), timezone.utc).replace(tzinfo=None)
+
+
+def carregar_cubo(caminho=CAMINHO_BANCO):
+    """(media, pico): arrays 7 x 24 (segunda = linha 0); média NaN onde não há observação"""
+    conn = conectar(caminho)
+    try:
+        atualizar_ocupacao(conn)
+        linhas = conn.execute(
+            "SELECT dia_semana, hora, pessoa_segundos, segundos, pico FROM ocupacao_cubo"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    media = np.full((7, 24), np.nan)
+    pico = np.zeros((7, 24), dtype=np.int64)
+    for dia, hora, pessoa_segundos, segundos, maximo in linhas:
+        if segundos > 0:
+            media[dia, hora] = pessoa_segundos / segundos
+        pico[dia, hora] = maximo
+    return media, pico
+
+
+def horarios_pico(quantidade=5, caminho=CAMINHO_BANCO):
+    """[(dia_semana, hora, media, pico)] das células com maior ocupação média"""
+    media, pico = carregar_cubo(caminho)
+    plana = np.where(np.isnan(media), -1, media).ravel()
+    melhores = [c for c in np.argsort(plana, kind="stable")[::-1][:quantidade] if plana[c] > 0]
+    return [(int(c // 24), int(c % 24), float(plana[c]), int(pico.ravel()[c])) for c in melhores]
+
+
+def ocupacao_em(instante, caminho=CAMINHO_BANCO):
+    """
+    Ocupação reconstruída no instante (datetime ou ISO) e a típica daquele dia/hora.
+    Retorna {"ocupacao": int ou None, "tipica": float ou None, "pico": int}.
+    """
+    segundos = _para_segundos(instante)
+    conn = conectar(caminho)
+    try:
+        atualizar_ocupacao(conn)
+        linha = conn.execute(
+            "SELECT ocupacao FROM ocupacao_serie WHERE timestamp <= ? ORDER BY timestamp DESC LIMIT 1",
+            (segundos,),
+        ).fetchone()
+        celula = _celula(segundos // 3600)
+        cubo = conn.execute(
+            "SELECT pessoa_segundos, segundos, pico FROM ocupacao_cubo WHERE dia_semana = ? AND hora = ?",
+            (celula // 24, celula % 24),
+        ).fetchone()
+    finally:
+        conn.close()
+
+    return {
+        "ocupacao": linha[0] if linha else None,
+        "tipica": cubo[0] / cubo[1] if cubo and cubo[1] > 0 else None,
+        "pico": cubo[2] if cubo else 0,
+    }
+
+
+def resumo_conferencia(caminho=CAMINHO_BANCO):
+    """{comparados, divergentes} acumulados pela manutenção incremental"""
+    conn = conectar(caminho)
+    try:
+        atualizar_ocupacao(conn)
+        return {
+            "comparados": int(ler_meta(conn, "ocupacao_comparados", 0)),
+            "divergentes": int(ler_meta(conn, "ocupacao_divergentes", 0)),
+        }
+    finally:
+        conn.close()
+
+
+# =====================================================
+# TEXTO PARA OS BOTS
+def formatar_pico(picos):
+    if not picos:
+        return "Ainda não há histórico suficiente para calcular os horários de pico."
+    linhas = [
+        f"{DIAS_SEMANA[dia]} {hora:02d}h — média {media:.1f} pessoas (pico {maximo})"
+        for dia, hora, media, maximo in picos
+    ]
+    return "📊 **Horários mais movimentados**\n\n" + "\n".join(linhas)
+
+
+def formatar_ocupacao_em(instante, resultado):
+    segundos = _para_segundos(instante)
+    quando = _para_datetime(segundos).strftime("%d/%m/%Y %H:%M")
+    celula = _celula(segundos // 3600)
+    if resultado["ocupacao"] is None:
+        texto = f"🕒 **{quando}:** sem registros até esse horário."
+    else:
+        texto = f"🕒 **{quando}:** {resultado['ocupacao']} pessoas na sala."
+    if resultado["tipica"] is not None:
+        texto += (f"\nNas {DIAS_SEMANA[celula // 24]} às {celula % 24:02d}h a média é "
+                  f"{resultado['tipica']:.1f} (pico {resultado['pico']}).")
+    return texto
+
+
+def texto_pico(argumento="", sala=SALA_UNICA):
+    """Resposta do /pico da sala: horários de pico, ou a ocupação em 'AAAA-MM-DD HH:MM' se informado"""
+    banco = banco_sala(sala)
+    caminho = banco["caminho"]
+    try:
+        sincronizar(**banco)
+    except Exception as e:
+        print(f"Erro ao sincronizar para o /pico: {e}")
+
+    argumento = argumento.strip()
+    if not argumento:
+        return formatar_pico(horarios_pico(caminho=caminho))
+    try:
+        return formatar_ocupacao_em(argumento, ocupacao_em(argumento, caminho))
+    except ValueError:
+        return "Formato: /pico AAAA-MM-DD HH:MM (ou só /pico para os horários mais movimentados)."
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from funcoes_auxiliares.deteccao_janela import DetectorJanela
+
+# Limites do motor de regras, compartilhados com analise_dados_fraude.
+# Ficam aqui para o bot carregar o pontuador sem importar pandas.
+LIMITE_SCORE_FRAUDE = 4
+LIMITE_SCORE_SUSPEITO = 2
+LIMITE_PERMANENCIA_MIN = 1  # minutos
+
+CAMINHO_CHECKPOINT = os.getenv("caminho_checkpoint_pontuador", "pontuador_estado.json")
+SALVAR_A_CADA = 50  # eventos entre checkpoints automáticos
+
+
+def _para_epoch(ts):
+    """Converte o timestamp ISO do firmware em (segundos, hora do dia)"""
+    try:
+        dt = datetime.fromisoformat(str(ts).replace('Z', '+00:00'))
+    except ValueError:
+        dt = datetime.now()
+    return dt.timestamp(), dt.hour
+
+
+def caminho_checkpoint(sala=""):
+    """Checkpoint do pontuador da sala: CAMINHO_CHECKPOINT para a sala única, <nome>_<sala>.json para as outras"""
+    if not sala:
+        return CAMINHO_CHECKPOINT
+    raiz, extensao = os.path.splitext(CAMINHO_CHECKPOINT)
+    return f"{raiz}_{sala}{extensao}"
+
+
+def classificar(score):
+    if score >= LIMITE_SCORE_FRAUDE:
+        return "FRAUDULENTO"
+    if score >= LIMITE_SCORE_SUSPEITO:
+        return "SUSPEITO"
+    return "NORMAL"
+
+
+class PontuadorFraude:
+    """
+    Versão incremental do motor de regras de analise_dados_fraude.
+    Guarda por cartão apenas [último leitor, último timestamp, soma das horas de
+    entrada, qtd de entradas], então cada evento é pontuado em O(1).
+    A média de horário (Regra 3) é a média corrente das entradas já vistas,
+    incluindo o evento atual. As regras de janela (clone, presença, sala vazia)
+    vêm do DetectorJanela, que não entra no checkpoint: ao reiniciar, o monitor
+    recarrega quem está dentro a partir do /presenca.
+    Com salvar_automatico=False, pontuar() não grava o checkpoint: quem chama
+    confere checkpoint_vencido() e chama salvar() onde puder bloquear (modo asyncio).
+    """
+
+    def __init__(self, caminho=CAMINHO_CHECKPOINT, salvar_automatico=True):
+        self.caminho = caminho
+        self.salvar_automatico = salvar_automatico
+        self.cartoes = {}
+        self.ultima_chave = None
+        self.janela = DetectorJanela()
+        self._pendentes = 0
+        self._lock = threading.Lock()
+        self.carregar()
+
+    # =====================================================
+    # CHECKPOINT
+    def carregar(self):
+        if not self.caminho or not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            self.cartoes = dados.get("cartoes", {})
+            self.ultima_chave = dados.get("ultima_chave")
+        except Exception as e:
+            print(f"Checkpoint do pontuador ignorado: {e}")
+
+    def salvar(self):
+        if not self.caminho:
+            return
+        with self._lock:
+            conteudo = json.dumps({"ultima_chave": self.ultima_chave, "cartoes": self.cartoes})
+            self._pendentes = 0
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        os.replace(temporario, self.caminho)
+
+    def checkpoint_vencido(self):
+        """True quando já passaram SALVAR_A_CADA eventos desde o último checkpoint"""
+        return self._pendentes >= SALVAR_A_CADA
+
+    # =====================================================
+    # REGRAS
+    def pontuar(self, evento, chave=None):
+        """Pontua um evento e atualiza o estado do cartão. Retorna (score, classificacao, motivos)"""
+        cartao = evento.get("cartao")
+        leitor = evento.get("leitor")
+        ts, hora = _para_epoch(evento.get("timestamp"))
+
+        with self._lock:
+            estado = self.cartoes.get(str(cartao))
+            score = 0
+            motivos = []
+
+            if estado is not None:
+                leitor_anterior, ts_anterior = estado[0], estado[1]
+
+                # --- Regra 1: Sequência Inválida ---
+                if leitor_anterior == leitor:
+                    score += 3
+                    motivos.append(f"Sequência inválida ({leitor} duplicada)")
+
+                # --- Regra 2: Permanência muito curta ---
+                if leitor_anterior == "entrada" and leitor == "saida":
+                    tempo = abs(ts - ts_anterior) / 60
+                    if tempo < LIMITE_PERMANENCIA_MIN:
+                        score += 2
+                        motivos.append(f"Permanência suspeita ({int(tempo)}min)")
+            else:
+                estado = [None, None, 0, 0]
+                self.cartoes[str(cartao)] = estado
+
+            # --- Regra 3: Horário Atípico ---
+            if leitor == "entrada":
+                estado[2] += hora
+                estado[3] += 1
+                media = estado[2] / estado[3]
+                if abs(hora - media) >= 4:
+                    score += 3
+                    motivos.append("Horário fora do perfil habitual")
+
+            # --- Regra 4: Cartão Bloqueado ---
+            if evento.get("acesso_permitido") == False:
+                score += 5
+                motivos.append("Acesso Negado pelo Hardware")
+
+            # --- Regra 5: Padrões impossíveis na janela recente ---
+            repetido = estado[0] is not None and estado[0] == leitor
+            extra, motivos_janela = self.janela.verificar_evento(evento, ts, repetido)
+            score += extra
+            motivos += motivos_janela
+
+            estado[0], estado[1] = leitor, ts
+            if chave is not None:
+                self.ultima_chave = chave
+            self._pendentes += 1
+            salvar_agora = self.salvar_automatico and self._pendentes >= SALVAR_A_CADA
+
+        if salvar_agora:
+            self.salvar()
+        return score, classificar(score), motivos
+
+    def aquecer(self, eventos):
+        """Alimenta o estado com o histórico (lista de eventos) sem gerar alertas"""
+        for evento in sorted(eventos, key=lambda e: str(e.get("timestamp"))):
+            self.pontuar(evento)
+        self.salvar()
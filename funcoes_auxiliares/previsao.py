@@ -0,0 +1,128 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# =====================================================
+# CONFIGURAÇÕES
+JANELAS_MEDIA_MOVEL = (3, 4, 7)
+ALFAS_SUAVIZACAO = (0.2, 0.5, 0.8)
+CRITERIO = "rmse"
+
+_cache = {}      # série -> (versão, resultado)
+_lock = threading.Lock()
+
+
+# =====================================================
+# MODELOS (previsão de um passo para todos os dias de uma vez)
+# Cada função devolve um array 'pred' do tamanho da série, em que pred[t] usa
+# apenas valores[:t]; posições sem histórico suficiente ficam NaN.
+def _media_movel(valores, janela):
+    pred = np.full(len(valores), np.nan)
+    if len(valores) > janela:
+        medias = sliding_window_view(valores, janela).mean(axis=1)
+        pred[janela:] = medias[:-1]
+    return pred
+
+
+def _sazonal_semana(valores, dias_semana):
+    """Sazonal ingênuo: último valor observado no mesmo dia da semana"""
+    pred = np.full(len(valores), np.nan)
+    for dia in range(7):
+        idx = np.flatnonzero(dias_semana == dia)
+        pred[idx[1:]] = valores[idx[:-1]]
+    return pred
+
+
+def _suavizacao_exponencial(valores, alfa):
+    """Suavização exponencial simples; pred[t] é o nível após valores[:t]"""
+    pred = np.full(len(valores), np.nan)
+    if len(valores) == 0:
+        return pred, np.nan
+    nivel = float(valores[0])
+    for t in range(1, len(valores)):
+        pred[t] = nivel
+        nivel = alfa * valores[t] + (1 - alfa) * nivel
+    return pred, nivel
+
+
+def _proximo_valor(nome, valores, dias_semana, dia_futuro, nivel_final):
+    if nome.startswith("mm_"):
+        janela = int(nome[3:])
+        return float(valores[-janela:].mean())
+    if nome == "sazonal_semana":
+        mesmos = valores[dias_semana == dia_futuro]
+        return float(mesmos[-1]) if len(mesmos) else np.nan
+    return nivel_final[nome]
+
+
+# =====================================================
+# BACKTEST
+def _metricas(real, pred):
+    erro = real - pred
+    nao_zero = real != 0
+    return {
+        "mae": float(np.abs(erro).mean()),
+        "rmse": float(np.sqrt((erro ** 2).mean())),
+        "mape": float(np.abs(erro[nao_zero] / real[nao_zero]).mean()) if nao_zero.any() else np.nan,
+        "dias": int(len(real)),
+    }
+
+
+def backtest(datas, valores):
+    """
+    Avalia todos os modelos sobre todos os dias históricos (previsão de um passo).
+    datas: sequência de datetime.date; valores: acessos por dia, na mesma ordem.
+    Retorna {"modelos": {nome: métricas}, "melhor": nome, "previsao": valor,
+    "data_futura": date, "previsoes": {nome: array pred}}.
+    """
+    valores = np.asarray(valores, dtype=float)
+    dias_semana = np.array([d.weekday() for d in datas], dtype=np.int8)
+
+    previsoes = {}
+    nivel_final = {}
+    for janela in JANELAS_MEDIA_MOVEL:
+        previsoes[f"mm_{janela}"] = _media_movel(valores, janela)
+    previsoes["sazonal_semana"] = _sazonal_semana(valores, dias_semana)
+    for alfa in ALFAS_SUAVIZACAO:
+        nome = f"exp_{alfa:g}"
+        previsoes[nome], nivel_final[nome] = _suavizacao_exponencial(valores, alfa)
+
+    # Todos os modelos são avaliados a partir do mesmo dia (quando a maior janela
+    # já tem histórico); o sazonal só pula os dias sem semana anterior observada
+    avaliavel = np.arange(len(valores)) >= max(JANELAS_MEDIA_MOVEL)
+
+    modelos = {}
+    for nome, pred in previsoes.items():
+        mascara = avaliavel & ~np.isnan(pred)
+        if mascara.any():
+            modelos[nome] = _metricas(valores[mascara], pred[mascara])
+
+    data_futura = datas[-1] + timedelta(days=1) if len(datas) else None
+    if not modelos:
+        # Histórico curto demais para avaliar: cai para a média simples
+        return {"modelos": {}, "melhor": None, "previsao": float(valores.mean()) if len(valores) else np.nan,
+                "data_futura": data_futura, "previsoes": previsoes}
+
+    melhor = min(modelos, key=lambda nome: modelos[nome][CRITERIO])
+    previsao = _proximo_valor(melhor, valores, dias_semana, data_futura.weekday(), nivel_final)
+    return {"modelos": modelos, "melhor": melhor, "previsao": previsao,
+            "data_futura": data_futura, "previsoes": previsoes}
+
+
+def selecionar_modelo(datas, valores, versao=None, serie=None):
+    """
+    backtest() com cache: enquanto a versão dos dados não muda, reaproveita o resultado.
+    Guarda a última versão de cada 'serie' (uma por banco/sala).
+    """
+    if versao is None:
+        return backtest(datas, valores)
+    with _lock:
+        em_cache = _cache.get(serie)
+        if em_cache and em_cache[0] == versao:
+            return em_cache[1]
+    resultado = backtest(datas, valores)
+    with _lock:
+        _cache[serie] = (versao, resultado)
+    return resultado
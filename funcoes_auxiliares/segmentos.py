@@ -0,0 +1,144 @@
+"""
+Arquivo local de eventos antigos em segmentos diários comprimidos.
+
+Cada nó arquivado (eventos, movimentos, presenca) vira um diretório com um
+arquivo por dia, <no>/AAAA-MM-DD.jsonl.gz, uma linha {chave: registro} por
+registro (o mesmo formato de dadosreais.json, só que uma entrada por linha).
+O manifesto (manifesto.json) lista, por nó e dia, o arquivo, a quantidade de
+registros e a primeira/última chave, então quem lê escolhe os dias que precisa
+sem abrir os outros.
+
+Gravar um dia que já existe mescla os registros (por chave) e reescreve o
+arquivo de forma atômica: rodar o arquivamento de novo não duplica nada.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import datetime
+
+from funcoes_auxiliares.fluxo_eventos import momento_da_chave
+
+# =====================================================
+# CONFIGURAÇÕES
+DIRETORIO_ARQUIVO = os.getenv("diretorio_arquivo", "arquivo")
+ARQUIVO_MANIFESTO = "manifesto.json"
+VERSAO_MANIFESTO = 1
+NIVEL_COMPRESSAO = 6
+SEM_DATA = "sem-data"
+
+_DATA = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def dia_do_registro(chave, registro):
+    """Dia (AAAA-MM-DD) do timestamp do firmware; sem ele, o da push key; senão SEM_DATA"""
+    ts = registro.get("timestamp") if isinstance(registro, dict) else None
+    if isinstance(ts, str) and _DATA.match(ts):
+        return ts[:10]
+    momento = momento_da_chave(chave)
+    if momento is not None:
+        # Hora local, como o timestamp do firmware e o limite do arquivamento
+        return datetime.fromtimestamp(momento).strftime("%Y-%m-%d")
+    return SEM_DATA
+
+
+# =====================================================
+# MANIFESTO
+def _caminho_manifesto(diretorio):
+    return os.path.join(diretorio, ARQUIVO_MANIFESTO)
+
+
+def ler_manifesto(diretorio=DIRETORIO_ARQUIVO):
+    """{"versao": 1, "nos": {no: {dia: {arquivo, registros, bytes, primeira_chave, ultima_chave}}}}"""
+    try:
+        with open(_caminho_manifesto(diretorio), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"versao": VERSAO_MANIFESTO, "nos": {}}
+
+
+def _gravar_atomico(caminho, conteudo):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def _gravar_manifesto(manifesto, diretorio):
+    conteudo = json.dumps(manifesto, indent=1, sort_keys=True).encode("utf-8")
+    _gravar_atomico(_caminho_manifesto(diretorio), conteudo)
+
+
+# =====================================================
+# ESCRITA
+def gravar_segmentos(no, registros, diretorio=DIRETORIO_ARQUIVO):
+    """
+    Acrescenta {chave: registro} aos segmentos diários de 'no' e atualiza o manifesto.
+    Os segmentos são gravados antes do manifesto, e o manifesto só depois de todos
+    os dias: se o processo cair no meio, nenhum dia listado fica incompleto.
+    Retorna {dia: registros no segmento}.
+    """
+    por_dia = {}
+    for chave, registro in registros.items():
+        por_dia.setdefault(dia_do_registro(chave, registro), {})[chave] = registro
+
+    manifesto = ler_manifesto(diretorio)
+    segmentos = manifesto["nos"].setdefault(no, {})
+    gravados = {}
+    for dia, novos in sorted(por_dia.items()):
+        mesclados = ler_segmento(no, dia, diretorio) if dia in segmentos else {}
+        mesclados.update(novos)
+
+        linhas = "".join(json.dumps({chave: mesclados[chave]}, ensure_ascii=False) + "\n"
+                         for chave in sorted(mesclados))
+        conteudo = gzip.compress(linhas.encode("utf-8"), compresslevel=NIVEL_COMPRESSAO, mtime=0)
+        relativo = f"{no}/{dia}.jsonl.gz"
+        _gravar_atomico(os.path.join(diretorio, relativo), conteudo)
+
+        chaves = sorted(mesclados)
+        segmentos[dia] = {
+            "arquivo": relativo,
+            "registros": len(mesclados),
+            "bytes": len(conteudo),
+            "primeira_chave": chaves[0],
+            "ultima_chave": chaves[-1],
+        }
+        gravados[dia] = len(mesclados)
+
+    if gravados:
+        manifesto["versao"] = VERSAO_MANIFESTO
+        _gravar_manifesto(manifesto, diretorio)
+    return gravados
+
+
+# =====================================================
+# LEITURA SELETIVA
+def dias_disponiveis(no, inicio=None, fim=None, diretorio=DIRETORIO_ARQUIVO, manifesto=None):
+    """Dias arquivados de 'no' entre inicio e fim (AAAA-MM-DD, inclusivos), em ordem"""
+    manifesto = manifesto or ler_manifesto(diretorio)
+    dias = sorted(manifesto["nos"].get(no, {}))
+    return [d for d in dias if (inicio is None or d >= inicio) and (fim is None or d <= fim)]
+
+
+def iterar_registros(no, dia, diretorio=DIRETORIO_ARQUIVO):
+    """(chave, registro) de um segmento, lendo linha a linha (sem carregar o dia inteiro)"""
+    caminho = os.path.join(diretorio, no, f"{dia}.jsonl.gz")
+    with gzip.open(caminho, "rt", encoding="utf-8") as f:
+        for linha in f:
+            if linha.strip():
+                yield from json.loads(linha).items()
+
+
+def ler_segmento(no, dia, diretorio=DIRETORIO_ARQUIVO):
+    return dict(iterar_registros(no, dia, diretorio))
+
+
+def carregar_segmentos(no, inicio=None, fim=None, diretorio=DIRETORIO_ARQUIVO):
+    """{chave: registro} só dos dias entre inicio e fim"""
+    registros = {}
+    for dia in dias_disponiveis(no, inicio, fim, diretorio):
+        registros.update(iterar_registros(no, dia, diretorio))
+    return registros
@@ -0,0 +1,181 @@
+"""
+Lógica do bot supervisor compartilhada pelos dois front-ends: supervisor_bot
+(threads) e supervisor_bot_async (asyncio).
+
+Aqui ficam os textos das respostas, o pontuador de cada sala e o tratamento de
+cada evento do monitor; os bots só cuidam de receber o comando e enviar a
+resposta. Nada aqui fala com o Telegram nem carrega pandas no import. As
+funções que leem o SQLite ou o histórico são bloqueantes (o modo asyncio as
+chama com asyncio.to_thread).
+"""
+import time
+
+from funcoes_auxiliares import metricas
+from funcoes_auxiliares.alertas import deve_alertar
+from funcoes_auxiliares.armazenamento_eventos import (
+    atualizar_sala,
+    atualizar_se_vencido,
+    banco_sala,
+    caminho_banco,
+    carregar_eventos,
+    normalizar_cartao,
+    ultima_chave_sincronizada,
+)
+from funcoes_auxiliares.cliente_firebase import SALA_UNICA, buscar_presenca, salas, separar_sala
+from funcoes_auxiliares.fluxo_eventos import momento_da_chave
+from funcoes_auxiliares.pontuacao_tempo_real import PontuadorFraude, caminho_checkpoint
+
+# =====================================================
+# TEXTOS
+TEXTO_MENU = """
+👮‍♂️ **Painel do Supervisor**
+
+✅ Monitoramento de Fraudes: ATIVO
+📡 Conectado ao Firebase
+
+**Comandos Disponíveis:**
+/ocupacao - Ver lotação em tempo real
+/analise_ocupacao - 📈 Ver predição e métricas de ML
+/analise_fraude - 🚨 Ver gráfico de distribuição de fraudes
+/pico [sala] - 📊 Horários de pico (ou /pico AAAA-MM-DD HH:MM)
+/cartao [sala] <id> - 💳 Histórico, perfil e risco de um cartão
+/metrics - ⏱️ Latências e contadores do bot
+    """
+TEXTO_ACESSO_NEGADO = "⛔ Acesso Negado. Bot restrito ao supervisor."
+USO_CARTAO = "Uso: /cartao [sala] <UID> (ex.: /cartao C2514920)"
+
+NOMES_ANALISE = {"ocupacao": "ocupação", "fraude": "fraude"}
+
+
+def rotulo_sala(sala):
+    """Prefixo das respostas por sala (vazio na sala única)"""
+    return "" if sala == SALA_UNICA else f"🏫 **{sala}** · "
+
+
+def texto_ocupacao(estados, erro_http):
+    """
+    Resposta do /ocupacao a partir de {sala: estado ou exceção} (buscar_estados).
+    erro_http é a classe de erro HTTP do cliente usado (requests ou aiohttp).
+    Retorna (texto, parse_mode).
+    """
+    if len(estados) == 1 and SALA_UNICA in estados:
+        dados = estados[SALA_UNICA]
+        if isinstance(dados, erro_http):
+            return "⚠️ Erro ao ler dados do Firebase.", None
+        if isinstance(dados, Exception):
+            return f"Erro de conexão: {dados}", None
+        return f"👥 **Ocupação Atual:** {dados.get('ocupacao_atual', 0)} / {dados.get('limite_ocupacao', 10)}", "Markdown"
+
+    linhas = ["👥 **Ocupação Atual**"]
+    for sala, dados in estados.items():
+        if isinstance(dados, Exception):
+            print(f"Estado da sala {sala} indisponível: {dados}")
+            linhas.append(f"{rotulo_sala(sala)}⚠️ sem resposta do Firebase")
+        else:
+            linhas.append(f"{rotulo_sala(sala)}{dados.get('ocupacao_atual', 0)} / {dados.get('limite_ocupacao', 10)}")
+    return "\n".join(linhas), "Markdown"
+
+
+def legenda_analise(tipo, sala, texto_metricas):
+    """Legenda da foto do /analise_ocupacao ou /analise_fraude"""
+    if tipo == "ocupacao":
+        return f"{rotulo_sala(sala)}📈 **Predição de Ocupação**\n\n```\n{texto_metricas}```"
+    return f"{rotulo_sala(sala)}🚨 **Distribuição de Eventos (Fraudes)**"
+
+
+def texto_sem_grafico(tipo, sala, texto_metricas):
+    """Resposta quando a análise da sala não gerou gráfico (poucos dados)"""
+    if tipo == "ocupacao":
+        return texto_metricas
+    return f"Nenhum evento para analisar{' na sala ' + sala if sala else ''}."
+
+
+def texto_erro_analise(tipo, erro, sala=SALA_UNICA):
+    return f"Erro ao gerar análise de {NOMES_ANALISE[tipo]}{' da sala ' + sala if sala else ''}: {erro}"
+
+
+def texto_metricas():
+    texto = metricas.resumo()
+    if len(texto) > 3900:  # limite de 4096 caracteres por mensagem
+        texto = texto[:3900] + "\n..."
+    return f"⏱️ **Métricas**\n```\n{texto}\n```"
+
+
+def texto_pico(argumento):
+    """
+    Resposta do /pico [sala] [AAAA-MM-DD HH:MM]; sem sala, uma seção por sala
+    (pandas só é carregado no primeiro uso ou pelo aquecimento)
+    """
+    from funcoes_auxiliares import ocupacao_serie
+    sala, resto = separar_sala(argumento)
+    lista = salas() if sala is None else (sala,)
+    return "\n\n".join(rotulo_sala(s) + ocupacao_serie.texto_pico(resto, s) for s in lista)
+
+
+def salas_cartao(argumento):
+    """(UID normalizado, salas a consultar) do argumento do /cartao [sala] <UID>"""
+    sala, resto = separar_sala(argumento)
+    return normalizar_cartao(resto), (salas() if sala is None else (sala,))
+
+
+def consultar_cartao(cartao, sala=SALA_UNICA):
+    """Sincroniza o armazenamento da sala (se vencido) e devolve o resumo do cartão nela, ou None"""
+    from funcoes_auxiliares import historico_cartao
+    atualizar_se_vencido(**banco_sala(sala))
+    return historico_cartao.consultar_cartao(cartao, caminho=caminho_banco(sala))
+
+
+def texto_cartao(cartao, consultas):
+    """
+    Resposta do /cartao a partir de {sala: (consultar_cartao, nó /presenca/<uid> ou exceção)}:
+    um bloco por sala em que o cartão aparece
+    """
+    blocos = []
+    for sala, (resumo, presenca) in consultas.items():
+        if resumo is None:
+            continue
+        if isinstance(presenca, Exception):
+            print(f"Presença do cartão {cartao}{' na sala ' + sala if sala else ''} indisponível: {presenca}")
+            presenca = None
+        from funcoes_auxiliares import historico_cartao   # já carregado por consultar_cartao
+        blocos.append(rotulo_sala(sala) + historico_cartao.formatar_cartao(resumo, presenca))
+    return "\n\n".join(blocos) or f"Nenhum evento registrado para o cartão `{cartao}`."
+
+
+# =====================================================
+# MONITORAMENTO DE FRAUDE
+def iniciar_pontuador(sala=SALA_UNICA, salvar_automatico=True):
+    """
+    Carrega o checkpoint do pontuador da sala; sem checkpoint, aquece uma única
+    vez com o histórico da sala (cada sala tem o seu banco e o seu checkpoint)
+    """
+    pontuador = PontuadorFraude(caminho_checkpoint(sala), salvar_automatico=salvar_automatico)
+    if not pontuador.cartoes:
+        atualizar_sala(sala)
+        pontuador.aquecer(carregar_eventos(caminho_banco(sala)))
+        pontuador.ultima_chave = ultima_chave_sincronizada(caminho_banco(sala))
+        pontuador.salvar()
+        print(f"Pontuador{' da sala ' + sala if sala else ''} aquecido com o histórico ({len(pontuador.cartoes)} cartões).")
+    # Quem está dentro agora, segundo o firmware (regra de entrada com o cartão já dentro)
+    try:
+        pontuador.janela.carregar_presenca(buscar_presenca(sala=sala))
+    except Exception as e:
+        print(f"Presença do firmware indisponível{' na sala ' + sala if sala else ''}: {e}")
+    return pontuador
+
+
+def processar_evento(pontuador, despachante, id_evento, conteudo, sala=SALA_UNICA):
+    # Atraso do monitor: idade do evento (hora da push key) quando chega aqui
+    criado_em = momento_da_chave(id_evento)
+    if criado_em is not None:
+        metricas.observar("monitor_atraso_segundos", max(0.0, time.time() - criado_em))
+    metricas.incrementar("monitor_eventos_total")
+
+    score, classificacao, motivos = pontuador.pontuar(conteudo, id_evento)
+    if sala != SALA_UNICA and isinstance(conteudo, dict):
+        conteudo = dict(conteudo, sala=sala)   # o alerta diz de qual sala veio
+
+    # Verifica fraude (flag do dispositivo ou regras do pontuador).
+    # Só enfileira: o envio (com limite de taxa e agrupamento por cartão) é da thread do despachante
+    if deve_alertar(conteudo, classificacao):
+        despachante.alertar(conteudo, score, classificacao, motivos)
@@ -3,203 +3,167 @@ import requests
 import time
 import threading
 import io
-import sys
-import matplotlib.pyplot as plt
 from dotenv import load_dotenv
 import os
 
-from funcoes_auxiliares.analise_dados import analise_dados
-from funcoes_auxiliares.analise_dados_fraude import plotar_analise
+from funcoes_auxiliares import graficos, metricas, supervisao
+from funcoes_auxiliares.alertas import DespachanteAlertas
+from funcoes_auxiliares.fluxo_eventos import OuvinteEventos
+from funcoes_auxiliares.cliente_firebase import (
+    SALA_UNICA,
+    buscar_estados,
+    buscar_presenca,
+    salas,
+    sessao,
+    url_no,
+)
+from funcoes_auxiliares.envio_telegram import configurar_api
 
 # ================= CONFIGURAÇÕES =================
 load_dotenv()
 TOKEN = os.getenv("bot_supervisor")
 ID_SUPERVISOR = 2056650757 
-
-URL_BASE = "https://controle-de-acesso-iot-default-rtdb.firebaseio.com"
-URL_ESTADO = f"{URL_BASE}/estado.json"
-URL_ULTIMO_EVENTO = f"{URL_BASE}/eventos.json?orderBy=\"$key\"&limitToLast=1"
+PORTA_METRICAS = int(os.getenv("porta_metricas_supervisor", "9464"))
 
 
+configurar_api()
 bot = telebot.TeleBot(TOKEN)
-
-# ================= FUNÇÕES AUXILIARES DE GRÁFICOS =================
-
-def gerar_grafico_ocupacao():
-    """
-    Chama analise_dados(), captura o print das métricas e gera o gráfico de predição.
-    Retorna: (buffer_imagem, texto_metricas)
-    """
-    plt.close('all') 
-    plt.figure(figsize=(10, 6)) # Cria o gráfico
-    
-    old_stdout = sys.stdout
-    result_capture = io.StringIO()
-    sys.stdout = result_capture
-    
-    try:
-        analise_dados() 
-    except Exception as e:
-        print(f"Erro na analise_dados: {e}")
-
-    sys.stdout = old_stdout
-    texto_metricas = result_capture.getvalue()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    plt.close('all')
-    
-    return buf, texto_metricas
-
-def gerar_grafico_fraude():
-    """
-    Chama plotar_analise() (do arquivo analise_dados_fraude) e gera o gráfico de barras.
-    Retorna: buffer_imagem
-    """
-    plt.close('all')
-    plt.figure(figsize=(10, 6)) # Cria o gráfico
-    
-    try:
-        plotar_analise()
-    except Exception as e:
-        print(f"Erro na plotar_analise: {e}")
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    plt.close('all')
-    
-    return buf
+despachante = DespachanteAlertas(
+    lambda chat_id, texto: bot.send_message(chat_id, texto, parse_mode="Markdown"), ID_SUPERVISOR
+)
 
 # ================= SEGURANÇA =================
 def eh_supervisor(mensagem):
     if mensagem.from_user.id == ID_SUPERVISOR:
         return True
-    bot.reply_to(mensagem, "⛔ Acesso Negado. Bot restrito ao supervisor.")
+    bot.reply_to(mensagem, supervisao.TEXTO_ACESSO_NEGADO)
     return False
 
 # ================= COMANDOS DO CHAT =================
 @bot.message_handler(commands=['start'])
+@metricas.cronometrado("bot_comando_segundos", bot="supervisor", comando="start")
 def menu(mensagem):
     if not eh_supervisor(mensagem): return
-    texto = """
-👮‍♂️ **Painel do Supervisor**
-
-✅ Monitoramento de Fraudes: ATIVO
-📡 Conectado ao Firebase
-
-**Comandos Disponíveis:**
-/ocupacao - Ver lotação em tempo real
-/analise_ocupacao - 📈 Ver predição e métricas de ML
-/analise_fraude - 🚨 Ver gráfico de distribuição de fraudes
-    """
-    bot.reply_to(mensagem, texto, parse_mode="Markdown")
+    bot.reply_to(mensagem, supervisao.TEXTO_MENU, parse_mode="Markdown")
 
 @bot.message_handler(commands=['ocupacao'])
+@metricas.cronometrado("bot_comando_segundos", bot="supervisor", comando="ocupacao")
 def ver_ocupacao(mensagem):
     if not eh_supervisor(mensagem): return
-    
+
+    # Estados de todas as salas buscados ao mesmo tempo
+    texto, modo = supervisao.texto_ocupacao(buscar_estados(), requests.HTTPError)
+    bot.reply_to(mensagem, texto, parse_mode=modo)
+
+def enviar_analises(mensagem, tipo):
+    """
+    Gera (ou reaproveita do cache) o gráfico de cada sala, com as salas
+    analisadas em paralelo no pool, e envia uma foto por sala
+    """
+    bot.send_chat_action(mensagem.chat.id, 'upload_photo')
     try:
-        resp = requests.get(URL_ESTADO)
-        if resp.status_code == 200:
-            dados = resp.json()
-            qtd = dados.get('ocupacao_atual', 0)
-            limite = dados.get('limite_ocupacao', 10)
-            msg = f"👥 **Ocupação Atual:** {qtd} / {limite}"
-            bot.reply_to(mensagem, msg, parse_mode="Markdown")
-        else:
-            bot.reply_to(mensagem, "⚠️ Erro ao ler dados do Firebase.")
+        for sala, resultado in graficos.gerar_salas(tipo).items():
+            if isinstance(resultado, Exception):
+                bot.reply_to(mensagem, supervisao.texto_erro_analise(tipo, resultado, sala))
+                continue
+            png, texto_metricas = resultado
+            if png is None:
+                bot.reply_to(mensagem, supervisao.texto_sem_grafico(tipo, sala, texto_metricas))
+                continue
+
+            bot.send_photo(
+                mensagem.chat.id,
+                photo=io.BytesIO(png),
+                caption=supervisao.legenda_analise(tipo, sala, texto_metricas),
+                parse_mode="Markdown"
+            )
     except Exception as e:
-        bot.reply_to(mensagem, f"Erro de conexão: {e}")
+        bot.reply_to(mensagem, supervisao.texto_erro_analise(tipo, e))
 
 # --- COMANDO 1: OCUPAÇÃO ---
 @bot.message_handler(commands=['analise_ocupacao'])
+@metricas.cronometrado("bot_comando_segundos", bot="supervisor", comando="analise_ocupacao")
 def enviar_analise_ocupacao(mensagem):
     if not eh_supervisor(mensagem): return
-    
-    bot.send_chat_action(mensagem.chat.id, 'upload_photo')
-    try:
-        imagem, texto_metricas = gerar_grafico_ocupacao()
-        
-        legenda = f"📈 **Predição de Ocupação**\n\n```\n{texto_metricas}```"
-        
-        bot.send_photo(
-            mensagem.chat.id, 
-            photo=imagem, 
-            caption=legenda, 
-            parse_mode="Markdown"
-        )
-    except Exception as e:
-        bot.reply_to(mensagem, f"Erro ao gerar análise de ocupação: {e}")
+    enviar_analises(mensagem, "ocupacao")
 
 # --- COMANDO 2: FRAUDE ---
 @bot.message_handler(commands=['analise_fraude'])
+@metricas.cronometrado("bot_comando_segundos", bot="supervisor", comando="analise_fraude")
 def enviar_analise_fraude(mensagem):
     if not eh_supervisor(mensagem): return
-    
-    bot.send_chat_action(mensagem.chat.id, 'upload_photo')
+    enviar_analises(mensagem, "fraude")
+
+# --- COMANDO 3: MÉTRICAS ---
+@bot.message_handler(commands=['metrics'])
+@metricas.cronometrado("bot_comando_segundos", bot="supervisor", comando="metrics")
+def enviar_metricas(mensagem):
+    if not eh_supervisor(mensagem): return
+    bot.reply_to(mensagem, supervisao.texto_metricas(), parse_mode="Markdown")
+
+# --- COMANDO 4: PICO ---
+@bot.message_handler(commands=['pico'])
+@metricas.cronometrado("bot_comando_segundos", bot="supervisor", comando="pico")
+def enviar_pico(mensagem):
+    if not eh_supervisor(mensagem): return
+
     try:
-        imagem = gerar_grafico_fraude()
-        
-        bot.send_photo(
-            mensagem.chat.id, 
-            photo=imagem, 
-            caption="🚨 **Distribuição de Eventos (Fraudes)**", 
-            parse_mode="Markdown"
-        )
+        texto = supervisao.texto_pico(telebot.util.extract_arguments(mensagem.text))
+        bot.reply_to(mensagem, texto, parse_mode="Markdown")
     except Exception as e:
-        bot.reply_to(mensagem, f"Erro ao gerar análise de fraude: {e}")
-
-# ================= MONITORAMENTO DE FRAUDE =================
-def monitorar_fraudes():
-    print("📡 Thread de Monitoramento Iniciada...")
-    ultimo_id_processado = None
+        bot.reply_to(mensagem, f"Erro ao consultar horários de pico: {e}")
 
-    session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(max_retries=3)
-    session.mount('https://', adapter)
+# --- COMANDO 5: CARTÃO ---
+@bot.message_handler(commands=['cartao'])
+@metricas.cronometrado("bot_comando_segundos", bot="supervisor", comando="cartao")
+def enviar_cartao(mensagem):
+    if not eh_supervisor(mensagem): return
 
-    while True:
-        try:
-            resp = session.get(URL_ULTIMO_EVENTO, timeout=10)
-            
-            if resp.status_code == 200 and resp.json():
-                dados_dict = resp.json()
-                id_evento = list(dados_dict.keys())[0]
-                conteudo = dados_dict[id_evento]
-
-                if id_evento != ultimo_id_processado:
-                    # Verifica fraude
-                    if conteudo.get('fraudulento') == True:
-                        cartao = conteudo.get('cartao', 'N/A')
-                        hora = conteudo.get('timestamp', 'N/A')
-                        
-                        alerta = f"""
-🚨 **ALERTA DE SEGURANÇA** 🚨
-
-Foi detectada uma tentativa de acesso não autorizado!
-💳 **Cartão:** `{cartao}`
-⏰ **Horário:** {hora}
-                        """
-                        try:
-                            bot.send_message(ID_SUPERVISOR, alerta, parse_mode="Markdown")
-                            print(f"[ALERTA ENVIADO] Fraude no cartão {cartao}")
-                        except Exception as e:
-                            print(f"Erro ao enviar alerta Telegram: {e}")
-                    
-                    ultimo_id_processado = id_evento
-            
-        except Exception as e:
-            print(f"⚠️ Oscilação na rede (Monitoramento): {e}")
-            time.sleep(5)
+    cartao, lista = supervisao.salas_cartao(telebot.util.extract_arguments(mensagem.text))
+    if not cartao:
+        bot.reply_to(mensagem, supervisao.USO_CARTAO)
+        return
+    try:
+        consultas = {}
+        for sala in lista:
+            resumo = supervisao.consultar_cartao(cartao, sala)
+            try:
+                presenca = buscar_presenca(cartao, sala) if resumo is not None else None
+            except Exception as e:
+                presenca = e
+            consultas[sala] = (resumo, presenca)
+        bot.reply_to(mensagem, supervisao.texto_cartao(cartao, consultas), parse_mode="Markdown")
+    except Exception as e:
+        bot.reply_to(mensagem, f"Erro ao consultar o cartão: {e}")
 
-        time.sleep(3)
+# ================= MONITORAMENTO DE FRAUDE =================
+def monitorar_fraudes(sala=SALA_UNICA):
+    """Segue o stream de eventos da sala no Firebase (com polling incremental como fallback)"""
+    print(f"📡 Thread de Monitoramento Iniciada...{' (sala ' + sala + ')' if sala else ''}")
+    pontuador = supervisao.iniciar_pontuador(sala)
+
+    ouvinte = OuvinteEventos(
+        url_no("eventos", sala),
+        lambda chave, evento: supervisao.processar_evento(pontuador, despachante, chave, evento, sala),
+        ultima_chave=pontuador.ultima_chave,
+        sessao=sessao(),
+        apenas_novos=True,
+    )
+    ouvinte.executar()
 
 if __name__ == "__main__":
-    t = threading.Thread(target=monitorar_fraudes)
-    t.daemon = True
-    t.start()
+    metricas.iniciar_servidor(PORTA_METRICAS)
+    despachante.iniciar()
+
+    # Um ouvinte por sala, todos neste processo (cada stream é uma conexão aberta do pool)
+    for sala in salas():
+        t = threading.Thread(target=monitorar_fraudes, args=(sala,))
+        t.daemon = True
+        t.start()
+
+    # Pilha de análise (pandas/matplotlib) carregada depois que o bot já responde
+    if graficos.AQUECER:
+        graficos.aquecer()
 
     print("👮‍♂️ Bot Supervisor Rodando... (Ctrl+C para parar)")
     
@@ -207,5 +171,6 @@ if __name__ == "__main__":
         try:
             bot.infinity_polling(timeout=10, long_polling_timeout=5)
         except Exception as e:
+            metricas.incrementar("bot_reinicios_total", bot="supervisor")
             print(f"❌ Bot caiu. Reiniciando... Erro: {e}")
             time.sleep(5)
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+Supervisor em modo asyncio (AsyncTeleBot + aiohttp).
+
+Comandos, monitoramento de fraudes e tarefas periódicas rodam como tarefas
+cooperativas de um único event loop: cada update do Telegram vira uma tarefa,
+então um /analise_* pesado não atrasa o /ocupacao. Análise e desenho vão para
+o pool de processos de graficos, com timeout por comando. Textos, pontuador e
+tratamento dos eventos vêm de funcoes_auxiliares.supervisao, os mesmos do
+supervisor_bot.
+
+Uso: python supervisor_bot_async.py   (mesmo .env do supervisor_bot.py)
+"""
+import asyncio
+import io
+import os
+
+import aiohttp
+from dotenv import load_dotenv
+from telebot.async_telebot import AsyncTeleBot
+from telebot.util import extract_arguments
+
+from funcoes_auxiliares import graficos, metricas, supervisao
+from funcoes_auxiliares import cliente_firebase_async as firebase
+from funcoes_auxiliares.alertas import DespachanteAlertas
+from funcoes_auxiliares.armazenamento_eventos import atualizar_salas
+from funcoes_auxiliares.cliente_firebase import SALA_UNICA, salas, url_no
+from funcoes_auxiliares.envio_telegram import configurar_api
+
+# ================= CONFIGURAÇÕES =================
+load_dotenv()
+TOKEN = os.getenv("bot_supervisor")
+ID_SUPERVISOR = 2056650757
+PORTA_METRICAS = int(os.getenv("porta_metricas_supervisor", "9464"))
+
+TIMEOUT_ANALISE = float(os.getenv("timeout_analise", "120"))    # segundos por comando /analise_*
+INTERVALO_SINCRONIZACAO = 300                                    # armazenamento local (s)
+INTERVALO_CHECKPOINT = 60                                        # checkpoint do pontuador (s)
+
+configurar_api(assincrono=True)
+bot = AsyncTeleBot(TOKEN)
+
+# ================= SEGURANÇA =================
+async def eh_supervisor(mensagem):
+    if mensagem.from_user.id == ID_SUPERVISOR:
+        return True
+    await bot.reply_to(mensagem, supervisao.TEXTO_ACESSO_NEGADO)
+    return False
+
+# ================= COMANDOS DO CHAT =================
+@bot.message_handler(commands=['start'])
+async def menu(mensagem):
+    if not await eh_supervisor(mensagem): return
+    await bot.reply_to(mensagem, supervisao.TEXTO_MENU, parse_mode="Markdown")
+
+@bot.message_handler(commands=['ocupacao'])
+async def ver_ocupacao(mensagem):
+    if not await eh_supervisor(mensagem): return
+
+    with metricas.cronometrar("bot_comando_segundos", bot="supervisor", comando="ocupacao"):
+        # Estados de todas as salas buscados ao mesmo tempo
+        texto, modo = supervisao.texto_ocupacao(await firebase.buscar_estados(), aiohttp.ClientResponseError)
+        await bot.reply_to(mensagem, texto, parse_mode=modo)
+
+async def enviar_analises(mensagem, tipo):
+    """
+    graficos.gerar_salas_async (todas as salas em paralelo, cada uma com timeout)
+    e uma foto por sala; as salas que passaram do timeout recebem um aviso
+    """
+    await bot.send_chat_action(mensagem.chat.id, 'upload_photo')
+    try:
+        for sala, resultado in (await graficos.gerar_salas_async(tipo, TIMEOUT_ANALISE)).items():
+            if isinstance(resultado, asyncio.TimeoutError):
+                metricas.incrementar("analises_timeout_total", tipo=tipo)
+                await bot.reply_to(
+                    mensagem,
+                    f"⏳ A análise{' da sala ' + sala if sala else ''} passou de {TIMEOUT_ANALISE:.0f}s "
+                    "e foi interrompida. Tente de novo em instantes.",
+                )
+                continue
+            if isinstance(resultado, BaseException):
+                await bot.reply_to(mensagem, supervisao.texto_erro_analise(tipo, resultado, sala))
+                continue
+            png, texto_metricas = resultado
+            if png is None:
+                await bot.reply_to(mensagem, supervisao.texto_sem_grafico(tipo, sala, texto_metricas))
+                continue
+
+            await bot.send_photo(
+                mensagem.chat.id,
+                photo=io.BytesIO(png),
+                caption=supervisao.legenda_analise(tipo, sala, texto_metricas),
+                parse_mode="Markdown",
+            )
+    except Exception as e:
+        await bot.reply_to(mensagem, supervisao.texto_erro_analise(tipo, e))
+
+# --- COMANDO 1: OCUPAÇÃO ---
+@bot.message_handler(commands=['analise_ocupacao'])
+async def enviar_analise_ocupacao(mensagem):
+    if not await eh_supervisor(mensagem): return
+
+    with metricas.cronometrar("bot_comando_segundos", bot="supervisor", comando="analise_ocupacao"):
+        await enviar_analises(mensagem, "ocupacao")
+
+# --- COMANDO 2: FRAUDE ---
+@bot.message_handler(commands=['analise_fraude'])
+async def enviar_analise_fraude(mensagem):
+    if not await eh_supervisor(mensagem): return
+
+    with metricas.cronometrar("bot_comando_segundos", bot="supervisor", comando="analise_fraude"):
+        await enviar_analises(mensagem, "fraude")
+
+# --- COMANDO 3: MÉTRICAS ---
+@bot.message_handler(commands=['metrics'])
+async def enviar_metricas(mensagem):
+    if not await eh_supervisor(mensagem): return
+    await bot.reply_to(mensagem, supervisao.texto_metricas(), parse_mode="Markdown")
+
+# --- COMANDO 4: PICO ---
+@bot.message_handler(commands=['pico'])
+async def enviar_pico(mensagem):
+    if not await eh_supervisor(mensagem): return
+
+    with metricas.cronometrar("bot_comando_segundos", bot="supervisor", comando="pico"):
+        try:
+            # Import (pandas, no primeiro uso), leitura do SQLite e sincronização fora do event loop
+            texto = await asyncio.to_thread(supervisao.texto_pico, extract_arguments(mensagem.text))
+            await bot.reply_to(mensagem, texto, parse_mode="Markdown")
+        except Exception as e:
+            await bot.reply_to(mensagem, f"Erro ao consultar horários de pico: {e}")
+
+# --- COMANDO 5: CARTÃO ---
+@bot.message_handler(commands=['cartao'])
+async def enviar_cartao(mensagem):
+    if not await eh_supervisor(mensagem): return
+
+    cartao, lista = supervisao.salas_cartao(extract_arguments(mensagem.text))
+    if not cartao:
+        await bot.reply_to(mensagem, supervisao.USO_CARTAO)
+        return
+    with metricas.cronometrar("bot_comando_segundos", bot="supervisor", comando="cartao"):
+        try:
+            # Histórico local (SQLite) de cada sala numa thread e presenças no Firebase, tudo ao mesmo tempo
+            resultados = await asyncio.gather(
+                *(asyncio.to_thread(supervisao.consultar_cartao, cartao, sala) for sala in lista),
+                *(firebase.buscar_presenca(cartao, sala) for sala in lista),
+                return_exceptions=True,
+            )
+            resumos, presencas = resultados[:len(lista)], resultados[len(lista):]
+            for resumo in resumos:
+                if isinstance(resumo, Exception):
+                    raise resumo
+            consultas = dict(zip(lista, zip(resumos, presencas)))
+            await bot.reply_to(mensagem, supervisao.texto_cartao(cartao, consultas), parse_mode="Markdown")
+        except Exception as e:
+            await bot.reply_to(mensagem, f"Erro ao consultar o cartão: {e}")
+
+# ================= MONITORAMENTO DE FRAUDE =================
+async def iniciar_pontuadores():
+    """
+    {sala: PontuadorFraude} com checkpoints e presenças de todas as salas carregados
+    ao mesmo tempo (cada sala numa thread, porque pode ler o histórico inteiro).
+    Os checkpoints ficam por conta de monitorar_fraudes, fora do event loop.
+    """
+    lista = salas()
+    pontuadores = await asyncio.gather(
+        *(asyncio.to_thread(supervisao.iniciar_pontuador, sala, False) for sala in lista)
+    )
+    return dict(zip(lista, pontuadores))
+
+async def monitorar_fraudes(pontuador, despachante, sala=SALA_UNICA):
+    print(f"📡 Tarefa de Monitoramento Iniciada...{' (sala ' + sala + ')' if sala else ''}")
+
+    async def receber(chave, evento):
+        supervisao.processar_evento(pontuador, despachante, chave, evento, sala)
+        if pontuador.checkpoint_vencido():
+            await asyncio.to_thread(pontuador.salvar)
+
+    ouvinte = firebase.OuvinteEventosAsync(
+        url_no("eventos", sala),
+        receber,
+        ultima_chave=pontuador.ultima_chave,
+        apenas_novos=True,
+    )
+    await ouvinte.executar()
+
+# ================= TAREFAS PERIÓDICAS =================
+async def periodicamente(intervalo, funcao, nome):
+    """Roda funcao() (bloqueante) numa thread a cada 'intervalo' segundos"""
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            with metricas.cronometrar("tarefa_periodica_segundos", tarefa=nome):
+                await asyncio.to_thread(funcao)
+        except Exception as e:
+            print(f"Erro na tarefa periódica '{nome}': {e}")
+
+def salvar_pontuadores(pontuadores):
+    for pontuador in pontuadores.values():
+        pontuador.salvar()
+
+async def main():
+    metricas.iniciar_servidor(PORTA_METRICAS)
+    pontuadores = await iniciar_pontuadores()
+
+    # O despachante envia numa thread própria; cada envio roda como corrotina neste loop
+    loop = asyncio.get_running_loop()
+    despachante = DespachanteAlertas(
+        lambda chat_id, texto: asyncio.run_coroutine_threadsafe(
+            bot.send_message(chat_id, texto, parse_mode="Markdown"), loop
+        ).result(),
+        ID_SUPERVISOR,
+    ).iniciar()
+
+    # Um ouvinte por sala, todos no mesmo event loop
+    tarefas = [
+        asyncio.create_task(monitorar_fraudes(pontuador, despachante, sala))
+        for sala, pontuador in pontuadores.items()
+    ] + [
+        asyncio.create_task(periodicamente(INTERVALO_SINCRONIZACAO, atualizar_salas, "sincronizacao")),
+        asyncio.create_task(periodicamente(INTERVALO_CHECKPOINT, lambda: salvar_pontuadores(pontuadores), "checkpoint")),
+    ]
+    # Pilha de análise (pandas/matplotlib) carregada numa thread depois que o bot já responde
+    if graficos.AQUECER:
+        graficos.aquecer()
+    print("👮‍♂️ Bot Supervisor (asyncio) Rodando... (Ctrl+C para parar)")
+    try:
+        await bot.infinity_polling(timeout=10, request_timeout=30)
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        await asyncio.to_thread(despachante.parar)
+        await asyncio.to_thread(salvar_pontuadores, pontuadores)
+        await firebase.fechar()
+        await bot.close_session()
+        graficos.encerrar()
+
+if __name__ == "__main__":
+    asyncio.run(main())
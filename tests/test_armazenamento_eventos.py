@@ -0,0 +1,51 @@
+"""
+Armazenamento local: agregados mantidos na ingestão com várias conexões
+sincronizando o mesmo banco ao mesmo tempo.
+"""
+import threading
+
+from ferramentas.gerador_eventos import gerar_historico
+from funcoes_auxiliares.armazenamento_eventos import (
+    ORIGEM_FIREBASE,
+    ORIGEM_HISTORICO,
+    conectar,
+    contagem_por_origem,
+    inserir_eventos,
+)
+
+
+def test_insercoes_concorrentes_nao_inflam_agregados(tmp_path):
+    caminho = str(tmp_path / "eventos.db")
+    conectar(caminho).close()
+    historico = list(gerar_historico(4000, n_cartoes=50, dias=30).items())
+    lotes = [dict(historico[i:i + 50]) for i in range(0, len(historico), 50)]
+    barreira = threading.Barrier(4)
+
+    def ingerir(parte, origem):
+        conn = conectar(caminho)
+        try:
+            barreira.wait()
+            for lote in lotes[parte::4]:
+                with conn:
+                    inserir_eventos(conn, lote, origem)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=ingerir, args=(i, (ORIGEM_HISTORICO, ORIGEM_FIREBASE)[i % 2]))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    conn = conectar(caminho)
+    try:
+        por_origem = dict(conn.execute("SELECT origem, COUNT(*) FROM eventos GROUP BY origem").fetchall())
+        unicos = conn.execute("SELECT COUNT(*) FROM eventos_unicos").fetchone()[0]
+        diarios = conn.execute("SELECT SUM(acessos) FROM agregados_diarios").fetchone()[0]
+        horarios = conn.execute("SELECT SUM(acessos) FROM agregados_horarios").fetchone()[0]
+    finally:
+        conn.close()
+    assert sum(por_origem.values()) == len(historico)
+    assert contagem_por_origem(caminho) == por_origem
+    assert diarios == horarios == unicos
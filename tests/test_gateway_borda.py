@@ -0,0 +1,167 @@
+"""
+Gateway de borda contra o Firebase local: caminhos por sala, deduplicação,
+caminhos sobrepostos no PATCH multi-caminho e lotes recusados.
+"""
+import json
+
+import pytest
+import requests
+
+from ferramentas.firebase_local import FirebaseLocal
+from funcoes_auxiliares import gateway_borda
+from funcoes_auxiliares.gateway_borda import GatewayBorda, _partes
+
+EVENTO = {"timestamp": "2025-01-01T08:00:00", "cartao": "A", "leitor": "entrada", "acesso_permitido": True}
+
+
+@pytest.fixture
+def firebase():
+    with FirebaseLocal() as firebase:
+        yield firebase
+
+
+@pytest.fixture
+def gateway(firebase, tmp_path):
+    gateway = GatewayBorda(firebase.url, str(tmp_path / "gateway.wal"), host="127.0.0.1", porta=0,
+                           sincronizar_wal=False)
+    yield gateway
+    gateway.servidor.server_close()
+    gateway.wal.fechar()
+
+
+def escrever(gateway, metodo, caminho, valor, id_evento=None):
+    return gateway.receber(metodo, _partes(caminho), valor, id_evento)
+
+
+# =====================================================
+# SALAS
+def test_escritas_por_sala(gateway, firebase):
+    estado = {"ocupacao_atual": 3, "limite_ocupacao": 10}
+    assert escrever(gateway, "PUT", "/salas/lab1/estado.json", estado) == (200, estado)
+    assert escrever(gateway, "PUT", "/salas/lab1/presenca/A.json", {"dentro": True})[0] == 200
+    status, resposta = escrever(gateway, "POST", "/salas/lab1/eventos.json", EVENTO)
+    assert status == 200
+    assert gateway.esvaziar(5)
+
+    sala = firebase.banco.ler(["salas", "lab1"])
+    assert sala["estado"] == estado
+    assert sala["presenca"] == {"A": {"dentro": True}}
+    assert sala["eventos"] == {resposta["name"]: EVENTO}
+    assert firebase.banco.ler(["eventos"]) is None
+
+
+def test_deduplicacao_por_sala(gateway):
+    _, primeira = escrever(gateway, "POST", "/salas/lab1/eventos.json", EVENTO, "id-1")
+    _, repetida = escrever(gateway, "POST", "/salas/lab1/eventos.json", EVENTO, "id-1")
+    _, outra_sala = escrever(gateway, "POST", "/salas/lab2/eventos.json", EVENTO, "id-1")
+    _, sem_sala = escrever(gateway, "POST", "/eventos.json", EVENTO, "id-1")
+    assert primeira == repetida
+    assert len({primeira["name"], outra_sala["name"], sem_sala["name"]}) == 3
+    assert set(gateway.pendentes) == {
+        f"salas/lab1/eventos/{primeira['name']}",
+        f"salas/lab2/eventos/{outra_sala['name']}",
+        f"eventos/{sem_sala['name']}",
+    }
+
+
+def test_caminhos_nao_suportados(gateway):
+    assert escrever(gateway, "PUT", "/salas/lab1/config.json", {})[0] == 404
+    assert escrever(gateway, "PUT", "/salas/lab1.json", {})[0] == 404
+    assert escrever(gateway, "POST", "/salas/lab1/eventos/x.json", EVENTO)[0] == 405
+    assert escrever(gateway, "PUT", "/salas/lab1/eventos.json", {})[0] == 405
+
+
+# =====================================================
+# CAMINHOS SOBREPOSTOS
+def test_filho_entra_no_ancestral_pendente(gateway, firebase):
+    escrever(gateway, "PUT", "/presenca.json", {"A": {"dentro": True}})
+    escrever(gateway, "PUT", "/presenca/B.json", {"dentro": True})
+    escrever(gateway, "PATCH", "/estado.json", {"ocupacao_atual": 1})
+    escrever(gateway, "PUT", "/estado.json", {"ocupacao_atual": 2, "limite_ocupacao": 10})
+    escrever(gateway, "PATCH", "/estado.json", {"ocupacao_atual": 3})
+    escrever(gateway, "DELETE", "/presenca/A.json", None)
+    assert set(gateway.pendentes) == {"presenca", "estado"}
+    assert gateway.esvaziar(5)
+    assert firebase.banco.ler(["presenca"]) == {"B": {"dentro": True}}
+    assert firebase.banco.ler(["estado"]) == {"ocupacao_atual": 3, "limite_ocupacao": 10}
+
+
+def test_ancestral_descarta_descendentes_pendentes(gateway, firebase):
+    firebase.banco.put(["salas", "lab1", "presenca"], {"Z": {"dentro": True}})
+    escrever(gateway, "PUT", "/salas/lab1/presenca/A.json", {"dentro": True})
+    escrever(gateway, "PUT", "/salas/lab1/presenca/B.json", {"dentro": True})
+    escrever(gateway, "PUT", "/salas/lab1/presenca.json", {"C": {"dentro": True}})
+    assert list(gateway.pendentes) == ["salas/lab1/presenca"]
+    assert gateway.esvaziar(5)
+    assert firebase.banco.ler(["salas", "lab1", "presenca"]) == {"C": {"dentro": True}}
+
+
+def test_put_repetido_depois_de_escrita_sobreposta(gateway, firebase):
+    escrever(gateway, "PUT", "/presenca/A.json", {"dentro": True})
+    assert gateway.esvaziar(5)
+    escrever(gateway, "PUT", "/presenca.json", None)
+    assert gateway.esvaziar(5)
+    # O valor de presenca/A mudou com o PUT no ancestral: não é repetição
+    escrever(gateway, "PUT", "/presenca/A.json", {"dentro": True})
+    assert gateway.esvaziar(5)
+    assert firebase.banco.ler(["presenca"]) == {"A": {"dentro": True}}
+
+
+def test_recuperacao_do_wal_sem_sobreposicao(firebase, tmp_path):
+    wal = str(tmp_path / "gateway.wal")
+    gateway = GatewayBorda(firebase.url, wal, host="127.0.0.1", porta=0, sincronizar_wal=False)
+    escrever(gateway, "PUT", "/presenca/A.json", {"dentro": True})
+    escrever(gateway, "PUT", "/presenca.json", {"B": {"dentro": True}})
+    escrever(gateway, "PUT", "/presenca/C.json", {"dentro": True})
+    gateway.servidor.server_close()
+    gateway.wal.fechar()
+
+    gateway = GatewayBorda(firebase.url, wal, host="127.0.0.1", porta=0, sincronizar_wal=False)
+    try:
+        assert list(gateway.pendentes) == ["presenca"]
+        assert gateway.esvaziar(5)
+        assert firebase.banco.ler(["presenca"]) == {"B": {"dentro": True}, "C": {"dentro": True}}
+    finally:
+        gateway.servidor.server_close()
+        gateway.wal.fechar()
+
+
+# =====================================================
+# LOTES RECUSADOS
+def test_escrita_recusada_sai_da_fila(gateway, firebase, monkeypatch):
+    requisitar = gateway_borda.requisitar
+
+    def requisitar_com_regras(url, metodo="GET", corpo=None, **kwargs):
+        # Regras do Firebase recusando um caminho: o PATCH inteiro volta 400
+        if any("proibido" in caminho for caminho in corpo or {}):
+            resposta = requests.Response()
+            resposta.status_code = 400
+            raise requests.HTTPError("400 Bad Request", response=resposta)
+        return requisitar(url, metodo=metodo, corpo=corpo, **kwargs)
+
+    monkeypatch.setattr(gateway_borda, "requisitar", requisitar_com_regras)
+    for i in range(5):
+        escrever(gateway, "PUT", f"/presenca/C{i}.json", {"dentro": True})
+    escrever(gateway, "PUT", "/presenca/proibido.json", {"dentro": True})
+    escrever(gateway, "PUT", "/estado.json", {"ocupacao_atual": 5})
+
+    assert gateway.enviar_lote() == 7
+    assert not gateway.pendentes
+    assert gateway.saude()["recusadas"] == 1
+    assert set(firebase.banco.ler(["presenca"])) == {f"C{i}" for i in range(5)}
+    assert firebase.banco.ler(["estado"]) == {"ocupacao_atual": 5}
+    with open(gateway.caminho_recusadas, encoding="utf-8") as f:
+        assert [json.loads(linha)["caminho"] for linha in f] == ["presenca/proibido"]
+
+
+def test_falha_transitoria_mantem_o_lote(gateway, monkeypatch):
+    def requisitar_limitado(url, **kwargs):
+        resposta = requests.Response()
+        resposta.status_code = 429
+        raise requests.HTTPError("429 Too Many Requests", response=resposta)
+
+    monkeypatch.setattr(gateway_borda, "requisitar", requisitar_limitado)
+    escrever(gateway, "PUT", "/estado.json", {"ocupacao_atual": 5})
+    with pytest.raises(requests.HTTPError):
+        gateway.enviar_lote()
+    assert list(gateway.pendentes) == ["estado"]
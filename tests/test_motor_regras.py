@@ -0,0 +1,277 @@
+"""
+Paridade do motor_regras vetorizado com o laço por cartão original e testes
+das regras de janela (deteccao_janela).
+
+O laço de referência é o motor de regras da versão original de
+analise_dados_fraude (sem as regras de janela); a paridade roda com
+entre_cartoes=False e com o detector de janela desligado, para continuar
+valendo com as regras de janela ativas no motor.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ferramentas.gerador_eventos import gerar_historico
+from funcoes_auxiliares import analise_dados_fraude
+from funcoes_auxiliares.analise_dados_fraude import motor_regras
+from funcoes_auxiliares.deteccao_janela import PESOS, PRAZO_CONHECIDO, DetectorJanela
+from funcoes_auxiliares.modelo_eventos import carregar_tabela_arquivo, construir_tabela, nomes_leitor
+from funcoes_auxiliares.pontuacao_tempo_real import (
+    LIMITE_PERMANENCIA_MIN,
+    LIMITE_SCORE_FRAUDE,
+    LIMITE_SCORE_SUSPEITO,
+)
+
+DADOS_REAIS = Path(__file__).resolve().parent.parent / "dadosreais.json"
+
+
+# =====================================================
+# REFERÊNCIA: LAÇO POR CARTÃO ORIGINAL
+def minutos_entre(t1, t2):
+    return abs((t2 - t1).total_seconds()) / 60
+
+
+def motor_regras_iterativo(eventos):
+    """
+    Motor de regras original (laço por evento de cada cartão).
+    eventos: lista de dicionários com cartao, timestamp (datetime), leitor e permitido.
+    """
+    eventos = sorted(eventos, key=lambda x: x["timestamp"])
+    eventos_por_cartao = defaultdict(list)
+    for e in eventos:
+        eventos_por_cartao[e["cartao"]].append(e)
+    perfil = {}
+    for cartao, evs in eventos_por_cartao.items():
+        entradas = [e["timestamp"].hour for e in evs if e["leitor"] == "entrada"]
+        perfil[cartao] = sum(entradas) / len(entradas) if entradas else None
+
+    resultados = []
+    for cartao, evs in eventos_por_cartao.items():
+        ultimo_evento = None
+        for e in evs:
+            score = 0
+            motivos = []
+
+            # --- Regra 1: Sequência Inválida ---
+            if ultimo_evento and ultimo_evento["leitor"] == e["leitor"]:
+                score += 3
+                motivos.append(f"Sequência inválida ({e['leitor']} duplicada)")
+
+            # --- Regra 2: Permanência muito curta ---
+            if ultimo_evento and ultimo_evento["leitor"] == "entrada" and e["leitor"] == "saida":
+                tempo = minutos_entre(ultimo_evento["timestamp"], e["timestamp"])
+                if tempo < LIMITE_PERMANENCIA_MIN:
+                    score += 2
+                    motivos.append(f"Permanência suspeita ({int(tempo)}min)")
+
+            # --- Regra 3: Horário Atípico ---
+            media = perfil[cartao]
+            if e["leitor"] == "entrada" and media is not None:
+                if abs(e["timestamp"].hour - media) >= 4:
+                    score += 3
+                    motivos.append("Horário fora do perfil habitual")
+
+            # --- Regra 4: Cartão Bloqueado ---
+            if e["permitido"] == False:
+                score += 5
+                motivos.append("Acesso Negado pelo Hardware")
+
+            if score >= LIMITE_SCORE_FRAUDE:
+                classificacao = "FRAUDULENTO"
+            elif score >= LIMITE_SCORE_SUSPEITO:
+                classificacao = "SUSPEITO"
+            else:
+                classificacao = "NORMAL"
+
+            resultados.append({
+                "cartao": cartao,
+                "timestamp": e["timestamp"],
+                "leitor": e["leitor"],
+                "score": score,
+                "classificacao": classificacao,
+                "motivos": motivos,
+            })
+            ultimo_evento = e
+    return resultados
+
+
+def eventos_da_tabela(tabela):
+    """A mesma tabela colunar como a lista de dicionários que o laço original recebia"""
+    return [
+        {
+            # o timestamp da tabela é o relógio do dispositivo, sem fuso
+            "timestamp": datetime.fromtimestamp(int(ts), timezone.utc).replace(tzinfo=None),
+            "cartao": cartao,
+            "leitor": leitor,
+            "permitido": bool(permitido),
+        }
+        for ts, cartao, leitor, permitido in zip(
+            tabela["timestamp"], tabela["cartao"], nomes_leitor(tabela["leitor"].to_numpy()),
+            tabela["permitido"],
+        )
+    ]
+
+
+# =====================================================
+# PARIDADE
+@pytest.fixture
+def sem_janela(monkeypatch):
+    """Desliga as regras de janela do motor_regras (detector sem pontos nem motivos)"""
+    def detectar_colunas(ts, *colunas, **opcoes):
+        return [0] * len(ts), [[] for _ in ts]
+    monkeypatch.setattr(analise_dados_fraude, "detectar_colunas", detectar_colunas)
+
+
+def conferir_paridade(tabela):
+    esperado = motor_regras_iterativo(eventos_da_tabela(tabela))
+    obtido = motor_regras(tabela, entre_cartoes=False).to_dict("records")
+    assert len(obtido) == len(esperado)
+    for o, e in zip(obtido, esperado):
+        leitor = None if pd.isna(o["leitor"]) else o["leitor"]
+        assert (o["cartao"], o["timestamp"].to_pydatetime(), leitor) == \
+            (e["cartao"], e["timestamp"], e["leitor"])
+        assert (int(o["score"]), o["classificacao"], o["motivos"]) == \
+            (e["score"], e["classificacao"], e["motivos"])
+
+
+def tabela_sintetica(**kwargs):
+    eventos = list(gerar_historico(**kwargs).values())
+    return construir_tabela(
+        [e["timestamp"] for e in eventos], [e["cartao"] for e in eventos],
+        [e["leitor"] for e in eventos], [e["acesso_permitido"] for e in eventos],
+    )
+
+
+@pytest.mark.skipif(not DADOS_REAIS.exists(), reason="dadosreais.json ausente")
+def test_paridade_dados_reais(sem_janela):
+    conferir_paridade(carregar_tabela_arquivo(str(DADOS_REAIS)))
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_paridade_historico_sintetico(sem_janela, semente):
+    # Poucos cartões e dias: muitas sequências repetidas, permanências curtas e empates de horário
+    conferir_paridade(tabela_sintetica(n_eventos=3000, n_cartoes=20, dias=10, taxa_fraude=0.2, semente=semente))
+
+
+def test_paridade_leitor_e_permitido_ausentes(sem_janela):
+    tabela = construir_tabela(
+        ["2025-01-01T08:00:00", "2025-01-01T08:00:00", "2025-01-01T08:00:30", "2025-01-01T20:00:00"],
+        ["A", "B", "A", "A"],
+        ["entrada", None, "saida", "entrada"],
+        [True, None, False, True],
+    )
+    conferir_paridade(tabela)
+
+
+def test_paridade_nos_limites_das_regras(sem_janela):
+    # C: entradas às 8h e às 16h (média 12h, desvio exatamente 4h); D: permanência de 1min exato
+    tabela = construir_tabela(
+        ["2025-01-01T08:00:00", "2025-01-01T09:00:00", "2025-01-02T16:00:00",
+         "2025-01-01T10:00:00", "2025-01-01T10:01:00"],
+        ["C", "C", "C", "D", "D"],
+        ["entrada", "saida", "entrada", "entrada", "saida"],
+        [True, True, True, True, True],
+    )
+    conferir_paridade(tabela)
+
+
+# =====================================================
+# REGRAS DE JANELA
+def test_janela_clone_no_mesmo_leitor():
+    detector = DetectorJanela()
+    assert detector.verificar(0, "A", "entrada") == (0, [])
+    score, motivos = detector.verificar(5, "A", "entrada", repetido=True)
+    assert score == PESOS["simultaneo"]
+    assert motivos[0].startswith("Uso quase simultâneo (2 passagens")
+    # Tentativas negadas repetidas não são clone
+    detector.verificar(100, "B", "entrada", permitido=False)
+    assert detector.verificar(103, "B", "entrada", permitido=False, repetido=True) == (0, [])
+
+
+def test_janela_leituras_mais_rapidas_que_o_leitor():
+    detector = DetectorJanela()
+    detector.verificar(0, "A", "entrada")
+    score, motivos = detector.verificar(0, "B", "entrada")
+    assert score == PESOS["leitor"]
+    assert motivos == ["Leituras mais rápidas que o leitor permite (entrada)"]
+    assert detector.verificar(2, "C", "entrada")[0] == 0
+    # Sem entre_cartoes (histórico de um cartão só) a regra fica de fora
+    detector = DetectorJanela(entre_cartoes=False)
+    detector.verificar(0, "A", "entrada")
+    assert detector.verificar(0, "B", "entrada")[0] == 0
+
+
+def test_janela_entrada_com_cartao_ja_dentro():
+    detector = DetectorJanela()
+    detector.carregar_presenca({"A": {"dentro": True, "timestamp": "2025-01-01T08:00:00"}})
+    inicio = datetime(2025, 1, 1, 8).timestamp()
+    score, motivos = detector.verificar(inicio + 1800, "A", "entrada")
+    assert score == PESOS["presente"]
+    assert motivos == ["Entrada com o cartão já dentro (há 30min)"]
+    # Quando a Regra 1 já marcou a entrada repetida, a janela não pontua de novo
+    assert detector.verificar(inicio + 3600, "A", "entrada", repetido=True) == (0, [])
+
+
+def test_janela_saida_com_sala_vazia():
+    detector = DetectorJanela()
+    # Cartão nunca visto: presença desconhecida, não pontua
+    assert detector.verificar(0, "A", "saida") == (0, [])
+    # Entrou negado (não conta como dentro) e saiu: pontua
+    detector.verificar(100, "B", "entrada", permitido=False)
+    assert detector.verificar(200, "B", "saida") == (PESOS["sala_vazia"], ["Saída com a sala vazia"])
+    # Saída repetida (Regra 1 já pontuou) e histórico de um cartão só não pontuam
+    assert detector.verificar(300, "B", "saida", repetido=True) == (0, [])
+    detector = DetectorJanela(entre_cartoes=False)
+    detector.verificar(100, "B", "entrada", permitido=False)
+    assert detector.verificar(200, "B", "saida") == (0, [])
+
+
+def test_janela_ignora_reenvio_e_eventos_antigos():
+    detector = DetectorJanela(janela=600)
+    detector.verificar(1000, "A", "entrada")
+    assert detector.verificar(1000, "A", "entrada", repetido=True) == (0, [])
+    assert detector.verificar(1000 - 601, "B", "entrada") == (0, [])
+
+
+def test_motor_regras_soma_pontos_da_janela():
+    tabela = construir_tabela(
+        ["2025-01-01T08:00:00", "2025-01-01T08:00:05", "2025-01-01T08:30:00",
+         "2025-01-01T09:00:00", "2025-01-01T09:10:00"],
+        ["A", "A", "A", "B", "B"],
+        ["entrada", "entrada", "saida", "entrada", "saida"],
+        [True, True, True, False, True],
+    )
+    resultado = {(r["cartao"], r["timestamp"].strftime("%H:%M:%S")): r
+                 for r in motor_regras(tabela).to_dict("records")}
+    clone = resultado[("A", "08:00:05")]
+    assert clone["score"] == 3 + PESOS["simultaneo"]
+    assert clone["classificacao"] == "FRAUDULENTO"
+    assert clone["motivos"][0] == "Sequência inválida (entrada duplicada)"
+    assert clone["motivos"][1].startswith("Uso quase simultâneo")
+    # A saída de B depois de uma entrada negada é "sala vazia" só com entre_cartoes
+    assert resultado[("B", "09:10:00")]["motivos"] == ["Saída com a sala vazia"]
+    sozinho = motor_regras(tabela, entre_cartoes=False)
+    assert sozinho.loc[sozinho["cartao"] == "B", "score"].tolist() == [5, 0]
+
+
+def test_janela_esquece_cartoes_inativos():
+    detector = DetectorJanela()
+    for i in range(100):
+        detector.verificar(i * 60, f"C{i}", "saida")
+    assert len(detector.conhecidos) == 100
+    # Um dia depois só ficam os cartões com atividade nas últimas 24h
+    detector.verificar(PRAZO_CONHECIDO + 50 * 60, "C99", "entrada")
+    assert list(detector.conhecidos) == [f"C{i}" for i in range(50, 99)] + ["C99"]
+    assert len(detector.eventos) == 1
+
+
+def test_janela_sala_vazia_dentro_do_prazo():
+    detector = DetectorJanela()
+    detector.verificar(0, "B", "entrada", permitido=False)
+    # Saída uma hora depois (fora da janela de eventos, dentro do prazo dos conhecidos)
+    assert detector.verificar(3600, "B", "saida")[0] == PESOS["sala_vazia"]
+    detector.verificar(7200, "D", "entrada", permitido=False)
+    assert detector.verificar(7200 + PRAZO_CONHECIDO + 1, "D", "saida") == (0, [])
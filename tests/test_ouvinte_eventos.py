@@ -0,0 +1,92 @@
+"""
+Entrega do OuvinteEventos síncrono e do OuvinteEventosAsync: nenhum evento se
+perde quando ao_receber falha ou a Task é cancelada no meio de um lote.
+"""
+import asyncio
+
+import pytest
+
+from funcoes_auxiliares import cliente_firebase_async
+from funcoes_auxiliares.cliente_firebase_async import OuvinteEventosAsync
+from funcoes_auxiliares.fluxo_eventos import OuvinteEventos
+
+URL = "http://firebase.local/eventos.json"
+
+
+def put_inicial(chaves):
+    """Primeiro evento do stream: o nó inteiro a partir do startAt"""
+    return "put", {"path": "/", "data": {c: {"cartao": "A", "leitor": "entrada"} for c in chaves}}
+
+
+def test_ouvinte_sincrono_reentrega_evento_que_falhou():
+    recebidos = []
+
+    def ao_receber(chave, evento):
+        if chave == "k2" and "k2" not in falhou:
+            falhou.add(chave)
+            raise RuntimeError("falha no processamento")
+        recebidos.append(chave)
+
+    falhou = set()
+    ouvinte = OuvinteEventos(URL, ao_receber)
+    with pytest.raises(RuntimeError):
+        ouvinte._tratar_sse(*put_inicial(["k1", "k2", "k3"]))
+    assert ouvinte.ultima_chave == "k1"
+    # A reconexão abre com startAt=k1 e reentrega o resto
+    ouvinte._tratar_sse(*put_inicial(["k1", "k2", "k3"]))
+    assert recebidos == ["k1", "k2", "k3"]
+
+
+def test_ouvinte_async_mantem_lote_quando_ao_receber_falha():
+    async def cenario():
+        recebidos, falhou = [], set()
+
+        async def ao_receber(chave, evento):
+            if chave == "k2" and "k2" not in falhou:
+                falhou.add(chave)
+                raise RuntimeError("falha no processamento")
+            recebidos.append(chave)
+
+        ouvinte = OuvinteEventosAsync(URL, ao_receber)
+        ouvinte._tratar_sse(*put_inicial(["k1", "k2", "k3"]))
+        with pytest.raises(RuntimeError):
+            await ouvinte._despachar()
+        assert ouvinte.ultima_chave == "k1"
+        assert ouvinte._consulta()["startAt"] == '"k1"'
+
+        # Reconexão: o put inicial repete k2 e k3 (ainda no lote) e traz k4
+        ouvinte._tratar_sse(*put_inicial(["k1", "k2", "k3", "k4"]))
+        await ouvinte._despachar()
+        assert recebidos == ["k1", "k2", "k3", "k4"]
+        assert ouvinte.ultima_chave == "k4"
+        await cliente_firebase_async.fechar()
+
+    asyncio.run(cenario())
+
+
+def test_ouvinte_async_cancelado_no_meio_do_lote():
+    async def cenario():
+        recebidos, bloqueio = [], asyncio.Event()
+
+        async def ao_receber(chave, evento):
+            if chave == "k2":
+                await bloqueio.wait()
+            recebidos.append(chave)
+
+        ouvinte = OuvinteEventosAsync(URL, ao_receber)
+        ouvinte._tratar_sse(*put_inicial(["k1", "k2", "k3"]))
+        tarefa = asyncio.create_task(ouvinte._despachar())
+        await asyncio.sleep(0)
+        tarefa.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarefa
+        assert recebidos == ["k1"]
+        assert ouvinte.ultima_chave == "k1"
+        assert [chave for chave, _ in ouvinte._lote] == ["k2", "k3"]
+
+        bloqueio.set()
+        await ouvinte._despachar()
+        assert recebidos == ["k1", "k2", "k3"]
+        await cliente_firebase_async.fechar()
+
+    asyncio.run(cenario())